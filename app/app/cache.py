@@ -0,0 +1,108 @@
+"""
+Cache helpers shared by the project's cached read paths, and version counters for the ETags of
+endpoints whose content changes on writes.
+
+They are built on the default Django cache so they work with any backend; on Redis
+``cache.add`` is a ``SET NX`` which makes the leases below atomic across workers.
+"""
+import math
+import random
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.core.cache import cache
+
+LOCK_TIMEOUT = 30
+WAIT_INTERVAL = 0.05
+
+
+@contextmanager
+def cache_lock(name, timeout=LOCK_TIMEOUT):
+    """
+    Try to take a lease on ``name`` for at most ``timeout`` seconds and yield whether it was acquired.
+    The lease is released on exit only if it is still ours.
+    """
+    key = f'lock:{name}'
+    token = uuid.uuid4().hex
+    acquired = cache.add(key, token, timeout)
+    try:
+        yield acquired
+    finally:
+        if acquired and cache.get(key) == token:
+            cache.delete(key)
+
+
+def _compute_and_store(key, compute, timeout, stale_timeout):
+    started = time.monotonic()
+    value = compute()
+    delta = time.monotonic() - started
+    cache.set(key, (value, time.time() + timeout, delta), timeout + stale_timeout)
+    return value
+
+
+def get_or_refresh(key, compute, timeout, stale_timeout=0, beta=1.0, lock_timeout=LOCK_TIMEOUT):
+    """
+    Return the cached value of ``key``, calling ``compute()`` to (re)build it in at most one worker at a time.
+
+    - On a cold key one worker computes while the others wait for its result instead of all hitting
+      the database at once.
+    - A hit may refresh the value before it expires, with a probability that grows as expiry gets
+      closer and as ``compute`` gets slower (``beta`` scales it, 0 disables it), so hot keys are
+      refreshed ahead of time instead of expiring under load.
+    - With ``stale_timeout`` the previous value outlives its expiry by that many seconds and is served
+      while another worker recomputes it (stale-while-revalidate).
+    """
+    entry = cache.get(key)
+    if entry is not None:
+        value, expires_at, delta = entry
+        # 1 - random() is in (0, 1], so the log is defined and never positive.
+        if time.time() - delta * beta * math.log(1.0 - random.random()) < expires_at:
+            return value
+
+    with cache_lock(key, lock_timeout) as acquired:
+        if acquired:
+            return _compute_and_store(key, compute, timeout, stale_timeout)
+
+    if entry is not None:
+        # Another worker is refreshing it, the current value is still fresh or within its stale window.
+        return entry[0]
+
+    deadline = time.monotonic() + lock_timeout
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+
+    # The lease holder never stored a value (it crashed or timed out), compute it ourselves.
+    return _compute_and_store(key, compute, timeout, stale_timeout)
+
+
+def _version_key(scope):
+    return f'version:{scope}'
+
+
+def get_version(scope):
+    """
+    Return the current version of ``scope``, starting it at the current time in microseconds so a
+    counter that was evicted never restarts at a value that was already handed out.
+    """
+    key = _version_key(scope)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns() // 1000, None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(*scopes):
+    """
+    Move every given scope to a new version.
+    """
+    for scope in scopes:
+        key = _version_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns() // 1000, None)
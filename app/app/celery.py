@@ -1,6 +1,6 @@
 from __future__ import absolute_import, unicode_literals
 import os
-from celery import Celery
+from celery import Celery, bootsteps
 from celery.schedules import crontab
 
 # Set the default Django settings module for the 'celery' program.
@@ -17,3 +17,20 @@ app.autodiscover_tasks()
 
 
 app.conf.timezone = 'UTC'
+
+
+class FundingQueuesCheck(bootsteps.Step):
+    """
+    Worker startup step refusing a misconfigured funding worker, which would let the acceptances of
+    a lender run in parallel.
+    """
+
+    def __init__(self, worker, **kwargs):
+        from apps.loans.funding import check_funding_worker
+
+        queues = worker.app.amqp.queues
+        check_funding_worker(queues.consume_from or queues, worker.concurrency)
+        super().__init__(worker, **kwargs)
+
+
+app.steps['worker'].add(FundingQueuesCheck)
@@ -1,4 +1,269 @@
 import os
+import threading
+import time
+
+import redis
+from django.conf import settings
 
 REDIS_HOST = os.environ.get('REDIS_HOST', "localhost")
-REDIS_PORT = os.environ.get('REDIS_PORT', 6379)
\ No newline at end of file
+REDIS_PORT = os.environ.get('REDIS_PORT', 6379)
+
+# ``REDIS_URL`` value that selects the in-process client instead of a Redis server.
+LOCAL_REDIS_URL = 'memory://'
+
+
+def _to_bytes(value):
+    if isinstance(value, bytes):
+        return value
+    if isinstance(value, str):
+        return value.encode()
+    return str(value).encode()
+
+
+def _parse_score_bound(bound):
+    """
+    Parse a ZRANGEBYSCORE bound (``-inf``, ``+inf``, ``(12`` or ``12``) into ``(value, exclusive)``.
+    """
+    if isinstance(bound, (int, float)):
+        return float(bound), False
+    bound = bound.decode() if isinstance(bound, bytes) else str(bound)
+    exclusive = bound.startswith('(')
+    if exclusive:
+        bound = bound[1:]
+    return float(bound), exclusive
+
+
+class LocalRedis:
+    """
+    In-process stand-in for the subset of the Redis client API used by the project.
+    It mirrors redis-py return types (bytes members and values) so code paths behave
+    the same against it and against a real server.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._data = {}
+        self._expires = {}
+
+    def _purge(self, name):
+        expires_at = self._expires.get(name)
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._data.pop(name, None)
+            self._expires.pop(name, None)
+
+    def _get(self, name, factory=None):
+        self._purge(name)
+        if factory is not None and name not in self._data:
+            self._data[name] = factory()
+        return self._data.get(name)
+
+    def _discard_if_empty(self, name):
+        if name in self._data and not self._data[name]:
+            del self._data[name]
+            self._expires.pop(name, None)
+
+    # Keys
+
+    def flushall(self):
+        with self._lock:
+            self._data.clear()
+            self._expires.clear()
+        return True
+
+    def delete(self, *names):
+        with self._lock:
+            removed = 0
+            for name in names:
+                self._purge(name)
+                if self._data.pop(name, None) is not None:
+                    removed += 1
+                self._expires.pop(name, None)
+            return removed
+
+    def exists(self, *names):
+        with self._lock:
+            return sum(1 for name in names if self._get(name) is not None)
+
+    def expire(self, name, time_seconds):
+        with self._lock:
+            if self._get(name) is None:
+                return False
+            self._expires[name] = time.monotonic() + time_seconds
+            return True
+
+    # Strings
+
+    def get(self, name):
+        with self._lock:
+            return self._get(name)
+
+    def mget(self, keys, *args):
+        names = list(keys) if isinstance(keys, (list, tuple)) else [keys]
+        names.extend(args)
+        with self._lock:
+            return [self._get(name) for name in names]
+
+    def set(self, name, value, ex=None, nx=False):
+        with self._lock:
+            if nx and self._get(name) is not None:
+                return None
+            self._data[name] = _to_bytes(value)
+            self._expires.pop(name, None)
+            if ex is not None:
+                self._expires[name] = time.monotonic() + ex
+            return True
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            value = int(self._get(name) or 0) + amount
+            self._data[name] = _to_bytes(value)
+            return value
+
+    # Hashes
+
+    def hset(self, name, key=None, value=None, mapping=None):
+        items = dict(mapping or {})
+        if key is not None:
+            items[key] = value
+        with self._lock:
+            bucket = self._get(name, dict)
+            added = 0
+            for field, field_value in items.items():
+                field = _to_bytes(field)
+                if field not in bucket:
+                    added += 1
+                bucket[field] = _to_bytes(field_value)
+            return added
+
+    def hget(self, name, key):
+        with self._lock:
+            return (self._get(name) or {}).get(_to_bytes(key))
+
+    def hmget(self, name, keys, *args):
+        fields = list(keys) if isinstance(keys, (list, tuple)) else [keys]
+        fields.extend(args)
+        with self._lock:
+            bucket = self._get(name) or {}
+            return [bucket.get(_to_bytes(field)) for field in fields]
+
+    def hgetall(self, name):
+        with self._lock:
+            return dict(self._get(name) or {})
+
+    def hdel(self, name, *keys):
+        with self._lock:
+            bucket = self._get(name) or {}
+            removed = sum(1 for key in keys if bucket.pop(_to_bytes(key), None) is not None)
+            self._discard_if_empty(name)
+            return removed
+
+    def hlen(self, name):
+        with self._lock:
+            return len(self._get(name) or {})
+
+    # Sorted sets
+
+    def _sorted_members(self, name):
+        members = self._get(name) or {}
+        return sorted(members.items(), key=lambda item: (item[1], item[0]))
+
+    def zadd(self, name, mapping):
+        with self._lock:
+            members = self._get(name, dict)
+            added = 0
+            for member, score in mapping.items():
+                member = _to_bytes(member)
+                if member not in members:
+                    added += 1
+                members[member] = float(score)
+            return added
+
+    def zrem(self, name, *values):
+        with self._lock:
+            members = self._get(name) or {}
+            removed = sum(1 for value in values if members.pop(_to_bytes(value), None) is not None)
+            self._discard_if_empty(name)
+            return removed
+
+    def zscore(self, name, value):
+        with self._lock:
+            return (self._get(name) or {}).get(_to_bytes(value))
+
+    def zcard(self, name):
+        with self._lock:
+            return len(self._get(name) or {})
+
+    def zcount(self, name, min, max):
+        return len(self.zrangebyscore(name, min, max))
+
+    def zrange(self, name, start, end, desc=False, withscores=False):
+        with self._lock:
+            items = self._sorted_members(name)
+            if desc:
+                items.reverse()
+            end = len(items) + end + 1 if end < 0 else end + 1
+            items = items[start:end]
+        return items if withscores else [member for member, _ in items]
+
+    def zrangebyscore(self, name, min, max, start=None, num=None, withscores=False):
+        low, low_exclusive = _parse_score_bound(min)
+        high, high_exclusive = _parse_score_bound(max)
+        with self._lock:
+            items = [
+                (member, score) for member, score in self._sorted_members(name)
+                if (score > low if low_exclusive else score >= low)
+                and (score < high if high_exclusive else score <= high)
+            ]
+        if start is not None and num is not None:
+            items = items[start:start + num] if num >= 0 else items[start:]
+        return items if withscores else [member for member, _ in items]
+
+    def pipeline(self, transaction=True):
+        return LocalPipeline(self)
+
+
+class LocalPipeline:
+    """
+    Buffers commands and runs them under the client lock on ``execute()``, like a MULTI/EXEC block.
+    """
+
+    def __init__(self, client):
+        self._client = client
+        self._commands = []
+
+    def __getattr__(self, item):
+        command = getattr(self._client, item)
+
+        def buffered(*args, **kwargs):
+            self._commands.append((command, args, kwargs))
+            return self
+
+        return buffered
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._commands = []
+
+    def execute(self):
+        with self._client._lock:
+            results = [command(*args, **kwargs) for command, args, kwargs in self._commands]
+        self._commands = []
+        return results
+
+
+local_redis = LocalRedis()
+_clients = {}
+
+
+def get_redis_client():
+    """
+    Return a Redis client for ``settings.REDIS_URL``, reusing one connection pool per URL.
+    """
+    url = settings.REDIS_URL
+    if url == LOCAL_REDIS_URL:
+        return local_redis
+    if url not in _clients:
+        _clients[url] = redis.Redis.from_url(url)
+    return _clients[url]
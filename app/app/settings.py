@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 import os
 from datetime import timedelta
+from decimal import Decimal
 from pathlib import Path
 
 from celery.schedules import crontab
@@ -55,6 +56,7 @@ INSTALLED_APPS = [
     'apps.wallets',
     'apps.transfers',
     'apps.payments',
+    'apps.idempotency',
 ]
 
 REST_FRAMEWORK = {
@@ -183,19 +185,62 @@ AUTH_USER_MODEL = 'users.User'
 
 PROCESSING_FEE = 0.01
 
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://redis:6379')
+
 CACHES = {
     "default": {
         "BACKEND": "django.core.cache.backends.redis.RedisCache",
-        "LOCATION": "redis://redis:6379",
+        "LOCATION": REDIS_URL,
     }
 }
 
 CELERY_BEAT_SCHEDULE = {
+    "dispatch_due_payments": {
+        "task": "apps.payments.tasks.dispatch_due_payments",
+        "schedule": crontab(minute="*"),
+    },
     "update_due_payments": {
         "task": "apps.payments.tasks.update_due_payments",
-        "schedule": crontab(minute="0", hour="*"),
+        "schedule": crontab(minute="5", hour="0"),
+    },
+    "expire_loan_offers": {
+        "task": "apps.loans.tasks.expire_loan_offers",
+        "schedule": crontab(minute="*/15"),
+    },
+    "expire_loan_requests": {
+        "task": "apps.loans.tasks.expire_loan_requests",
+        "schedule": crontab(minute="30", hour="*"),
+    },
+    "assess_late_fees": {
+        "task": "apps.payments.tasks.assess_late_fees",
+        "schedule": crontab(minute="30", hour="0"),
+    },
+    "purge_idempotency_records": {
+        "task": "apps.idempotency.tasks.purge_idempotency_records",
+        "schedule": crontab(minute="45", hour="3"),
     },
 }
 
+# Asynchronous offer acceptances run on FUNDING_QUEUE_SHARDS queues (funding.0, funding.1, ...), a lender's
+# offers always land on the same one; each queue must be consumed by a single worker process, which funding workers
+# check at startup
+FUNDING_QUEUE_SHARDS = int(os.environ.get('FUNDING_QUEUE_SHARDS', 4))
+
+# The daily sweep of due payments runs as this many parallel tasks, each for a share of the borrowers
+DUE_PAYMENTS_SHARDS = int(os.environ.get('DUE_PAYMENTS_SHARDS', 4))
+
+# Late fee policy of unpaid installments, as fractions of the installment: LATE_FEE_RATE is charged once
+# they are more than LATE_FEE_GRACE_DAYS days past due, LATE_FEE_DAILY_RATE is added every further day,
+# and the fee never exceeds LATE_FEE_MAX_RATE
+LATE_FEE_RATE = Decimal(os.environ.get('LATE_FEE_RATE', '0.05'))
+LATE_FEE_DAILY_RATE = Decimal(os.environ.get('LATE_FEE_DAILY_RATE', '0'))
+LATE_FEE_MAX_RATE = Decimal(os.environ.get('LATE_FEE_MAX_RATE', '0.25'))
+LATE_FEE_GRACE_DAYS = int(os.environ.get('LATE_FEE_GRACE_DAYS', 0))
+
+# Pending loan offers older than this many seconds are expired and their reserved funds released
+LOAN_OFFER_TTL = int(os.environ.get('LOAN_OFFER_TTL', 7 * 24 * 60 * 60))
+# Active loan requests older than this many seconds are closed and their pending offers rejected
+LOAN_REQUEST_TTL = int(os.environ.get('LOAN_REQUEST_TTL', 30 * 24 * 60 * 60))
+
 ACTIVE_LOAN_REQUESTS_CACHE_KEY = 'active_loan_requests'
 CACHE_TIMEOUT = 3600
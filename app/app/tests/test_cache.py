@@ -0,0 +1,85 @@
+import time
+from unittest.mock import Mock, patch
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from app.cache import cache_lock, get_or_refresh
+
+
+class GetOrRefreshTests(SimpleTestCase):
+
+    def setUp(self):
+        self.key = 'test:get_or_refresh'
+        cache.delete(self.key)
+        self.addCleanup(cache.delete, self.key)
+
+    def test_value_is_computed_once(self):
+        """
+        Test that a cached value is returned without calling compute again.
+        """
+        compute = Mock(return_value='value')
+
+        self.assertEqual(get_or_refresh(self.key, compute, timeout=60, beta=0), 'value')
+        self.assertEqual(get_or_refresh(self.key, compute, timeout=60, beta=0), 'value')
+        compute.assert_called_once()
+
+    def test_expired_value_is_recomputed(self):
+        """
+        Test that a value past its expiry is rebuilt by the worker that takes the lease.
+        """
+        get_or_refresh(self.key, lambda: 'old', timeout=0, stale_timeout=60)
+
+        self.assertEqual(get_or_refresh(self.key, lambda: 'new', timeout=60), 'new')
+
+    def test_stale_value_served_while_another_worker_refreshes(self):
+        """
+        Test that an expired value within its stale window is served when the lease is taken.
+        """
+        get_or_refresh(self.key, lambda: 'old', timeout=0, stale_timeout=60)
+        compute = Mock(return_value='new')
+
+        with cache_lock(self.key) as acquired:
+            self.assertTrue(acquired)
+            self.assertEqual(get_or_refresh(self.key, compute, timeout=60), 'old')
+
+        compute.assert_not_called()
+
+    def test_cold_key_waits_for_the_lease_holder(self):
+        """
+        Test that a cold key does not trigger a second computation while another worker builds it.
+        """
+        compute = Mock(return_value='mine')
+
+        def other_worker_stores(_):
+            cache.set(self.key, ('theirs', time.time() + 60, 0), 60)
+
+        with cache_lock(self.key), patch('app.cache.time.sleep', side_effect=other_worker_stores):
+            self.assertEqual(get_or_refresh(self.key, compute, timeout=60), 'theirs')
+
+        compute.assert_not_called()
+
+    def test_value_refreshed_early_as_expiry_nears(self):
+        """
+        Test that a slow to compute value close to its expiry is refreshed ahead of time.
+        """
+        cache.set(self.key, ('old', time.time() + 10, 5.0), 60)
+
+        with patch('app.cache.random.random', return_value=0.999):
+            self.assertEqual(get_or_refresh(self.key, lambda: 'new', timeout=60, beta=0), 'old')
+            self.assertEqual(get_or_refresh(self.key, lambda: 'new', timeout=60), 'new')
+
+
+class CacheLockTests(SimpleTestCase):
+
+    def test_lock_is_exclusive_and_released(self):
+        """
+        Test that a lease can only be held once at a time and is released on exit.
+        """
+        with cache_lock('test:cache_lock') as first:
+            with cache_lock('test:cache_lock') as second:
+                self.assertTrue(first)
+                self.assertFalse(second)
+
+        with cache_lock('test:cache_lock') as third:
+            self.assertTrue(third)
@@ -0,0 +1,17 @@
+# Request header carrying the client's key, and its longest accepted value
+IDEMPOTENCY_KEY_HEADER = 'Idempotency-Key'
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+# Header set on responses replayed from a stored one
+IDEMPOTENCY_REPLAYED_HEADER = 'Idempotent-Replayed'
+
+# Response headers stored and replayed along with the body
+IDEMPOTENCY_STORED_HEADERS = ('Location',)
+
+# Stored responses are kept this many seconds in Redis, and purged from the database past it
+IDEMPOTENCY_TTL = 24 * 60 * 60
+
+# Longest time a request holds its key while it runs, a duplicate arriving meanwhile gets a 409
+IDEMPOTENCY_LOCK_TIMEOUT = 30
+
+IDEMPOTENCY_PURGE_BATCH_SIZE = 1000
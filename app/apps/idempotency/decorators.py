@@ -0,0 +1,175 @@
+"""
+Idempotency keys for the endpoints that move money.
+
+A client sends an ``Idempotency-Key`` header with a POST and may retry it freely: the first response
+is stored against ``(user, key)`` and every duplicate gets it replayed without running the view again,
+so wallets are never locked or written twice. The response is recorded in the transaction of the
+view itself, so it is stored if and only if the money moved; Redis keeps a copy for ``IDEMPOTENCY_TTL``
+seconds for fast replays and the database row stays the source of truth when Redis misses or is down.
+"""
+import hashlib
+import json
+import logging
+from contextlib import ExitStack, contextmanager
+from functools import wraps
+
+import redis
+from django.db import IntegrityError
+from drf_yasg import openapi
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from app.cache import cache_lock
+from app.redis import get_redis_client
+from apps.idempotency import config
+from apps.idempotency.models import IdempotencyRecord
+from apps.wallets.locking import retry_on_conflict
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'idempotency'
+
+# Documents the header on the swagger schema of the decorated views
+IDEMPOTENCY_KEY_PARAMETER = openapi.Parameter(
+    config.IDEMPOTENCY_KEY_HEADER, openapi.IN_HEADER, type=openapi.TYPE_STRING, required=False,
+    description="Unique key of the operation, retries with the same key replay the first response")
+
+
+def _redis_key(user_id, key):
+    return f'{KEY_PREFIX}:{user_id}:{key}'
+
+
+def _fingerprint(request):
+    # The parsed body rather than the raw one, so a retry serializing its fields in another order still matches.
+    payload = json.dumps(request.data, sort_keys=True, cls=JSONEncoder)
+    return hashlib.sha256(f'{request.method} {request.get_full_path()} {payload}'.encode()).hexdigest()
+
+
+def _from_record(record):
+    return {'fingerprint': record.fingerprint, 'status_code': record.status_code, 'body': record.body,
+            'headers': record.headers}
+
+
+def _cache(user_id, key, stored):
+    try:
+        get_redis_client().set(_redis_key(user_id, key), json.dumps(stored), ex=config.IDEMPOTENCY_TTL)
+    except redis.RedisError:
+        logger.warning('Could not cache the response of idempotency key %s', key, exc_info=True)
+
+
+def _lookup(user_id, key):
+    """
+    Return the response stored for ``key``, from Redis or else from the database, or None.
+    """
+    try:
+        cached = get_redis_client().get(_redis_key(user_id, key))
+    except redis.RedisError:
+        logger.warning('Could not read idempotency key %s from Redis', key, exc_info=True)
+        cached = None
+    if cached is not None:
+        return json.loads(cached)
+
+    record = IdempotencyRecord.objects.filter(user_id=user_id, key=key).first()
+    if record is None:
+        return None
+    stored = _from_record(record)
+    _cache(user_id, key, stored)
+    return stored
+
+
+def _replay(stored, fingerprint):
+    if stored['fingerprint'] != fingerprint:
+        return Response({'error': 'This Idempotency-Key was already used with a different request.'},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+    headers = {**stored['headers'], config.IDEMPOTENCY_REPLAYED_HEADER: 'true'}
+    return Response(json.loads(stored['body']), status=stored['status_code'], headers=headers)
+
+
+@contextmanager
+def _lease(user_id, key):
+    """
+    Take the lease of ``key`` and yield whether it was acquired. When the cache is unreachable the
+    request runs without it, the unique constraint on ``(user, key)`` then settles concurrent duplicates.
+    """
+    leases = ExitStack()
+    try:
+        acquired = leases.enter_context(cache_lock(_redis_key(user_id, key), config.IDEMPOTENCY_LOCK_TIMEOUT))
+    except redis.RedisError:
+        logger.warning('Could not take the lease of idempotency key %s', key, exc_info=True)
+        acquired = True
+    try:
+        yield acquired
+    finally:
+        try:
+            leases.close()
+        except redis.RedisError:
+            logger.warning('Could not release the lease of idempotency key %s', key, exc_info=True)
+
+
+@retry_on_conflict
+def _run_and_record(view_method, view, request, key, fingerprint, *args, **kwargs):
+    response = view_method(view, request, *args, **kwargs)
+    # Server errors are not stored, the client may retry them
+    if response.status_code >= 500:
+        return response, None
+
+    record = IdempotencyRecord.objects.create(
+        user_id=request.user.id,
+        key=key,
+        fingerprint=fingerprint,
+        status_code=response.status_code,
+        body=json.dumps(response.data, cls=JSONEncoder),
+        headers={name: response[name] for name in config.IDEMPOTENCY_STORED_HEADERS if response.has_header(name)},
+    )
+    return response, record
+
+
+def idempotent(view_method):
+    """
+    Make a POST handler safe to retry with an ``Idempotency-Key`` header.
+
+    Without the header the handler runs as before. With it, the first request runs the handler and
+    records its response in the same transaction; duplicates get that response replayed, a 409 while
+    the first one is still running, or a 422 when the key was used for a different request.
+    """
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(config.IDEMPOTENCY_KEY_HEADER)
+        if key is None:
+            return view_method(self, request, *args, **kwargs)
+        if not key or len(key) > config.IDEMPOTENCY_KEY_MAX_LENGTH:
+            return Response(
+                {'error': f'Idempotency-Key must be 1 to {config.IDEMPOTENCY_KEY_MAX_LENGTH} characters long.'},
+                status=status.HTTP_400_BAD_REQUEST)
+
+        user_id = request.user.id
+        fingerprint = _fingerprint(request)
+        stored = _lookup(user_id, key)
+        if stored is not None:
+            return _replay(stored, fingerprint)
+
+        with _lease(user_id, key) as acquired:
+            if not acquired:
+                return Response({'error': 'A request with this Idempotency-Key is still being processed.'},
+                                status=status.HTTP_409_CONFLICT)
+
+            # The previous holder of the key may have finished between the lookup and the lease
+            stored = _lookup(user_id, key)
+            if stored is not None:
+                return _replay(stored, fingerprint)
+
+            try:
+                response, record = _run_and_record(view_method, self, request, key, fingerprint, *args, **kwargs)
+            except IntegrityError:
+                # A duplicate that outlived the lease committed first, this transaction was rolled back
+                record = IdempotencyRecord.objects.filter(user_id=user_id, key=key).first()
+                if record is None:
+                    raise
+                return _replay(_from_record(record), fingerprint)
+
+            if record is not None:
+                _cache(user_id, key, _from_record(record))
+            return response
+
+    return wrapper
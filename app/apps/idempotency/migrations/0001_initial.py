@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:47
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(help_text='The Idempotency-Key header of the request.', max_length=255)),
+                ('fingerprint', models.CharField(help_text='Hash of the method, path and body of the request the key was first used with.', max_length=64)),
+                ('status_code', models.PositiveSmallIntegerField(help_text='Status code of the stored response.')),
+                ('body', models.TextField(help_text='JSON body of the stored response.')),
+                ('headers', models.JSONField(default=dict, help_text='Replayed headers of the stored response.')),
+                ('created', models.DateTimeField(db_index=True, default=django.utils.timezone.now, help_text='Timestamp when the response was stored.')),
+                ('user', models.ForeignKey(help_text='The user who sent the request.', on_delete=django.db.models.deletion.CASCADE, related_name='idempotency_records', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='idempotencyrecord',
+            constraint=models.UniqueConstraint(fields=('user', 'key'), name='idempotency_record_user_key'),
+        ),
+    ]
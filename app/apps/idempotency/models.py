@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+from apps.idempotency import config
+
+
+class IdempotencyRecord(models.Model):
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='idempotency_records',
+        help_text="The user who sent the request."
+    )
+    key = models.CharField(
+        max_length=config.IDEMPOTENCY_KEY_MAX_LENGTH,
+        help_text="The Idempotency-Key header of the request."
+    )
+    fingerprint = models.CharField(
+        max_length=64,
+        help_text="Hash of the method, path and body of the request the key was first used with."
+    )
+    status_code = models.PositiveSmallIntegerField(
+        help_text="Status code of the stored response."
+    )
+    body = models.TextField(
+        help_text="JSON body of the stored response."
+    )
+    headers = models.JSONField(
+        default=dict,
+        help_text="Replayed headers of the stored response."
+    )
+    created = models.DateTimeField(
+        default=timezone.now,
+        db_index=True,
+        help_text="Timestamp when the response was stored."
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='idempotency_record_user_key'),
+        ]
+
+    def __str__(self):
+        return f"Idempotency key {self.key} of user {self.user_id} - {self.status_code}"
@@ -0,0 +1,30 @@
+from datetime import timedelta
+
+from celery import shared_task
+from celery.utils.log import get_task_logger
+from django.utils import timezone
+
+from apps.idempotency import config
+from apps.idempotency.models import IdempotencyRecord
+
+logger = get_task_logger(__name__)
+
+
+@shared_task
+def purge_idempotency_records(batch_size=config.IDEMPOTENCY_PURGE_BATCH_SIZE):
+    """
+    Delete the stored responses older than ``IDEMPOTENCY_TTL``, one batch at a time, and return how many
+    were deleted. Past that age a key is forgotten and a retry runs as a new request.
+    """
+    cutoff = timezone.now() - timedelta(seconds=config.IDEMPOTENCY_TTL)
+    purged = 0
+    while True:
+        ids = list(IdempotencyRecord.objects.filter(created__lt=cutoff).values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        purged += IdempotencyRecord.objects.filter(id__in=ids).delete()[0]
+        if len(ids) < batch_size:
+            break
+
+    logger.info('Purged %s idempotency records', purged)
+    return purged
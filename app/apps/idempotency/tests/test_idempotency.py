@@ -0,0 +1,184 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from app.cache import cache_lock
+from app.redis import LOCAL_REDIS_URL, local_redis
+from apps.idempotency import config
+from apps.idempotency.decorators import _redis_key
+from apps.idempotency.models import IdempotencyRecord
+from apps.idempotency.tasks import purge_idempotency_records
+from apps.loans.models.loan import Loan
+from apps.loans.models.loan_offer import LoanOffer
+from apps.loans.models.loan_request import LoanRequest
+from apps.transfers.models import Transfer
+from apps.users import config as user_config
+from apps.wallets.models import Wallet
+
+User = get_user_model()
+
+# Nothing listens on port 1, connections are refused at once
+UNREACHABLE_REDIS_URL = 'redis://127.0.0.1:1/0'
+
+
+@override_settings(REDIS_URL=LOCAL_REDIS_URL)
+class IdempotencyKeyTests(APITestCase):
+
+    def setUp(self):
+        local_redis.flushall()
+
+        self.lender = User.objects.create_user(
+            username='lender',
+            email='user@lender.com',
+            password='lenderpass',
+            user_type=user_config.USER_TYPE_LENDER,
+        )
+        Wallet.objects.filter(user=self.lender).update(balance=10000)
+        self.deposit_url = reverse('api-v1:wallets:deposit')
+        self.client.force_authenticate(user=self.lender)
+
+    def deposit(self, amount, key=None):
+        headers = {'HTTP_IDEMPOTENCY_KEY': key} if key is not None else {}
+        return self.client.post(self.deposit_url, {'amount': amount}, format='json', **headers)
+
+    def balance(self, user):
+        return Wallet.objects.get(user=user).balance
+
+    def test_duplicate_is_replayed_without_moving_money(self):
+        """
+        Test that a retried deposit gets the first response back and the wallet is credited once.
+        """
+        first = self.deposit('100.00', key='deposit-1')
+        second = self.deposit('100.00', key='deposit-1')
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second[config.IDEMPOTENCY_REPLAYED_HEADER], 'true')
+        self.assertFalse(first.has_header(config.IDEMPOTENCY_REPLAYED_HEADER))
+        self.assertEqual(self.balance(self.lender), Decimal('10100.00'))
+        self.assertEqual(Transfer.objects.filter(user=self.lender).count(), 1)
+
+    def test_requests_without_key_are_not_deduplicated(self):
+        """
+        Test that requests without an Idempotency-Key header all run.
+        """
+        self.deposit('100.00')
+        self.deposit('100.00')
+
+        self.assertEqual(self.balance(self.lender), Decimal('10200.00'))
+        self.assertFalse(IdempotencyRecord.objects.exists())
+
+    def test_replays_from_database_when_redis_misses(self):
+        """
+        Test that the stored response is read back from the database once Redis lost it.
+        """
+        first = self.deposit('100.00', key='deposit-1')
+        local_redis.flushall()
+
+        second = self.deposit('100.00', key='deposit-1')
+
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(self.balance(self.lender), Decimal('10100.00'))
+        self.assertIsNotNone(local_redis.get(_redis_key(self.lender.id, 'deposit-1')))
+
+    def test_key_reused_with_another_request_is_rejected(self):
+        """
+        Test that a key sent again with a different body gets a 422 and moves no money.
+        """
+        self.deposit('100.00', key='deposit-1')
+        response = self.deposit('250.00', key='deposit-1')
+
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(self.balance(self.lender), Decimal('10100.00'))
+
+    def test_keys_are_scoped_to_the_user(self):
+        """
+        Test that another user sending the same key gets its own request run.
+        """
+        other = User.objects.create_user(username='other', email='other@lender.com', password='pass',
+                                         user_type=user_config.USER_TYPE_LENDER)
+        self.deposit('100.00', key='deposit-1')
+        self.client.force_authenticate(user=other)
+        response = self.deposit('100.00', key='deposit-1')
+
+        self.assertFalse(response.has_header(config.IDEMPOTENCY_REPLAYED_HEADER))
+        self.assertEqual(self.balance(other), Decimal('100.00'))
+
+    def test_duplicate_of_running_request_conflicts(self):
+        """
+        Test that a duplicate arriving while the first request still holds the key gets a 409.
+        """
+        with cache_lock(_redis_key(self.lender.id, 'deposit-1')):
+            response = self.deposit('100.00', key='deposit-1')
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(self.balance(self.lender), Decimal('10000.00'))
+
+    def test_falls_back_to_the_database_when_redis_is_down(self):
+        """
+        Test that a keyed request still runs and is replayed from the database when Redis is unreachable.
+        """
+        with override_settings(REDIS_URL=UNREACHABLE_REDIS_URL, CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': UNREACHABLE_REDIS_URL}}), \
+                self.assertLogs('apps.idempotency.decorators', 'WARNING'):
+            first = self.deposit('100.00', key='deposit-1')
+            second = self.deposit('100.00', key='deposit-1')
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second[config.IDEMPOTENCY_REPLAYED_HEADER], 'true')
+        self.assertEqual(self.balance(self.lender), Decimal('10100.00'))
+
+    def test_failed_withdrawal_is_replayed(self):
+        """
+        Test that a rejected withdrawal is stored too, so a retry does not succeed after a deposit.
+        """
+        url = reverse('api-v1:wallets:withdraw')
+        first = self.client.post(url, {'amount': '20000'}, format='json', HTTP_IDEMPOTENCY_KEY='withdraw-1')
+        self.deposit('20000')
+        second = self.client.post(url, {'amount': '20000'}, format='json', HTTP_IDEMPOTENCY_KEY='withdraw-1')
+
+        self.assertEqual(first.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(second.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.balance(self.lender), Decimal('30000.00'))
+
+    def test_accepting_offer_twice_funds_one_loan(self):
+        """
+        Test that a retried acceptance replays the created loan instead of answering that the request is closed.
+        """
+        borrower = User.objects.create_user(username='borrower', email='user@borrower.com', password='pass',
+                                            user_type=user_config.USER_TYPE_BORROWER)
+        loan_request = LoanRequest.objects.create(borrower=borrower, requested_amount=5000,
+                                                  repayment_period_months=12)
+        loan_offer = LoanOffer.objects.create(loan_request=loan_request, lender=self.lender, offered_amount=5000,
+                                              interest_rate=5)
+        url = reverse('api-v1:loans:offers:respond', kwargs={'offer_id': loan_offer.id, 'action': 'accept'})
+
+        self.client.force_authenticate(user=borrower)
+        first = self.client.post(url, format='json', HTTP_IDEMPOTENCY_KEY='accept-1')
+        second = self.client.post(url, format='json', HTTP_IDEMPOTENCY_KEY='accept-1')
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(Loan.objects.count(), 1)
+        self.assertEqual(self.balance(borrower), Decimal('5000.00'))
+
+    def test_purge_deletes_expired_records(self):
+        """
+        Test that the purge task deletes only the records older than the TTL.
+        """
+        self.deposit('100.00', key='old')
+        self.deposit('100.00', key='recent')
+        IdempotencyRecord.objects.filter(key='old').update(
+            created=timezone.now() - timedelta(seconds=config.IDEMPOTENCY_TTL + 60))
+
+        self.assertEqual(purge_idempotency_records(batch_size=1), 1)
+        self.assertEqual(list(IdempotencyRecord.objects.values_list('key', flat=True)), ['recent'])
@@ -0,0 +1,213 @@
+"""
+Amortization engine for fixed-rate, equal-installment loans.
+
+Schedules are computed with NumPy for many ``(principal, annual rate, term)`` triples at once.
+Money is kept in integer cents so every schedule balances to the cent; rounding is half up, and
+the last installment absorbs the rounding so the principal parts always sum to the principal.
+The Decimal helpers at the bottom wrap the batch functions for single offers and loans.
+"""
+from collections import namedtuple
+from datetime import date
+from decimal import Decimal
+from functools import lru_cache
+
+import numpy as np
+
+from apps.loans import config
+
+APR_ITERATIONS = 80
+
+# Every array is (number of loans, longest term); months past a loan's own term are zero.
+Schedules = namedtuple('Schedules', ['payment', 'installment', 'principal', 'interest', 'balance', 'active'])
+Installment = namedtuple('Installment', ['number', 'due_date', 'amount', 'principal', 'interest', 'balance'])
+AmortizationSummary = namedtuple('AmortizationSummary', ['monthly_payment', 'total_interest', 'total_repayable_amount',
+                                                         'apr', 'installments'])
+
+
+def to_decimal(value):
+    # str() first so floats such as settings.PROCESSING_FEE keep their written value.
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+def _floats(values):
+    # Accepts Decimals, numbers or numeric strings, one value or a sequence.
+    return np.atleast_1d(np.asarray(values)).astype(np.float64)
+
+
+def _round_half_up(values):
+    return np.floor(np.asarray(values, dtype=np.float64) + 0.5).astype(np.int64)
+
+
+def to_cents(amounts):
+    return _round_half_up(_floats(amounts) * 100)
+
+
+def from_cents(cents):
+    return Decimal(int(cents)).scaleb(-2)
+
+
+def monthly_payments(principal_cents, annual_rates, months):
+    """
+    Monthly installments in cents: M = P [ r(1 + r)^n ] / [ (1 + r)^n – 1 ]
+
+    Where P is the principal, r the monthly rate (annual percentage / 12 / 100) and n the number of months.
+    """
+    principal_cents = np.asarray(principal_cents, dtype=np.int64)
+    rates = np.asarray(annual_rates, dtype=np.float64) / 1200
+    months = np.asarray(months, dtype=np.int64)
+
+    growth = np.power(1 + rates, months)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        annuity = _round_half_up(principal_cents * rates * growth / (growth - 1))
+    # Zero rate loans repay the principal in equal parts, rounded half up in integer arithmetic.
+    flat = (2 * principal_cents + months) // (2 * months)
+    return np.where(rates == 0, flat, annuity)
+
+
+def build_schedules(principals, annual_rates, months):
+    """
+    Full schedules of many loans at once, in cents. The recursion over months is a loop over the
+    longest term, each step being vectorized across every loan.
+    """
+    principal_cents = to_cents(principals)
+    rates = _floats(annual_rates) / 1200
+    months = np.atleast_1d(np.asarray(months, dtype=np.int64))
+    payment = monthly_payments(principal_cents, rates * 1200, months)
+
+    count, term = len(principal_cents), int(months.max(initial=0))
+    installment = np.zeros((count, term), dtype=np.int64)
+    principal = np.zeros_like(installment)
+    interest = np.zeros_like(installment)
+    balance = np.zeros_like(installment)
+    active = np.arange(term) < months[:, None]
+
+    remaining = principal_cents.copy()
+    for month in range(term):
+        running = active[:, month]
+        month_interest = _round_half_up(remaining * rates)
+        # The last installment clears whatever is left, absorbing the rounding of the others.
+        month_principal = np.where(month == months - 1, remaining,
+                                   np.clip(payment - month_interest, 0, remaining))
+        month_interest = np.where(running, month_interest, 0)
+        month_principal = np.where(running, month_principal, 0)
+        remaining = remaining - month_principal
+
+        principal[:, month] = month_principal
+        interest[:, month] = month_interest
+        installment[:, month] = month_principal + month_interest
+        balance[:, month] = np.where(running, remaining, 0)
+
+    return Schedules(payment, installment, principal, interest, balance, active)
+
+
+def annual_percentage_rates(financed_cents, payment_cents, months):
+    """
+    Nominal annual rates (in percent) at which ``months`` payments of ``payment_cents`` repay ``financed_cents``.
+    """
+    financed = np.asarray(financed_cents, dtype=np.float64)
+    payment = np.asarray(payment_cents, dtype=np.float64)
+    months = np.asarray(months, dtype=np.float64)
+
+    # The present value of the payments falls as the rate grows, bisect the monthly rate of every loan.
+    low, high = np.zeros_like(financed), np.ones_like(financed)
+    for _ in range(APR_ITERATIONS):
+        middle = (low + high) / 2
+        present_value = payment * (1 - np.power(1 + middle, -months)) / middle
+        too_low = present_value > financed
+        low = np.where(too_low, middle, low)
+        high = np.where(too_low, high, middle)
+    return np.where(payment * months <= financed, 0.0, high * 1200)
+
+
+def price_offers(principals, annual_rates, months, admin_fees):
+    """
+    Price many offers at once. Returns ``(payment, total_interest, total_repayable_amount)`` in cents
+    and the APR in percent, where ``admin_fees`` are fractions of the principal taken as a finance charge.
+    """
+    return _price(build_schedules(principals, annual_rates, months), months, admin_fees)
+
+
+def _price(schedules, months, admin_fees):
+    principal_cents = schedules.principal.sum(axis=1)
+    fees = _round_half_up(principal_cents * _floats(admin_fees))
+    total_paid = schedules.installment.sum(axis=1)
+    apr = annual_percentage_rates(principal_cents - fees, schedules.payment, np.atleast_1d(months))
+    return schedules.payment, total_paid - principal_cents, total_paid + fees, apr
+
+
+def due_dates(start, months):
+    """
+    Due dates of ``months`` installments, one calendar month apart starting a month after ``start``.
+    The day of month is kept, falling back to the last day of shorter months.
+    """
+    first_month = np.datetime64(start, 'M')
+    month_starts = first_month + np.arange(1, months + 1)
+    month_lengths = (month_starts + 1).astype('datetime64[D]') - month_starts.astype('datetime64[D]')
+    days = np.minimum(start.day, month_lengths.astype(np.int64))
+    return month_starts.astype('datetime64[D]') + (days - 1)
+
+
+def monthly_payment(principal, annual_rate, months):
+    """
+    Monthly installment of a single loan, as a Decimal rounded to the cent.
+    """
+    return from_cents(monthly_payments(to_cents(principal), _floats(annual_rate), [months])[0])
+
+
+def to_rate(percent):
+    # Rates are stored with four decimal places.
+    return Decimal(int(_round_half_up(percent * 10000))).scaleb(-4)
+
+
+def _summary(priced):
+    payment, total_interest, total_repayable_amount, apr = priced
+    return (from_cents(payment[0]), from_cents(total_interest[0]), from_cents(total_repayable_amount[0]),
+            to_rate(apr[0]))
+
+
+def _rows(schedules, months, dates=None):
+    return [
+        Installment(number=month + 1, due_date=dates[month].item() if dates is not None else None,
+                    amount=from_cents(schedules.installment[0, month]),
+                    principal=from_cents(schedules.principal[0, month]),
+                    interest=from_cents(schedules.interest[0, month]),
+                    balance=from_cents(schedules.balance[0, month]))
+        for month in range(months)
+    ]
+
+
+def price_offer(principal, annual_rate, months, admin_fee):
+    """
+    Return ``(monthly_payment, total_interest, total_repayable_amount, apr)`` of a single offer as Decimals.
+    """
+    return _summary(price_offers([principal], [annual_rate], [months], [admin_fee]))
+
+
+def schedule(principal, annual_rate, months, start=None):
+    """
+    Installments of a single loan as Decimal rows, due monthly from ``start`` (today by default).
+    """
+    return _rows(build_schedules([principal], [annual_rate], [months]), months,
+                 due_dates(start or date.today(), months))
+
+
+@lru_cache(maxsize=config.SCHEDULE_CACHE_SIZE)
+def memoized_schedule(principal, annual_rate, months, admin_fee):
+    """
+    Summary and undated installments of a loan shape, computed once per process for each
+    ``(principal, rate, term, fee)``. The result is shared between callers, so it is immutable.
+    """
+    schedules = build_schedules([principal], [annual_rate], [months])
+    return AmortizationSummary(*_summary(_price(schedules, [months], [admin_fee])),
+                               installments=tuple(_rows(schedules, months)))
+
+
+def dated_schedule(principal, annual_rate, months, admin_fee, start=None):
+    """
+    Memoized summary of a loan shape, with installments due monthly from ``start`` (today by default).
+    """
+    summary = memoized_schedule(to_decimal(principal), to_decimal(annual_rate), months, to_decimal(admin_fee))
+    dates = due_dates(start or date.today(), months)
+    return summary._replace(installments=[
+        installment._replace(due_date=dates[index].item()) for index, installment in enumerate(summary.installments)
+    ])
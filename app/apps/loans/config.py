@@ -21,3 +21,41 @@ OFFER_STATUS_CHOICES = [
     (OFFER_STATUS_REJECTED, 'Rejected'),
     (OFFER_STATUS_EXPIRED, 'Expired'),
 ]
+
+
+# Loan request marketplace pagination
+LOAN_REQUESTS_PAGE_SIZE = 20
+LOAN_REQUESTS_MAX_PAGE_SIZE = 100
+# Seconds a reader waits for another worker to build a page it has no previous version of
+LOAN_REQUESTS_PAGE_BUILD_TIMEOUT = 5
+
+# Number of (principal, rate, term, fee) schedules memoized per process
+SCHEDULE_CACHE_SIZE = 1024
+
+# Maximum number of offers in one bulk creation request
+BULK_LOAN_OFFERS_MAX_SIZE = 100
+
+# Number of offers or loan requests expired per UPDATE by the expiry sweepers
+OFFER_EXPIRY_BATCH_SIZE = 500
+LOAN_REQUEST_EXPIRY_BATCH_SIZE = 500
+
+# Number of offers returned by the best offers endpoint of a loan request
+BEST_OFFERS_LIMIT = 5
+BEST_OFFERS_MAX_LIMIT = 50
+
+# Asynchronous offer acceptance jobs
+FUNDING_JOB_QUEUED = 'queued'
+FUNDING_JOB_PROCESSING = 'processing'
+FUNDING_JOB_SUCCEEDED = 'succeeded'
+FUNDING_JOB_FAILED = 'failed'
+
+FUNDING_JOB_STATUS_CHOICES = [
+    (FUNDING_JOB_QUEUED, 'Queued'),
+    (FUNDING_JOB_PROCESSING, 'Processing'),
+    (FUNDING_JOB_SUCCEEDED, 'Succeeded'),
+    (FUNDING_JOB_FAILED, 'Failed'),
+]
+
+# Seconds a job status can be polled after its last change
+FUNDING_JOB_TTL = 24 * 60 * 60
+FUNDING_QUEUE_PREFIX = 'funding'
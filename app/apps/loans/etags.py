@@ -0,0 +1,33 @@
+"""
+ETags of the loan list endpoints, derived from version counters so a conditional GET is answered
+with a cache read before any database query or serialization runs.
+"""
+from django.db import transaction
+
+from app.cache import bump_version, get_version
+from apps.loans.loan_request_cache import get_generation
+from apps.users import config as user_config
+
+
+def loan_offers_scope(user_id):
+    return f'loan_offers:{user_id}'
+
+
+def bump_loan_offers_versions(user_ids):
+    """
+    Invalidate the offer lists of the given users once the current transaction commits.
+    """
+    scopes = [loan_offers_scope(user_id) for user_id in set(user_ids) if user_id is not None]
+    transaction.on_commit(lambda: bump_version(*scopes))
+
+
+def loan_requests_etag(request, *args, **kwargs):
+    # Only lenders can list loan requests, the others must still get their 403.
+    if request.user.user_type != user_config.USER_TYPE_LENDER:
+        return None
+    generation = get_generation()
+    return f'"loan-requests-{generation}"' if generation is not None else None
+
+
+def loan_offers_etag(request, *args, **kwargs):
+    return f'"loan-offers-{request.user.id}-{get_version(loan_offers_scope(request.user.id))}"'
@@ -0,0 +1,167 @@
+"""
+Funding of a loan from an accepted offer, in a fixed number of statements whatever the size of the
+schedule or the number of competing offers.
+
+Every wallet involved (lender, borrower and the lenders of the competing offers) is locked with
+one ``SELECT ... FOR UPDATE`` in id order and changed with ``F()`` updates, rows that only change status are
+updated without being loaded, and the cache work and the scheduling of the installments on the payment
+timer wheel run once the transaction commits.
+"""
+from functools import partial
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from apps.loans import amortization, config
+from apps.loans.etags import bump_loan_offers_versions
+from apps.loans.loan_request_cache import evict_loan_requests
+from apps.loans.models.loan import Loan
+from apps.loans.models.loan_offer import LoanOffer
+from apps.loans.models.loan_request import LoanRequest
+from apps.payments.models import Payment
+from apps.payments.scheduler import schedule_payments
+from apps.transfers import config as transfer_config
+from apps.transfers.models import Transfer
+from apps.wallets.locking import lock_wallets
+from apps.wallets.models import Wallet
+
+
+def loan_offers_for_funding():
+    """
+    Offers with everything ``fund_loan_offer`` reads, locked together with their loan request.
+    """
+    return LoanOffer.objects.select_related('lender', 'loan_request__borrower').select_for_update(
+        of=('self', 'loan_request'))
+
+
+def funding_queue(lender_id):
+    """
+    Celery queue of the asynchronous acceptances of a lender's offers. A lender always maps to the
+    same queue and each queue has a single consumer, so fundings from one wallet never contend.
+    """
+    return f'{config.FUNDING_QUEUE_PREFIX}.{lender_id % settings.FUNDING_QUEUE_SHARDS}'
+
+
+def check_funding_worker(queues, concurrency):
+    """
+    Refuse to start a worker that would break the single consumer per funding queue: a worker taking
+    funding queues must run one process (``-c 1``) on exactly one of the ``FUNDING_QUEUE_SHARDS`` queues.
+    Raises ``ImproperlyConfigured`` otherwise.
+    """
+    funding_queues = sorted(queue for queue in queues if queue.startswith(f'{config.FUNDING_QUEUE_PREFIX}.'))
+    if not funding_queues:
+        return
+    shards = {funding_queue(shard) for shard in range(settings.FUNDING_QUEUE_SHARDS)}
+    unknown = [queue for queue in funding_queues if queue not in shards]
+    if unknown:
+        raise ImproperlyConfigured(f'Funding queues {", ".join(unknown)} do not exist with '
+                                   f'FUNDING_QUEUE_SHARDS={settings.FUNDING_QUEUE_SHARDS}.')
+    if len(funding_queues) > 1 or concurrency != 1:
+        raise ImproperlyConfigured(f'A funding worker must consume a single funding queue with concurrency 1, '
+                                   f'got {", ".join(funding_queues)} with concurrency {concurrency}.')
+
+
+def fund_loan_offer(loan_offer):
+    """
+    Accept ``loan_offer`` and fund its loan, returning the new loan.
+
+    The offer must come with its lender, its loan request and the borrower (``select_related``), locked
+    by the caller's transaction. Raises ``ValueError`` when the offer is no longer pending, or when the
+    lender cannot cover the offered amount and the admin fee.
+    """
+    loan_request = loan_offer.loan_request
+    lender_id, borrower_id = loan_offer.lender_id, loan_request.borrower_id
+    offered_amount = loan_offer.offered_amount
+    total_amount = loan_offer.funding_amount
+
+    # Expired, rejected or accepted offers gave their reservation back already, they cannot be funded
+    if loan_offer.offer_status != config.OFFER_STATUS_PENDING:
+        raise ValueError('This loan offer is no longer pending.')
+
+    with transaction.atomic():
+        # The competing pending offers give their reserved funds back. They are locked before their lenders'
+        # wallets, in the same order as the expiry tasks, so a concurrent expiry can neither deadlock with
+        # this funding nor release them a second time.
+        remaining_offers = list(
+            LoanOffer.objects.filter(loan_request_id=loan_request.pk, offer_status=config.OFFER_STATUS_PENDING)
+            .exclude(pk=loan_offer.pk).select_for_update(of=('self',)).order_by('id')
+            .only('id', 'lender', 'offered_amount', 'admin_fee'))
+        wallets = lock_wallets([lender_id, borrower_id, *(offer.lender_id for offer in remaining_offers)])
+        # The offer is paid from its own reservation, the rest of the reserved funds belong to other offers
+        lender_wallet = wallets[lender_id]
+        if lender_wallet.balance - max(lender_wallet.reserved_amount - total_amount, 0) < total_amount:
+            raise ValueError('Insufficient funds in lender\'s wallet.')
+
+        funded_at = timezone.now()
+        loan = Loan.objects.create(
+            borrower=loan_request.borrower,
+            amount=offered_amount,
+            duration_months=loan_request.repayment_period_months,
+            annual_interest_rate=loan_offer.interest_rate,
+            admin_fee=loan_offer.admin_fee,
+            lender_id=lender_id,
+            funded_at=funded_at,
+            status=config.FUNDED,
+            loan_offer=loan_offer,
+            remaining_installments=loan_request.repayment_period_months,
+            outstanding_principal=offered_amount
+        )
+
+        # The funds reserved by the offer are paid out
+        Wallet.objects.filter(pk=lender_wallet.pk).update(
+            balance=F('balance') - total_amount,
+            reserved_amount=Greatest(F('reserved_amount') - total_amount, Value(0),
+                                     output_field=models.DecimalField()),
+        )
+        Wallet.objects.filter(pk=wallets[borrower_id].pk).update(balance=F('balance') + offered_amount)
+
+        Transfer.objects.create(
+            user_id=lender_id,
+            amount=total_amount,
+            transfer_type=transfer_config.TRANSFER_TYPE_FUND_LOAN,
+            transfer_status=transfer_config.TRANSFER_STATUS_COMPLETED,
+            from_account=loan_offer.lender,
+            to_account=loan_request.borrower,
+            loan_request=loan_request,
+            loan=loan,
+            borrower_id=borrower_id
+        )
+
+        schedule = amortization.dated_schedule(offered_amount, loan_offer.interest_rate, loan.duration_months,
+                                               loan_offer.admin_fee, start=funded_at.date())
+        payments = Payment.objects.bulk_create([
+            Payment(
+                loan=loan,
+                borrower_id=borrower_id,
+                payment_amount=installment.amount,
+                principal_amount=installment.principal,
+                interest_amount=installment.interest,
+                payment_due_date=installment.due_date
+            )
+            for installment in schedule.installments
+        ])
+
+        LoanOffer.objects.filter(pk=loan_offer.pk).update(offer_status=config.OFFER_STATUS_ACCEPTED)
+        LoanRequest.objects.filter(pk=loan_request.pk).update(is_active=False)
+
+        # The competing offers are rejected. They are locked and were still pending when read, so the
+        # guarded UPDATE changes exactly these rows and each reservation is released once.
+        LoanOffer.objects.filter(pk__in=[offer.pk for offer in remaining_offers],
+                                 offer_status=config.OFFER_STATUS_PENDING).update(
+            offer_status=config.OFFER_STATUS_REJECTED)
+        LoanOffer.release_reservations(remaining_offers)
+
+        # update() sends no signals, the caches are invalidated here once the funding is committed. Every
+        # offer on the request embeds it, so all its lenders get a new version, whatever their offer's status.
+        bump_loan_offers_versions([borrower_id, *LoanOffer.objects.filter(loan_request_id=loan_request.pk)
+                                   .values_list('lender_id', flat=True)])
+        transaction.on_commit(partial(evict_loan_requests, [loan_request.pk]))
+        transaction.on_commit(partial(schedule_payments, payments))
+
+    loan_offer.offer_status = config.OFFER_STATUS_ACCEPTED
+    loan_request.is_active = False
+    return loan
@@ -0,0 +1,44 @@
+"""
+Status of asynchronous offer acceptances, kept in Redis as one hash per job for ``FUNDING_JOB_TTL`` seconds.
+"""
+import uuid
+
+from app.redis import get_redis_client
+from apps.loans import config
+
+JOB_KEY_PREFIX = 'funding_job'
+
+
+def _job_key(job_id):
+    return f'{JOB_KEY_PREFIX}:{job_id}'
+
+
+def create_funding_job(loan_offer):
+    """
+    Register a queued acceptance of ``loan_offer`` and return its job id.
+    """
+    job_id = uuid.uuid4().hex
+    pipe = get_redis_client().pipeline()
+    pipe.hset(_job_key(job_id), mapping={
+        'status': config.FUNDING_JOB_QUEUED,
+        'loan_offer': loan_offer.id,
+        'borrower': loan_offer.loan_request.borrower_id,
+    })
+    pipe.expire(_job_key(job_id), config.FUNDING_JOB_TTL)
+    pipe.execute()
+    return job_id
+
+
+def update_funding_job(job_id, **fields):
+    pipe = get_redis_client().pipeline()
+    pipe.hset(_job_key(job_id), mapping=fields)
+    pipe.expire(_job_key(job_id), config.FUNDING_JOB_TTL)
+    pipe.execute()
+
+
+def get_funding_job(job_id):
+    """
+    Return the fields of a job as strings, or None once it is unknown or expired.
+    """
+    job = get_redis_client().hgetall(_job_key(job_id))
+    return {key.decode(): value.decode() for key, value in job.items()} or None
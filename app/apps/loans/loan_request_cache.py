@@ -0,0 +1,239 @@
+"""
+Redis-backed store of the active loan requests shown to lenders.
+
+Each active request is kept as a serialized JSON row in a hash keyed by id, and a sorted set
+orders the ids by ``(created, id)``. Writes only touch the affected row; the whole store is
+rebuilt from the database only when it is cold or due for its periodic resync, by one worker at a time.
+
+On top of the rows, every served page is cached as ready-to-send JSON bytes tagged with the
+store generation, so a warm read is a single round trip with no ORM or serializer work. Every write
+moves the generation, and a page of the new generation is then built by one worker at a time: the
+other readers keep serving the previous version of the page meanwhile, or wait for it when there is none.
+"""
+import hashlib
+import json
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.renderers import JSONRenderer
+
+from app.cache import WAIT_INTERVAL, cache_lock, get_or_refresh
+from app.redis import get_redis_client
+from apps.loans import config
+from apps.loans.models.loan_request import LoanRequest
+from apps.loans.pagination import decode_cursor, encode_cursor, from_score, to_score
+from apps.loans.serializers.loan_requests_serializers import LoanRequestSerializer
+
+ROWS_KEY = f'{settings.ACTIVE_LOAN_REQUESTS_CACHE_KEY}:rows'
+INDEX_KEY = f'{settings.ACTIVE_LOAN_REQUESTS_CACHE_KEY}:index'
+READY_KEY = f'{settings.ACTIVE_LOAN_REQUESTS_CACHE_KEY}:ready'
+GENERATION_KEY = f'{settings.ACTIVE_LOAN_REQUESTS_CACHE_KEY}:generation'
+PAGE_KEY_PREFIX = f'{settings.ACTIVE_LOAN_REQUESTS_CACHE_KEY}:page'
+
+
+def _member(loan_request_id):
+    # Zero padded so members with the same score sort by id.
+    return f'{loan_request_id:020d}'
+
+
+def _score(loan_request):
+    return to_score(loan_request.created)
+
+
+def _render(loan_request):
+    return JSONRenderer().render(LoanRequestSerializer(loan_request).data)
+
+
+def cache_loan_request(loan_request):
+    """
+    Insert or refresh the row of an active loan request, or drop it once the request is inactive.
+    """
+    if not loan_request.is_active:
+        evict_loan_requests([loan_request.pk])
+        return
+
+    member = _member(loan_request.pk)
+    pipe = get_redis_client().pipeline()
+    pipe.hset(ROWS_KEY, member, _render(loan_request))
+    pipe.zadd(INDEX_KEY, {member: _score(loan_request)})
+    pipe.incr(GENERATION_KEY)
+    pipe.execute()
+
+
+def evict_loan_requests(loan_request_ids):
+    """
+    Remove the rows of the given loan requests from the store.
+    """
+    members = [_member(loan_request_id) for loan_request_id in loan_request_ids]
+    if not members:
+        return
+
+    pipe = get_redis_client().pipeline()
+    pipe.hdel(ROWS_KEY, *members)
+    pipe.zrem(INDEX_KEY, *members)
+    pipe.incr(GENERATION_KEY)
+    pipe.execute()
+
+
+def rebuild_active_loan_requests():
+    """
+    Reload every active loan request from the database, returning how many were cached.
+    """
+    rows, scores = {}, {}
+    for loan_request in LoanRequest.objects.filter(is_active=True).iterator():
+        member = _member(loan_request.pk)
+        rows[member] = _render(loan_request)
+        scores[member] = _score(loan_request)
+
+    pipe = get_redis_client().pipeline()
+    pipe.delete(ROWS_KEY, INDEX_KEY)
+    if rows:
+        pipe.hset(ROWS_KEY, mapping=rows)
+        pipe.zadd(INDEX_KEY, scores)
+    pipe.incr(GENERATION_KEY)
+    pipe.execute()
+    return len(rows)
+
+
+def _ensure_ready():
+    # Rows are kept current write by write, the periodic rebuild only resyncs drift. So the previous
+    # build keeps serving while a single worker rebuilds, and concurrent cold readers wait for it.
+    get_or_refresh(READY_KEY, rebuild_active_loan_requests, timeout=settings.CACHE_TIMEOUT,
+                   stale_timeout=settings.CACHE_TIMEOUT)
+
+
+def _page_from_store(client, position, page_size):
+    if position is None:
+        entries = client.zrange(INDEX_KEY, 0, page_size, withscores=True)
+    else:
+        score, loan_request_id = position
+        after = _member(loan_request_id).encode()
+        # Entries sharing the cursor score come back too, skip the ones already served.
+        ties = client.zcount(INDEX_KEY, score, score)
+        entries = client.zrangebyscore(INDEX_KEY, score, '+inf', start=0, num=page_size + 1 + ties,
+                                       withscores=True)
+        entries = [(member, member_score) for member, member_score in entries
+                   if member_score > score or member > after][:page_size + 1]
+
+    page = entries[:page_size]
+    rows = client.hmget(ROWS_KEY, [member for member, _ in page]) if page else []
+    next_position = None
+    if len(entries) > page_size:
+        last_member, last_score = page[-1]
+        next_position = (int(last_score), int(last_member))
+    return rows, next_position
+
+
+def _page_from_database(position, page_size, filters):
+    loan_requests = LoanRequest.objects.filter(is_active=True, **filters).order_by('created', 'id')
+    if position is not None:
+        score, loan_request_id = position
+        created = from_score(score)
+        loan_requests = loan_requests.filter(Q(created__gt=created) | Q(created=created, id__gt=loan_request_id))
+
+    loan_requests = list(loan_requests[:page_size + 1])
+    page = loan_requests[:page_size]
+    next_position = None
+    if len(loan_requests) > page_size:
+        next_position = (_score(page[-1]), page[-1].pk)
+    return [_render(loan_request) for loan_request in page], next_position
+
+
+def _page_key(cursor, page_size, filters):
+    query = urlencode(sorted({'cursor': cursor or '', 'page_size': page_size, **filters}.items()))
+    return f'{PAGE_KEY_PREFIX}:{hashlib.sha1(query.encode()).hexdigest()}'
+
+
+def get_active_loan_requests_page(cursor=None, page_size=config.LOAN_REQUESTS_PAGE_SIZE, min_amount=None,
+                                  max_amount=None, repayment_period_months=None):
+    """
+    Return one page of active loan requests, ordered by ``(created, id)``, as ready-to-send JSON bytes.
+
+    Unfiltered pages are read from the Redis store; filtered pages run a keyset query against the
+    partial index on active requests. Either way the rendered page is cached until the next write, after
+    which a single worker rebuilds it.
+    """
+    position = decode_cursor(cursor) if cursor else None
+    lookups = {
+        'requested_amount__gte': min_amount,
+        'requested_amount__lte': max_amount,
+        'repayment_period_months': repayment_period_months,
+    }
+    filters = {lookup: value for lookup, value in lookups.items() if value is not None}
+
+    client = get_redis_client()
+    page_key = _page_key(cursor, page_size, filters)
+    payload, previous = _cached_page(client, page_key)
+    if payload is not None:
+        return payload
+
+    with cache_lock(page_key, config.LOAN_REQUESTS_PAGE_BUILD_TIMEOUT) as acquired:
+        if acquired:
+            # The previous holder may have stored this generation between the read and the lease
+            payload, _ = _cached_page(client, page_key)
+            return payload if payload is not None else _build_page(client, page_key, position, page_size, filters)
+    if previous is not None:
+        return previous
+
+    deadline = time.monotonic() + config.LOAN_REQUESTS_PAGE_BUILD_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_INTERVAL)
+        payload, previous = _cached_page(client, page_key)
+        if payload is not None or previous is not None:
+            return payload if payload is not None else previous
+
+    # The lease holder never stored the page (it crashed or timed out), build it here.
+    return _build_page(client, page_key, position, page_size, filters)
+
+
+def _cached_page(client, page_key):
+    """
+    Return the cached payload of a page as ``(current, previous)``: the payload when it was built from
+    the current store generation, else the one of an older generation, if any.
+    """
+    generation, cached = client.mget(GENERATION_KEY, page_key)
+    if cached is None:
+        return None, None
+    cached_generation, _, payload = cached.partition(b':')
+    if generation is not None and cached_generation == generation:
+        return payload, None
+    return None, payload
+
+
+def _build_page(client, page_key, position, page_size, filters):
+    _ensure_ready()
+    generation = client.get(GENERATION_KEY) or b'0'
+
+    if filters:
+        rows, next_position = _page_from_database(position, page_size, filters)
+    else:
+        rows, next_position = _page_from_store(client, position, page_size)
+        if None in rows:
+            # The index and the rows drifted apart (e.g. a partial eviction), one worker resyncs.
+            with cache_lock(f'{READY_KEY}:resync') as acquired:
+                if acquired:
+                    rebuild_active_loan_requests()
+                    generation = client.get(GENERATION_KEY) or b'0'
+                    rows, next_position = _page_from_store(client, position, page_size)
+
+    next_cursor = encode_cursor(*next_position) if next_position else None
+    payload = b''.join([
+        b'{"next_cursor":', json.dumps(next_cursor).encode(),
+        b',"results":[', b','.join(row for row in rows if row is not None), b']}',
+    ])
+    if None not in rows:
+        # Tagged with the generation it was built from; any later write makes it stale.
+        client.set(page_key, generation + b':' + payload, ex=settings.CACHE_TIMEOUT)
+    return payload
+
+
+def get_generation():
+    """
+    Return the store generation, which every loan request write bumps.
+    """
+    # Warm the store first, so the generation does not move under a rebuild right after being read.
+    _ensure_ready()
+    generation = get_redis_client().get(GENERATION_KEY)
+    return generation.decode() if generation is not None else None
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0010_loanoffer_admin_fee'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='loanrequest',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['created', 'id'], name='loan_request_active_page_idx'),
+        ),
+    ]
@@ -0,0 +1,91 @@
+import math
+from decimal import Decimal
+
+from django.db import migrations, models
+
+# Frozen copy of the pricing in apps.loans.amortization as of this migration, so later changes to
+# the engine never alter what this data migration writes.
+APR_ITERATIONS = 80
+
+
+def _round_half_up(value):
+    return math.floor(value + 0.5)
+
+
+def _from_cents(cents):
+    return Decimal(cents).scaleb(-2)
+
+
+def _price(principal, annual_rate, months, admin_fee):
+    """
+    Return ``(monthly_payment, total_interest, total_repayable_amount, apr)`` of an offer as Decimals.
+    """
+    principal_cents = _round_half_up(float(principal) * 100)
+    rate = float(annual_rate) / 1200
+    if rate == 0:
+        payment = (2 * principal_cents + months) // (2 * months)
+    else:
+        growth = (1 + rate) ** months
+        payment = _round_half_up(principal_cents * rate * growth / (growth - 1))
+
+    # The last installment clears whatever is left, absorbing the rounding of the others
+    remaining, total_paid = principal_cents, 0
+    for month in range(months):
+        interest = _round_half_up(remaining * rate)
+        principal_part = remaining if month == months - 1 else min(max(payment - interest, 0), remaining)
+        remaining -= principal_part
+        total_paid += principal_part + interest
+
+    fee = _round_half_up(principal_cents * float(admin_fee))
+    financed = principal_cents - fee
+    if payment * months <= financed:
+        apr = 0.0
+    else:
+        low, high = 0.0, 1.0
+        for _ in range(APR_ITERATIONS):
+            middle = (low + high) / 2
+            if payment * (1 - (1 + middle) ** -months) / middle > financed:
+                low = middle
+            else:
+                high = middle
+        apr = high * 1200
+
+    return (_from_cents(payment), _from_cents(total_paid - principal_cents), _from_cents(total_paid + fee),
+            Decimal(_round_half_up(apr * 10000)).scaleb(-4))
+
+
+def price_existing_offers(apps, schema_editor):
+    LoanOffer = apps.get_model('loans', 'LoanOffer')
+    for offer in LoanOffer.objects.select_related('loan_request').iterator():
+        offer.monthly_payment, offer.total_interest, offer.total_repayable_amount, offer.apr = _price(
+            offer.offered_amount, offer.interest_rate, offer.loan_request.repayment_period_months, offer.admin_fee)
+        offer.save(update_fields=['monthly_payment', 'total_interest', 'total_repayable_amount', 'apr'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0011_loanrequest_loan_request_active_page_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loanoffer',
+            name='monthly_payment',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='Monthly installment, computed when the offer is created.', max_digits=10),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='loanoffer',
+            name='total_interest',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='Total interest paid over the loan, computed when the offer is created.', max_digits=10),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='loanoffer',
+            name='apr',
+            field=models.DecimalField(decimal_places=4, default=0, help_text='Annual percentage rate including the admin fee, computed when the offer is created.', max_digits=8),
+            preserve_default=False,
+        ),
+        migrations.RunPython(price_existing_offers, migrations.RunPython.noop),
+    ]
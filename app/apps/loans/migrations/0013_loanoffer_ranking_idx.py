@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0012_loanoffer_amortization_fields'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='loanoffer',
+            index=models.Index(condition=models.Q(('offer_status', 'pending')), fields=['loan_request', 'total_repayable_amount', 'interest_rate', 'id'], name='loan_offer_ranking_idx'),
+        ),
+    ]
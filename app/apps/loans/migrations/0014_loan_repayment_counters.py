@@ -0,0 +1,95 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:55
+
+import math
+from decimal import Decimal
+from itertools import groupby
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+BATCH_SIZE = 500
+
+
+def _round_half_up(value):
+    return math.floor(value + 0.5)
+
+
+def _schedule(principal, annual_rate, months):
+    """
+    ``(principal, interest)`` parts of each installment of a loan as Decimals. Frozen copy of the
+    schedule in apps.loans.amortization as of this migration: cents, half-up rounding, and the last
+    installment absorbing the rounding.
+    """
+    remaining = _round_half_up(float(principal) * 100)
+    rate = float(annual_rate) / 1200
+    if rate == 0:
+        payment = (2 * remaining + months) // (2 * months)
+    else:
+        growth = (1 + rate) ** months
+        payment = _round_half_up(remaining * rate * growth / (growth - 1))
+
+    parts = []
+    for month in range(months):
+        interest = _round_half_up(remaining * rate)
+        principal_part = remaining if month == months - 1 else min(max(payment - interest, 0), remaining)
+        remaining -= principal_part
+        parts.append((Decimal(principal_part).scaleb(-2), Decimal(interest).scaleb(-2)))
+    return parts
+
+
+def split_existing_payments(apps, schema_editor):
+    # Payments created before the split was recorded get it from their loan's schedule, in due date order
+    Loan = apps.get_model('loans', 'Loan')
+    Payment = apps.get_model('payments', 'Payment')
+
+    unsplit = Payment.objects.filter(principal_amount__isnull=True).order_by('loan_id', 'payment_due_date', 'id')
+    batch = []
+    for loan_id, payments in groupby(unsplit.iterator(), key=lambda payment: payment.loan_id):
+        loan = Loan.objects.only('amount', 'annual_interest_rate', 'duration_months').get(pk=loan_id)
+        if loan.duration_months <= 0:
+            continue
+        for payment, (principal, interest) in zip(payments, _schedule(loan.amount, loan.annual_interest_rate,
+                                                                      loan.duration_months)):
+            payment.principal_amount, payment.interest_amount = principal, interest
+            batch.append(payment)
+        if len(batch) >= BATCH_SIZE:
+            Payment.objects.bulk_update(batch, ['principal_amount', 'interest_amount'])
+            batch = []
+    Payment.objects.bulk_update(batch, ['principal_amount', 'interest_amount'])
+
+
+def count_unpaid_installments(apps, schema_editor):
+    Loan = apps.get_model('loans', 'Loan')
+    Payment = apps.get_model('payments', 'Payment')
+
+    unpaid = Payment.objects.filter(~Q(payment_status='paid'), loan=OuterRef('pk')).order_by().values('loan')
+    Loan.objects.update(
+        remaining_installments=Coalesce(Subquery(unpaid.annotate(count=Count('id')).values('count')), Value(0)),
+        outstanding_principal=Coalesce(
+            Subquery(unpaid.annotate(total=Sum('principal_amount')).values('total')), Value(Decimal('0.00')),
+            output_field=models.DecimalField()),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0013_loanoffer_ranking_idx'),
+        ('payments', '0002_payment_principal_interest_split'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loan',
+            name='outstanding_principal',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), help_text='Part of the principal not repaid yet.', max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='loan',
+            name='remaining_installments',
+            field=models.PositiveIntegerField(default=0, help_text='Number of installments not paid yet.'),
+        ),
+        migrations.RunPython(split_existing_payments, migrations.RunPython.noop),
+        migrations.RunPython(count_unpaid_installments, migrations.RunPython.noop),
+    ]
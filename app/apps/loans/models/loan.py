@@ -1,11 +1,45 @@
-from django.db import models
+from collections import defaultdict
 from decimal import Decimal
 
+from django.db import models
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Greatest
+
 from apps.loans import config
 from apps.loans.models.loan_offer import LoanOffer
 from apps.users.models import Borrower, Lender
 
 
+class LoanQuerySet(models.QuerySet):
+
+    def record_paid_installments(self, payments):
+        """
+        Count the just paid ``payments`` off the remaining installments and outstanding principal of
+        their loans, in a single UPDATE that also completes the loans left with nothing to pay.
+        """
+        installments, principal = defaultdict(int), defaultdict(Decimal)
+        for payment in payments:
+            installments[payment.loan_id] += 1
+            principal[payment.loan_id] += payment.principal_amount or 0
+        if not installments:
+            return 0
+
+        def per_loan(amounts, output_field):
+            return Case(*[When(id=loan_id, then=Value(amount)) for loan_id, amount in amounts.items()],
+                        output_field=output_field)
+
+        # Every expression reads the row as it was before the UPDATE
+        return self.filter(id__in=installments).update(
+            remaining_installments=Greatest(
+                F('remaining_installments') - per_loan(installments, models.IntegerField()), Value(0)),
+            outstanding_principal=Greatest(
+                F('outstanding_principal') - per_loan(principal, models.DecimalField()), Value(Decimal('0.00')),
+                output_field=models.DecimalField()),
+            status=Case(*[When(id=loan_id, remaining_installments__lte=count, then=Value(config.COMPLETED))
+                          for loan_id, count in installments.items()], default=F('status')),
+        )
+
+
 class Loan(models.Model):
     borrower = models.ForeignKey(Borrower, on_delete=models.CASCADE, related_name='borrowed_loans')
     amount = models.DecimalField(max_digits=10, decimal_places=2)
@@ -16,6 +50,9 @@ class Loan(models.Model):
     funded_at = models.DateTimeField(null=True, blank=True)
     status = models.CharField(max_length=20, choices=config.LOAN_STATUS, default=config.PENDING)
     loan_offer = models.OneToOneField(LoanOffer, models.CASCADE, related_name='loan', null=True, blank=True)
+    remaining_installments = models.PositiveIntegerField(default=0,
+                                                         help_text="Number of installments not paid yet.")
+    outstanding_principal = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'),
+                                                help_text="Part of the principal not repaid yet.")
 
-
-
+    objects = LoanQuerySet.as_manager()
@@ -1,12 +1,14 @@
-from decimal import Decimal
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db import models
 from django.utils import timezone
 
-from apps.loans import config
+from apps.loans import amortization, config
 from apps.loans.models.loan_request import LoanRequest
+from apps.wallets.models import Wallet
 
 User = get_user_model()
 
@@ -27,42 +29,98 @@ class LoanOffer(models.Model):
     )
     admin_fee = models.DecimalField(max_digits=10, decimal_places=2, default=0.0,
                                     help_text="Administrative fee for the loan offer.")
+    monthly_payment = models.DecimalField(max_digits=10, decimal_places=2,
+                                          help_text="Monthly installment, computed when the offer is created.")
+    total_interest = models.DecimalField(max_digits=10, decimal_places=2,
+                                         help_text="Total interest paid over the loan, computed when the offer is created.")
+    apr = models.DecimalField(max_digits=8, decimal_places=4,
+                              help_text="Annual percentage rate including the admin fee, computed when the offer is created.")
     created_at = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        indexes = [
+            # Ranking of the open offers of each loan request, cheapest total cost first
+            models.Index(fields=['loan_request', 'total_repayable_amount', 'interest_rate', 'id'],
+                         condition=models.Q(offer_status=config.OFFER_STATUS_PENDING), name='loan_offer_ranking_idx'),
+        ]
+
     def __str__(self):
         return f"Loan Offer {self.id} by {self.lender.username} - Amount: {self.offered_amount} USD @ {self.interest_rate}%"
 
+    @property
+    def funding_amount(self):
+        """
+        Amount taken from the lender's wallet when the offer is accepted: the offered amount plus the admin fee.
+        It is reserved on the wallet while the offer is pending.
+        """
+        offered_amount = amortization.to_decimal(self.offered_amount)
+        amount = offered_amount + offered_amount * amortization.to_decimal(self.admin_fee)
+        return amount.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+    @staticmethod
+    def release_reservations(offers):
+        """
+        Give the funds reserved by the given pending offers back to their lenders, in a single UPDATE.
+        When the transaction changes other wallets too, lock them all first with ``lock_wallets``.
+        """
+        totals = defaultdict(Decimal)
+        for offer in offers:
+            totals[offer.lender_id] += offer.funding_amount
+        Wallet.objects.release_by_user(totals)
+
+    @classmethod
+    def best_for(cls, loan_request_id, limit):
+        """
+        The ``limit`` cheapest pending offers on a loan request, ranked by total repayable amount then
+        interest rate, read straight off the ranking index.
+        """
+        return cls.objects.filter(loan_request_id=loan_request_id, offer_status=config.OFFER_STATUS_PENDING).order_by(
+            'total_repayable_amount', 'interest_rate', 'id')[:limit]
+
     def calculate_monthly_payment(self):
         """
         Calculates the monthly payment amount for the loan based on the loan amount, interest rate, and repayment period.
-        Uses the formula for an amortizing loan payment:
-
-        M = P [ r(1 + r)^n ] / [ (1 + r)^n – 1 ]
+        Prefer the stored ``monthly_payment``, which is computed once when the offer is created.
+        """
+        return amortization.monthly_payment(self.offered_amount, self.interest_rate,
+                                            self.loan_request.repayment_period_months)
 
-        Where:
-        M = monthly payment
-        P = principal loan amount (offered_amount)
-        r = monthly interest rate (annual rate / 12)
-        n = number of payments (repayment period in months)
+    def price(self):
         """
-        P = float(self.offered_amount)
-        annual_rate = float(self.interest_rate)
-        r = annual_rate / 100 / 12  # Monthly interest rate
-        n = self.loan_request.repayment_period_months  # Number of payments
+        Computes and sets the stored amortization summary of the offer with exact Decimal arithmetic.
+        """
+        (self.monthly_payment, self.total_interest, self.total_repayable_amount,
+         self.apr) = amortization.price_offer(self.offered_amount, self.interest_rate,
+                                              self.loan_request.repayment_period_months, self.admin_fee)
 
-        if r == 0:  # Handling the case of zero interest
-            return P / n
+    @classmethod
+    def price_many(cls, offers):
+        """
+        Batch version of ``price`` for offers inserted with ``bulk_create``, which skips ``save``.
+        Every offer must come with its loan request.
+        """
+        for offer in offers:
+            if not offer.admin_fee:
+                offer.admin_fee = amortization.to_decimal(settings.PROCESSING_FEE)
 
-        M = P * (r * pow(1 + r, n)) / (pow(1 + r, n) - 1)
-        return round(M, 2)
+        payments, total_interests, total_repayable_amounts, aprs = amortization.price_offers(
+            [offer.offered_amount for offer in offers],
+            [offer.interest_rate for offer in offers],
+            [offer.loan_request.repayment_period_months for offer in offers],
+            [offer.admin_fee for offer in offers],
+        )
+        for offer, payment, total_interest, total_repayable_amount, apr in zip(
+                offers, payments, total_interests, total_repayable_amounts, aprs):
+            offer.monthly_payment = amortization.from_cents(payment)
+            offer.total_interest = amortization.from_cents(total_interest)
+            offer.total_repayable_amount = amortization.from_cents(total_repayable_amount)
+            offer.apr = amortization.to_rate(apr)
 
     def save(self, *args, **kwargs):
         if not self.admin_fee:
-            self.admin_fee = settings.PROCESSING_FEE
+            self.admin_fee = amortization.to_decimal(settings.PROCESSING_FEE)
 
-        # Calculate the total repayable amount including interest
-        if not self.total_repayable_amount:
-            self.total_repayable_amount = (self.calculate_monthly_payment() *
-                                           self.loan_request.repayment_period_months) \
-                                          + (float(self.offered_amount) * float(self.admin_fee))
+        # Price the offer once, list endpoints and payment generation read the stored columns
+        if self.monthly_payment is None:
+            self.price()
         super().save(*args, **kwargs)
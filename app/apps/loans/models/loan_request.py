@@ -1,7 +1,6 @@
-from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.core.cache import cache
 from django.db import models
+from django.db.models import Q
 from django.utils import timezone
 
 User = get_user_model()
@@ -17,23 +16,11 @@ class LoanRequest(models.Model):
     created = models.DateTimeField(default=timezone.now)
     updated = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Keyset pages of the marketplace are range scans over active requests only
+            models.Index(fields=['created', 'id'], condition=Q(is_active=True), name='loan_request_active_page_idx'),
+        ]
+
     def __str__(self):
         return f"Loan Request {self.id} by {self.borrower.username} - Amount: {self.requested_amount} USD"
-
-    def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-
-        # Cache all active loan requests
-        if self.is_active:
-            active_requests = LoanRequest.objects.filter(is_active=True)
-            cache.set(settings.ACTIVE_LOAN_REQUESTS_CACHE_KEY, active_requests, timeout=3600)
-        else:
-            # If the saved request is inactive, we should also update the cache
-            active_requests = LoanRequest.objects.filter(is_active=True)
-            cache.set(settings.ACTIVE_LOAN_REQUESTS_CACHE_KEY, active_requests, timeout=3600)
-
-    def delete(self, *args, **kwargs):
-        super().delete(*args, **kwargs)
-        # Update the cache when a LoanRequest is deleted
-        active_requests = LoanRequest.objects.filter(is_active=True)
-        cache.set(settings.ACTIVE_LOAN_REQUESTS_CACHE_KEY, active_requests, timeout=3600)
\ No newline at end of file
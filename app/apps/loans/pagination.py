@@ -0,0 +1,47 @@
+"""
+Keyset cursors over ``(created, id)``.
+
+A position is ``(score, id)`` where the score is the creation time in whole microseconds since
+the epoch, which is also the score of the row in the Redis index.
+"""
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime, timedelta, timezone
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Ids are 64 bit integers in the database
+MAX_ID = 2 ** 63 - 1
+
+
+def to_score(created):
+    # Whole microseconds since the epoch fit exactly in a Redis (double) score.
+    return (created - EPOCH) // timedelta(microseconds=1)
+
+
+def from_score(score):
+    return EPOCH + timedelta(microseconds=score)
+
+
+# Scores of the first and last representable creation times
+MIN_SCORE = to_score(datetime.min.replace(tzinfo=timezone.utc))
+MAX_SCORE = to_score(datetime.max.replace(tzinfo=timezone.utc))
+
+
+def encode_cursor(score, object_id):
+    return urlsafe_b64encode(f'{score}:{object_id}'.encode()).decode()
+
+
+def decode_cursor(cursor, min_score=MIN_SCORE, max_score=MAX_SCORE):
+    """
+    Decode a cursor into its ``(score, id)`` position, raising ``ValueError`` when malformed or when
+    the score falls outside ``[min_score, max_score]``. Cursors keyed on something other than the
+    creation time pass the bounds of their own score.
+    """
+    try:
+        score, object_id = urlsafe_b64decode(cursor.encode()).decode().split(':')
+        score, object_id = int(score), int(object_id)
+    except ValueError as exc:
+        raise ValueError('Invalid cursor.') from exc
+    if not (min_score <= score <= max_score and 0 <= object_id <= MAX_ID):
+        raise ValueError('Invalid cursor.')
+    return score, object_id
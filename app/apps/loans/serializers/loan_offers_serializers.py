@@ -1,12 +1,16 @@
+from decimal import Decimal
+
+from django.conf import settings
 from rest_framework import serializers
 
+from apps.loans import config
+from apps.loans.amortization import to_decimal
 from apps.loans.models.loan_offer import LoanOffer
+from apps.loans.models.loan_request import LoanRequest
 from apps.loans.serializers.loan_requests_serializers import LoanRequestSerializer
 
 
 class LoanOfferSerializer(serializers.ModelSerializer):
-    monthly_payment = serializers.DecimalField(source='calculate_monthly_payment', decimal_places=2, max_digits=10,
-                                               read_only=True)
 
     class Meta:
         model = LoanOffer
@@ -19,10 +23,13 @@ class LoanOfferSerializer(serializers.ModelSerializer):
             'offer_status',
             'total_repayable_amount',
             'monthly_payment',
+            'total_interest',
+            'apr',
             'admin_fee',
             'created_at',
         ]
-        read_only_fields = ['id', 'lender', 'created_at', 'offer_status', 'total_repayable_amount', 'monthly_payment', 'admin_fee']
+        read_only_fields = ['id', 'lender', 'created_at', 'offer_status', 'total_repayable_amount', 'monthly_payment',
+                            'total_interest', 'apr', 'admin_fee']
 
     def validate(self, data):
         """
@@ -52,7 +59,87 @@ class LoanOfferSerializer(serializers.ModelSerializer):
     def to_representation(self, instance):
         """
         Custom representation to include detailed information about the loan request.
+        Each loan request is serialized once per response and shared by all of its offers,
+        the offers are expected to come with their loan request preloaded (select_related).
+        The amortization fields are stored on the offer, so nothing is recomputed here.
         """
         representation = super().to_representation(instance)
-        representation['loan_request'] = LoanRequestSerializer(instance=instance.loan_request).data
+        loan_requests = self.context.setdefault('loan_request_representations', {})
+        if instance.loan_request_id not in loan_requests:
+            loan_requests[instance.loan_request_id] = LoanRequestSerializer(instance=instance.loan_request).data
+        representation['loan_request'] = loan_requests[instance.loan_request_id]
         return representation
+
+
+class BulkLoanOfferItemSerializer(serializers.Serializer):
+    loan_request = serializers.IntegerField()
+    offered_amount = serializers.DecimalField(max_digits=10, decimal_places=2)
+    interest_rate = serializers.DecimalField(max_digits=5, decimal_places=2)
+
+    def validate_offered_amount(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("Offer amount must be greater than zero.")
+        return value
+
+    def validate_interest_rate(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("Interest rate must be greater than zero.")
+        return value
+
+
+class BulkLoanOfferSerializer(serializers.Serializer):
+    """
+    Validates and creates many offers of one lender at once, against a single read of the available
+    balance of the lender's wallet (passed as ``wallet`` in the context with the ``lender``) and a single query for the loan
+    requests. Errors are reported per item, keyed by the index of the offer in the list.
+    """
+    offers = serializers.ListField(child=BulkLoanOfferItemSerializer(), allow_empty=False,
+                                   max_length=config.BULK_LOAN_OFFERS_MAX_SIZE)
+
+    def validate_offers(self, items):
+        loan_requests = LoanRequest.objects.filter(is_active=True).in_bulk({item['loan_request'] for item in items})
+        fee = to_decimal(settings.PROCESSING_FEE)
+        balance = self.context['wallet'].available_balance
+
+        # Offers are accepted in order while the lender can cover all of them together.
+        errors, offered_on, exposure = {}, set(), Decimal(0)
+        for index, item in enumerate(items):
+            loan_request = loan_requests.get(item['loan_request'])
+            cost = LoanOffer(offered_amount=item['offered_amount'], admin_fee=fee).funding_amount
+            if loan_request is None:
+                errors[index] = {'loan_request': ["Active loan request not found."]}
+            elif loan_request.id in offered_on:
+                errors[index] = {'loan_request': ["Only one offer per loan request is allowed in a batch."]}
+            elif item['offered_amount'] > loan_request.requested_amount:
+                errors[index] = {'offered_amount': ["Offer amount cannot exceed the requested loan amount."]}
+            elif exposure + cost > balance:
+                errors[index] = {'offered_amount': [
+                    f"Insufficient funds you have to charge your balance to have {exposure + cost:.2f} USD in your wallet"
+                ]}
+            else:
+                exposure += cost
+                offered_on.add(loan_request.id)
+                item['loan_request'] = loan_request
+
+        if errors:
+            raise serializers.ValidationError(errors)
+        return items
+
+    def create(self, validated_data):
+        offers = [LoanOffer(lender=self.context['lender'], **item) for item in validated_data['offers']]
+        # bulk_create skips save(), so the offers are priced here in one batch.
+        LoanOffer.price_many(offers)
+        return LoanOffer.objects.bulk_create(offers)
+
+
+class BestLoanOffersQuerySerializer(serializers.Serializer):
+    limit = serializers.IntegerField(min_value=1, max_value=config.BEST_OFFERS_MAX_LIMIT,
+                                     default=config.BEST_OFFERS_LIMIT)
+
+
+class FundingJobSerializer(serializers.Serializer):
+    job_id = serializers.CharField()
+    status = serializers.ChoiceField(choices=config.FUNDING_JOB_STATUS_CHOICES)
+    loan_offer = serializers.IntegerField()
+    loan = serializers.IntegerField(required=False, allow_null=True, default=None)
+    error = serializers.CharField(required=False, allow_null=True, default=None)
@@ -1,6 +1,10 @@
+from decimal import Decimal
+
 from rest_framework import serializers
 
+from apps.loans import config
 from apps.loans.models.loan_request import LoanRequest
+from apps.loans.pagination import decode_cursor
 
 
 class LoanRequestSerializer(serializers.ModelSerializer):
@@ -26,3 +30,26 @@ class LoanRequestSerializer(serializers.ModelSerializer):
         if value <= 0:
             raise serializers.ValidationError("Repayment period must be greater than zero.")
         return value
+
+
+class LoanRequestListQuerySerializer(serializers.Serializer):
+    cursor = serializers.CharField(required=False, help_text="Cursor returned as `next_cursor` by the previous page.")
+    page_size = serializers.IntegerField(min_value=1, max_value=config.LOAN_REQUESTS_MAX_PAGE_SIZE,
+                                         default=config.LOAN_REQUESTS_PAGE_SIZE)
+    min_amount = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal(0), required=False)
+    max_amount = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal(0), required=False)
+    repayment_period_months = serializers.IntegerField(min_value=1, required=False)
+
+    def validate_cursor(self, value):
+        try:
+            decode_cursor(value)
+        except ValueError as exc:
+            raise serializers.ValidationError(str(exc))
+        return value
+
+    def validate(self, data):
+        min_amount = data.get('min_amount')
+        max_amount = data.get('max_amount')
+        if min_amount is not None and max_amount is not None and min_amount > max_amount:
+            raise serializers.ValidationError("min_amount cannot be greater than max_amount.")
+        return data
@@ -0,0 +1,21 @@
+from rest_framework import serializers
+
+
+class InstallmentSerializer(serializers.Serializer):
+    number = serializers.IntegerField()
+    due_date = serializers.DateField()
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2)
+    principal = serializers.DecimalField(max_digits=10, decimal_places=2)
+    interest = serializers.DecimalField(max_digits=10, decimal_places=2)
+    balance = serializers.DecimalField(max_digits=10, decimal_places=2)
+
+
+class AmortizationScheduleSerializer(serializers.Serializer):
+    """
+    Read-only representation of an ``amortization.AmortizationSummary``.
+    """
+    monthly_payment = serializers.DecimalField(max_digits=10, decimal_places=2)
+    total_interest = serializers.DecimalField(max_digits=10, decimal_places=2)
+    total_repayable_amount = serializers.DecimalField(max_digits=10, decimal_places=2)
+    apr = serializers.DecimalField(max_digits=8, decimal_places=4)
+    installments = InstallmentSerializer(many=True)
@@ -17,6 +17,8 @@ class LoanSerializer(serializers.ModelSerializer):
             'lender',
             'funded_at',
             'status',
-            'loan_offer'
+            'loan_offer',
+            'remaining_installments',
+            'outstanding_principal'
         ]
 
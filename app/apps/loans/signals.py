@@ -0,0 +1,40 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.loans.etags import bump_loan_offers_versions
+from apps.loans.loan_request_cache import cache_loan_request, evict_loan_requests
+from apps.loans.models.loan_offer import LoanOffer
+from apps.loans.models.loan_request import LoanRequest
+
+
+@receiver(post_save, sender=LoanRequest)
+def sync_cached_loan_request(sender, instance, created, **kwargs):
+    """
+    Signal to refresh the cached marketplace row of a saved loan request.
+    Offer lists embed their loan request, so its borrower and bidding lenders get a new version too.
+    The row is written once the transaction commits, so a rollback never leaves it in the marketplace.
+    """
+    transaction.on_commit(partial(cache_loan_request, instance))
+    if not created:
+        lender_ids = instance.offers.values_list('lender_id', flat=True)
+        bump_loan_offers_versions([instance.borrower_id, *lender_ids])
+
+
+@receiver(post_delete, sender=LoanRequest)
+def evict_cached_loan_request(sender, instance, **kwargs):
+    """
+    Signal to drop the cached marketplace row of a deleted loan request, once the transaction commits.
+    """
+    transaction.on_commit(partial(evict_loan_requests, [instance.pk]))
+
+
+@receiver(post_save, sender=LoanOffer)
+@receiver(post_delete, sender=LoanOffer)
+def bump_loan_offer_versions(sender, instance, **kwargs):
+    """
+    Signal to invalidate the offer lists of the lender and the borrower of a changed loan offer.
+    """
+    bump_loan_offers_versions([instance.lender_id, instance.loan_request.borrower_id])
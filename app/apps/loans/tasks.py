@@ -0,0 +1,149 @@
+from datetime import timedelta
+from functools import partial
+
+from celery import shared_task
+from celery.utils.log import get_task_logger
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.loans import config
+from apps.loans.etags import bump_loan_offers_versions
+from apps.loans.funding import fund_loan_offer, loan_offers_for_funding
+from apps.loans.funding_jobs import update_funding_job
+from apps.loans.loan_request_cache import evict_loan_requests
+from apps.loans.models.loan_offer import LoanOffer
+from apps.loans.models.loan_request import LoanRequest
+from apps.wallets.locking import lock_wallets, retry_on_conflict
+
+logger = get_task_logger(__name__)
+
+
+@shared_task
+def expire_loan_offers(batch_size=config.OFFER_EXPIRY_BATCH_SIZE):
+    """
+    Expire the pending offers older than ``LOAN_OFFER_TTL`` or made on loan requests that are no longer active.
+
+    Offers are walked in id order and expired one batch per transaction with a single
+    ``UPDATE ... WHERE id IN (...)``, releasing the funds they reserved and invalidating the offer
+    lists of their lenders and borrowers. Returns the number of expired offers.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.LOAN_OFFER_TTL)
+    stale_offers = LoanOffer.objects.filter(
+        Q(created_at__lt=cutoff) | Q(loan_request__is_active=False),
+        offer_status=config.OFFER_STATUS_PENDING,
+    ).order_by('id')
+
+    expired, last_id = 0, 0
+    while True:
+        with transaction.atomic():
+            # Offers locked by a concurrent accept or reject are left to the next run
+            rows = list(stale_offers.filter(id__gt=last_id).select_for_update(skip_locked=True, of=('self',))
+                        .values_list('id', 'lender_id', 'offered_amount', 'admin_fee',
+                                     'loan_request__borrower_id')[:batch_size])
+            if not rows:
+                break
+
+            offers = [LoanOffer(id=offer_id, lender_id=lender_id, offered_amount=offered_amount, admin_fee=admin_fee)
+                      for offer_id, lender_id, offered_amount, admin_fee, _ in rows]
+            LoanOffer.objects.filter(id__in=[offer.id for offer in offers]).update(
+                offer_status=config.OFFER_STATUS_EXPIRED)
+            lock_wallets(offer.lender_id for offer in offers)
+            LoanOffer.release_reservations(offers)
+            bump_loan_offers_versions([user_id for row in rows for user_id in (row[1], row[4])])
+
+        expired += len(rows)
+        last_id = rows[-1][0]
+        if len(rows) < batch_size:
+            break
+
+    logger.info('Expired %s loan offers', expired)
+    return expired
+
+
+@shared_task
+def expire_loan_requests(batch_size=config.LOAN_REQUEST_EXPIRY_BATCH_SIZE):
+    """
+    Close the active loan requests older than ``LOAN_REQUEST_TTL`` and reject their pending offers.
+
+    Requests are walked in ``(created, id)`` order over the partial index on active requests, one
+    batch per transaction: a single UPDATE closes the batch, another rejects its pending offers and
+    the marketplace store evicts the whole batch at once after commit. Returns the number of closed requests.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.LOAN_REQUEST_TTL)
+    stale_requests = LoanRequest.objects.filter(is_active=True, created__lt=cutoff).order_by('created', 'id')
+
+    closed, position = 0, None
+    while True:
+        with transaction.atomic():
+            batch = stale_requests
+            if position is not None:
+                created, loan_request_id = position
+                batch = batch.filter(Q(created__gt=created) | Q(created=created, id__gt=loan_request_id))
+            rows = list(batch.select_for_update(skip_locked=True)
+                        .values_list('id', 'created', 'borrower_id')[:batch_size])
+            if not rows:
+                break
+
+            loan_request_ids = [row[0] for row in rows]
+            LoanRequest.objects.filter(id__in=loan_request_ids).update(is_active=False)
+
+            # The pending offers are locked before their lenders' wallets, like everywhere else, and the
+            # guarded UPDATE changes exactly the locked rows, so each reservation is released once
+            pending_offers = LoanOffer.objects.filter(loan_request_id__in=loan_request_ids,
+                                                      offer_status=config.OFFER_STATUS_PENDING)
+            offers = list(pending_offers.select_for_update(of=('self',)).order_by('id')
+                          .only('id', 'lender_id', 'offered_amount', 'admin_fee'))
+            LoanOffer.objects.filter(id__in=[offer.id for offer in offers],
+                                     offer_status=config.OFFER_STATUS_PENDING).update(
+                offer_status=config.OFFER_STATUS_REJECTED)
+            lock_wallets(offer.lender_id for offer in offers)
+            LoanOffer.release_reservations(offers)
+
+            # Every offer embeds its closed request, so the lenders of all of them get a new version
+            bump_loan_offers_versions([*(row[2] for row in rows), *LoanOffer.objects.filter(
+                loan_request_id__in=loan_request_ids).values_list('lender_id', flat=True)])
+            # update() sends no post_save signal, evict the batch from the marketplace in one round trip
+            transaction.on_commit(partial(evict_loan_requests, loan_request_ids))
+
+        closed += len(rows)
+        position = rows[-1][1], rows[-1][0]
+        if len(rows) < batch_size:
+            break
+
+    logger.info('Closed %s expired loan requests', closed)
+    return closed
+
+
+@retry_on_conflict
+def _fund_loan_offer(loan_offer_id):
+    loan_offer = loan_offers_for_funding().get(id=loan_offer_id)
+    # The request may have been funded or closed since the acceptance was queued
+    if not loan_offer.loan_request.is_active:
+        raise ValueError('This loan is not available any more')
+    return fund_loan_offer(loan_offer)
+
+
+@shared_task
+def accept_loan_offer(job_id, loan_offer_id):
+    """
+    Fund an offer accepted asynchronously, recording the outcome on its job. Routed to the
+    lender's funding queue, so the acceptances of one lender run one at a time.
+    """
+    update_funding_job(job_id, status=config.FUNDING_JOB_PROCESSING)
+    try:
+        loan = _fund_loan_offer(loan_offer_id)
+    except (LoanOffer.DoesNotExist, ValueError) as exc:
+        message = str(exc) if isinstance(exc, ValueError) else 'Loan offer not found.'
+        update_funding_job(job_id, status=config.FUNDING_JOB_FAILED, error=message)
+        logger.info('Funding job %s failed: %s', job_id, message)
+        return None
+    except Exception:
+        # Anything else (conflicts past the retries, database errors) must not leave the job processing
+        update_funding_job(job_id, status=config.FUNDING_JOB_FAILED, error='The loan could not be funded.')
+        logger.exception('Funding job %s failed', job_id)
+        raise
+
+    update_funding_job(job_id, status=config.FUNDING_JOB_SUCCEEDED, loan=loan.id)
+    return loan.id
@@ -0,0 +1,63 @@
+from datetime import date
+from decimal import Decimal
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from apps.loans import amortization
+
+
+class AmortizationTests(SimpleTestCase):
+
+    def test_monthly_payment(self):
+        """
+        Test the annuity installment, rounded to the cent.
+        """
+        self.assertEqual(amortization.monthly_payment(5000, 5, 12), Decimal('428.04'))
+        self.assertEqual(amortization.monthly_payment(Decimal('1200'), 0, 12), Decimal('100.00'))
+
+    def test_price_offer(self):
+        """
+        Test the stored summary of an offer: installment, interest, total repayable amount and APR.
+        """
+        payment, total_interest, total_repayable_amount, apr = amortization.price_offer(5000, 5, 12, '0.01')
+
+        self.assertEqual(payment, Decimal('428.04'))
+        self.assertEqual(total_interest, Decimal('136.45'))
+        self.assertEqual(total_repayable_amount, Decimal('5186.45'))
+        self.assertGreater(apr, Decimal('5'))
+
+    def test_apr_without_fee_matches_nominal_rate(self):
+        """
+        Test that the APR of a fee-free offer is its nominal rate, up to installment rounding.
+        """
+        apr = amortization.price_offer(5000, 5, 12, 0)[3]
+
+        self.assertAlmostEqual(apr, Decimal('5'), delta=Decimal('0.01'))
+
+    def test_batch_schedules_balance_to_the_cent(self):
+        """
+        Test that schedules computed together repay exactly their principal over their own term.
+        """
+        principals = [5000, Decimal('1000.00'), '250.55']
+        schedules = amortization.build_schedules(principals, [5, 0, Decimal('19.99')], [12, 3, 24])
+
+        np.testing.assert_array_equal(schedules.principal.sum(axis=1), [500000, 100000, 25055])
+        np.testing.assert_array_equal(schedules.active.sum(axis=1), [12, 3, 24])
+        np.testing.assert_array_equal(schedules.installment, schedules.principal + schedules.interest)
+        np.testing.assert_array_equal(schedules.installment[1, :3], [33333, 33333, 33334])
+        self.assertEqual(schedules.installment[1, 3:].sum(), 0)
+        self.assertEqual(schedules.balance[0, 11], 0)
+
+    def test_schedule_rows(self):
+        """
+        Test the rows of a single schedule: equal installments but the last, and calendar month due dates.
+        """
+        rows = amortization.schedule(5000, 5, 12, start=date(2024, 1, 31))
+
+        self.assertEqual(rows[0].amount, Decimal('428.04'))
+        self.assertEqual(rows[0].interest, Decimal('20.83'))
+        self.assertEqual(rows[-1].balance, Decimal('0.00'))
+        self.assertEqual(sum(row.principal for row in rows), Decimal('5000.00'))
+        self.assertEqual([row.due_date for row in rows[:3]], [date(2024, 2, 29), date(2024, 3, 31), date(2024, 4, 30)])
+        self.assertEqual(rows[-1].due_date, date(2025, 1, 31))
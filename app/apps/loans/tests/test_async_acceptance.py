@@ -0,0 +1,173 @@
+from unittest.mock import patch
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
+from django.db import OperationalError
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from app.redis import LOCAL_REDIS_URL, local_redis
+from apps.loans import config as loan_config
+from apps.loans.funding import check_funding_worker, funding_queue
+from apps.loans.models.loan import Loan
+from apps.loans.models.loan_offer import LoanOffer
+from apps.loans.models.loan_request import LoanRequest
+from apps.loans.tasks import accept_loan_offer
+from apps.users import config as user_config
+from apps.wallets.models import Wallet
+
+User = get_user_model()
+
+
+@override_settings(REDIS_URL=LOCAL_REDIS_URL)
+class AsyncAcceptLoanOfferTests(APITestCase):
+
+    def setUp(self):
+        local_redis.flushall()
+
+        self.lender = User.objects.create_user(
+            username='lender',
+            email='user@lender.com',
+            password='lenderpass',
+            user_type=user_config.USER_TYPE_LENDER,
+        )
+        Wallet.objects.filter(user=self.lender).update(balance=10000)
+        self.borrower = User.objects.create_user(
+            username='borrower',
+            email='user@borrower.com',
+            password='borrowerpass',
+            user_type=user_config.USER_TYPE_BORROWER
+        )
+        self.loan_request = LoanRequest.objects.create(
+            borrower=self.borrower,
+            requested_amount=5000,
+            repayment_period_months=12,
+        )
+        self.loan_offer = LoanOffer.objects.create(
+            loan_request=self.loan_request,
+            lender=self.lender,
+            offered_amount=5000,
+            interest_rate=5,
+        )
+        self.accept_url = reverse('api-v1:loans:offers:respond',
+                                  kwargs={'offer_id': self.loan_offer.id, 'action': 'accept'}) + '?async=true'
+
+    def job_status(self, job_id):
+        return self.client.get(reverse('api-v1:loans:offers:job-status', kwargs={'job_id': job_id}))
+
+    def test_async_accept_queues_funding_and_reports_status(self):
+        """
+        Test that an async acceptance returns 202 with a job, and that the job reports the loan once funded.
+        """
+        self.client.force_authenticate(user=self.borrower)
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(self.accept_url, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        job_id = response.data['job_id']
+        self.assertTrue(response['Location'].endswith(f'/jobs/{job_id}/'))
+        self.assertEqual(self.job_status(job_id).data['status'], loan_config.FUNDING_JOB_QUEUED)
+        self.assertEqual(Loan.objects.count(), 0)
+
+        with patch.object(accept_loan_offer, 'apply_async', wraps=accept_loan_offer.apply_async) as apply_async:
+            for callback in callbacks:
+                callback()
+
+        self.assertEqual(apply_async.call_args.kwargs['queue'], funding_queue(self.lender.id))
+        response = self.job_status(job_id)
+        self.assertEqual(response.data['status'], loan_config.FUNDING_JOB_SUCCEEDED)
+        self.assertEqual(response.data['loan'], Loan.objects.get().id)
+        self.loan_request.refresh_from_db()
+        self.assertFalse(self.loan_request.is_active)
+
+    def test_async_accept_records_failures(self):
+        """
+        Test that a funding that fails on the queue is reported as failed with its error.
+        """
+        self.client.force_authenticate(user=self.borrower)
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(self.accept_url, format='json')
+        Wallet.objects.filter(user=self.lender).update(balance=100)
+        for callback in callbacks:
+            callback()
+
+        response = self.job_status(response.data['job_id'])
+        self.assertEqual(response.data['status'], loan_config.FUNDING_JOB_FAILED)
+        self.assertEqual(response.data['error'], 'Insufficient funds in lender\'s wallet.')
+        self.assertEqual(Loan.objects.count(), 0)
+
+    def test_async_accept_fails_once_the_offer_expired(self):
+        """
+        Test that a queued acceptance of an offer that expired in the meantime fails without funding it.
+        """
+        self.client.force_authenticate(user=self.borrower)
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(self.accept_url, format='json')
+        LoanOffer.objects.filter(pk=self.loan_offer.pk).update(offer_status=loan_config.OFFER_STATUS_EXPIRED)
+        for callback in callbacks:
+            callback()
+
+        response = self.job_status(response.data['job_id'])
+        self.assertEqual(response.data['status'], loan_config.FUNDING_JOB_FAILED)
+        self.assertEqual(response.data['error'], 'This loan offer is no longer pending.')
+        self.assertEqual(Loan.objects.count(), 0)
+        self.assertEqual(Wallet.objects.get(user=self.lender).balance, 10000)
+
+    def test_async_accept_records_unexpected_errors(self):
+        """
+        Test that a funding failing with an unexpected error marks its job failed instead of leaving it processing.
+        """
+        self.client.force_authenticate(user=self.borrower)
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(self.accept_url, format='json')
+        job_id = response.data['job_id']
+
+        # The eager task keeps the re-raised error on its result
+        with patch('apps.loans.tasks.fund_loan_offer', side_effect=OperationalError('could not serialize access')):
+            for callback in callbacks:
+                callback()
+
+        response = self.job_status(job_id)
+        self.assertEqual(response.data['status'], loan_config.FUNDING_JOB_FAILED)
+        self.assertEqual(response.data['error'], 'The loan could not be funded.')
+
+    def test_async_accept_rejects_insufficient_funds_upfront(self):
+        """
+        Test that an acceptance the lender obviously cannot fund is refused without queuing a job.
+        """
+        Wallet.objects.filter(user=self.lender).update(balance=100)
+        self.client.force_authenticate(user=self.borrower)
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(self.accept_url, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(callbacks, [])
+
+    def test_job_status_is_private_to_the_borrower(self):
+        """
+        Test that other users and unknown job ids get a 404.
+        """
+        self.client.force_authenticate(user=self.borrower)
+        job_id = self.client.post(self.accept_url, format='json').data['job_id']
+
+        self.client.force_authenticate(user=self.lender)
+        self.assertEqual(self.job_status(job_id).status_code, status.HTTP_404_NOT_FOUND)
+        self.client.force_authenticate(user=self.borrower)
+        self.assertEqual(self.job_status('unknown').status_code, status.HTTP_404_NOT_FOUND)
+
+
+class FundingWorkerCheckTests(SimpleTestCase):
+
+    @override_settings(FUNDING_QUEUE_SHARDS=4)
+    def test_funding_worker_configuration(self):
+        """
+        Test that a worker may only take one existing funding queue with a single process.
+        """
+        check_funding_worker(['funding.3'], 1)
+        check_funding_worker(['celery'], 4)
+
+        for queues, concurrency in ((['funding.0', 'funding.1'], 1), (['funding.0'], 2), (['funding.4'], 1)):
+            with self.assertRaises(ImproperlyConfigured):
+                check_funding_worker(queues, concurrency)
@@ -0,0 +1,85 @@
+from rest_framework import status
+from rest_framework.test import APITestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+
+from apps.loans import config as loan_config
+from apps.loans.models.loan_offer import LoanOffer
+from apps.loans.models.loan_request import LoanRequest
+from apps.users import config as user_config
+
+User = get_user_model()
+
+
+class BestLoanOffersViewTests(APITestCase):
+
+    def setUp(self):
+        self.lender = User.objects.create_user(
+            username='lender',
+            email='user@lender.com',
+            password='lenderpass',
+            user_type=user_config.USER_TYPE_LENDER,
+        )
+        self.borrower = User.objects.create_user(
+            username='borrower',
+            email='user@borrower.com',
+            password='borrowerpass',
+            user_type=user_config.USER_TYPE_BORROWER
+        )
+        self.loan_request = LoanRequest.objects.create(
+            borrower=self.borrower,
+            requested_amount=5000,
+            repayment_period_months=12,
+        )
+
+        # Offers by interest rate, the smaller amounts cost less in total even at a higher rate
+        self.offers = {
+            rate: LoanOffer.objects.create(loan_request=self.loan_request, lender=self.lender,
+                                           offered_amount=amount, interest_rate=rate)
+            for rate, amount in [(7, 5000), (5, 5000), (9, 3000), (6, 5000)]
+        }
+        self.url = reverse('api-v1:loans:requests:best-offers', kwargs={'loan_request_id': self.loan_request.id})
+
+    def test_best_offers_are_ranked_by_total_cost(self):
+        """
+        Test that the borrower gets the pending offers cheapest total repayable amount first.
+        """
+        self.client.force_authenticate(user=self.borrower)
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([offer['id'] for offer in response.data],
+                         [self.offers[rate].id for rate in (9, 5, 6, 7)])
+
+    def test_best_offers_limit_and_pending_only(self):
+        """
+        Test that answered offers leave the ranking and that the limit is applied, in two queries.
+        """
+        rejected = self.offers[9]
+        rejected.offer_status = loan_config.OFFER_STATUS_REJECTED
+        rejected.save()
+
+        self.client.force_authenticate(user=self.borrower)
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {'limit': 2})
+
+        self.assertEqual([offer['id'] for offer in response.data], [self.offers[5].id, self.offers[6].id])
+
+    def test_best_offers_forbidden_for_other_users(self):
+        """
+        Test that only the borrower of the loan request can see its best offers.
+        """
+        self.client.force_authenticate(user=self.lender)
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_best_offers_invalid_limit(self):
+        """
+        Test that a limit out of range returns a 400 error.
+        """
+        self.client.force_authenticate(user=self.borrower)
+        response = self.client.get(self.url, {'limit': loan_config.BEST_OFFERS_MAX_LIMIT + 1})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('limit', response.data)
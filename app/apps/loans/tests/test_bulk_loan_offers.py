@@ -0,0 +1,124 @@
+from decimal import Decimal
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+
+from apps.loans.models.loan_offer import LoanOffer
+from apps.loans.models.loan_request import LoanRequest
+from apps.users import config
+
+User = get_user_model()
+
+
+class BulkCreateLoanOfferViewTests(APITestCase):
+
+    def setUp(self):
+        self.lender = User.objects.create_user(
+            username='lender',
+            email='user@lender.com',
+            password='lenderpass',
+            user_type=config.USER_TYPE_LENDER,
+        )
+        self.lender.wallet.balance = 10000
+        self.lender.wallet.save()
+
+        self.borrower = User.objects.create_user(
+            username='borrower',
+            email='user@borrower.com',
+            password='borrowerpass',
+            user_type=config.USER_TYPE_BORROWER
+        )
+
+        self.loan_requests = [
+            LoanRequest.objects.create(borrower=self.borrower, requested_amount=3000, repayment_period_months=12)
+            for _ in range(4)
+        ]
+
+        self.url = reverse('api-v1:loans:offers:bulk-create')
+
+    def payload(self, loan_requests, offered_amount=2000):
+        return {'offers': [
+            {'loan_request': loan_request.id, 'offered_amount': offered_amount, 'interest_rate': 5}
+            for loan_request in loan_requests
+        ]}
+
+    def test_bulk_create_loan_offers_success(self):
+        """
+        Test that a lender can create offers on several loan requests in one call, priced like single offers.
+        """
+        self.client.force_authenticate(user=self.lender)
+        response = self.client.post(self.url, data=self.payload(self.loan_requests[:3]), format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data['offers']), 3)
+        self.assertEqual(LoanOffer.objects.filter(lender=self.lender).count(), 3)
+        self.lender.wallet.refresh_from_db()
+        self.assertEqual(self.lender.wallet.reserved_amount, Decimal('6060.00'))
+
+        single = LoanOffer.objects.create(loan_request=self.loan_requests[3], lender=self.lender,
+                                          offered_amount=2000, interest_rate=5)
+        bulk = LoanOffer.objects.get(loan_request=self.loan_requests[0])
+        self.assertEqual((bulk.monthly_payment, bulk.total_interest, bulk.total_repayable_amount, bulk.apr),
+                         (single.monthly_payment, single.total_interest, single.total_repayable_amount, single.apr))
+        self.assertEqual(bulk.admin_fee, single.admin_fee)
+
+    def test_bulk_create_runs_constant_number_of_queries(self):
+        """
+        Test that the number of queries does not grow with the number of offers.
+        """
+        self.client.force_authenticate(user=self.lender)
+        with CaptureQueriesContext(connection) as one_offer:
+            self.client.post(self.url, data=self.payload(self.loan_requests[:1]), format='json')
+        with CaptureQueriesContext(connection) as three_offers:
+            self.client.post(self.url, data=self.payload(self.loan_requests[1:]), format='json')
+
+        self.assertEqual(LoanOffer.objects.count(), 4)
+        self.assertEqual(len(one_offer), len(three_offers))
+
+    def test_bulk_create_reports_errors_per_item(self):
+        """
+        Test that invalid offers are reported by index and that nothing is created.
+        """
+        inactive = self.loan_requests[1]
+        inactive.is_active = False
+        inactive.save()
+
+        payload = self.payload([self.loan_requests[0], inactive, self.loan_requests[0], self.loan_requests[2]])
+        payload['offers'][3]['offered_amount'] = 5000
+        self.client.force_authenticate(user=self.lender)
+        response = self.client.post(self.url, data=payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(sorted(response.data['offers']), [1, 2, 3])
+        self.assertIn('loan_request', response.data['offers'][1])
+        self.assertIn('loan_request', response.data['offers'][2])
+        self.assertIn('offered_amount', response.data['offers'][3])
+        self.assertEqual(LoanOffer.objects.count(), 0)
+
+    def test_bulk_create_checks_aggregate_exposure(self):
+        """
+        Test that offers are rejected once together they exceed the lender's balance.
+        """
+        self.lender.wallet.balance = Decimal('5000')
+        self.lender.wallet.save()
+        self.client.force_authenticate(user=self.lender)
+        response = self.client.post(self.url, data=self.payload(self.loan_requests[:3]), format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(sorted(response.data['offers']), [2])
+        self.assertIn('Insufficient funds', str(response.data['offers'][2]['offered_amount'][0]))
+        self.assertEqual(LoanOffer.objects.count(), 0)
+
+    def test_bulk_create_forbidden_for_borrowers(self):
+        """
+        Test that borrowers cannot create loan offers in bulk.
+        """
+        self.client.force_authenticate(user=self.borrower)
+        response = self.client.post(self.url, data=self.payload(self.loan_requests[:1]), format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(LoanOffer.objects.count(), 0)
@@ -1,3 +1,5 @@
+from decimal import Decimal
+
 from rest_framework import status
 from rest_framework.test import APITestCase
 from django.urls import reverse
@@ -69,6 +71,40 @@ class CreateLoanOfferViewTests(APITestCase):
         self.assertEqual(response.data['loan_request'], dict(LoanRequestSerializer(instance=self.loan_request).data))
         self.assertEqual(response.data['lender'], self.lender.id)  # Assuming lender is returned in response
 
+    def test_create_loan_offer_stores_amortization(self):
+        """
+        Test that the amortization summary is computed once and stored on the offer.
+        """
+        self.client.force_authenticate(user=self.lender)
+        response = self.client.post(self.url, data=self.valid_payload, format='json')
+
+        loan_offer = LoanOffer.objects.get()
+        self.assertEqual(loan_offer.monthly_payment, Decimal('428.04'))
+        self.assertEqual(loan_offer.total_interest, Decimal('136.45'))
+        self.assertEqual(response.data['monthly_payment'], '428.04')
+        self.assertEqual(response.data['apr'], str(loan_offer.apr))
+
+    def test_create_loan_offer_reserves_funds(self):
+        """
+        Test that a new offer reserves its funding amount, so pending offers cannot overcommit the wallet.
+        """
+        self.client.force_authenticate(user=self.lender)
+        response = self.client.post(self.url, data=self.valid_payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.lender.wallet.refresh_from_db()
+        self.assertEqual(self.lender.wallet.reserved_amount, Decimal('5050.00'))
+
+        other_request = LoanRequest.objects.create(borrower=self.borrower, requested_amount=5000,
+                                                   repayment_period_months=12)
+        self.valid_payload['loan_request'] = other_request.id
+        response = self.client.post(self.url, data=self.valid_payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(LoanOffer.objects.count(), 1)
+        self.lender.wallet.refresh_from_db()
+        self.assertEqual(self.lender.wallet.reserved_amount, Decimal('5050.00'))
+
     def test_create_loan_offer_forbidden_for_borrowers(self):
         """
         Test that borrowers cannot create loan offers.
@@ -1,13 +1,20 @@
+from datetime import timedelta
+
 from rest_framework import status
 from rest_framework.test import APITestCase
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from django.test import override_settings
 from django.utils import timezone
 from django.conf import settings
+from app.cache import get_version
+from app.redis import LOCAL_REDIS_URL
 from apps.loans import config as loan_config
+from apps.loans.etags import loan_offers_scope
 from apps.loans.models.loan import Loan
 from apps.loans.models.loan_offer import LoanOffer
 from apps.loans.models.loan_request import LoanRequest
+from apps.loans.tasks import expire_loan_offers
 from apps.payments.models import Payment
 from apps.transfers.models import Transfer
 from apps.users import config as user_config
@@ -16,6 +23,11 @@ from apps.wallets.models import Wallet
 
 User = get_user_model()
 
+# Offer and wallets reads, loan, transfer and payments inserts, wallet, offer and request updates,
+# competing offers read, release and rejection, the lenders to invalidate, and the savepoints of the
+# nested atomic blocks
+FUNDING_QUERY_BUDGET = 17
+
 
 class AcceptRejectLoanOfferViewTests(APITestCase):
 
@@ -74,6 +86,13 @@ class AcceptRejectLoanOfferViewTests(APITestCase):
         self.assertEqual(Loan.objects.count(), 1)
         self.assertEqual(Transfer.objects.count(), 1)
         self.assertEqual(Payment.objects.count(), self.loan_offer.loan_request.repayment_period_months)
+        payments = Payment.objects.order_by('payment_due_date')
+        self.assertEqual(sum(payment.principal_amount for payment in payments), self.loan_offer.offered_amount)
+        self.assertEqual(payments[0].payment_amount, self.loan_offer.monthly_payment)
+        self.assertEqual({payment.borrower_id for payment in payments}, {self.borrower.id})
+        loan = Loan.objects.get()
+        self.assertEqual(loan.remaining_installments, payments.count())
+        self.assertEqual(loan.outstanding_principal, self.loan_offer.offered_amount)
         self.loan_offer.refresh_from_db()
         self.loan_request.refresh_from_db()
         self.assertEqual(self.loan_offer.offer_status, loan_config.OFFER_STATUS_ACCEPTED)
@@ -91,6 +110,113 @@ class AcceptRejectLoanOfferViewTests(APITestCase):
         self.assertEqual(self.loan_offer.offer_status, loan_config.OFFER_STATUS_REJECTED)
         self.assertEqual(response.data['message'], 'Loan offer rejected successfully.')
 
+    def test_responding_to_offers_releases_reservations(self):
+        """
+        Test that accepting an offer pays out its reservation and releases those of the other pending offers.
+        """
+        other_lender = User.objects.create_user(
+            username='other_lender',
+            email='other@lender.com',
+            password='lenderpass',
+            user_type=user_config.USER_TYPE_LENDER,
+        )
+        other_offer = LoanOffer.objects.create(loan_request=self.loan_request, lender=other_lender,
+                                               offered_amount=4000, interest_rate=6)
+        Wallet.objects.filter(user=self.lender).update(balance=10000, reserved_amount=self.loan_offer.funding_amount)
+        Wallet.objects.filter(user=other_lender).update(balance=5000, reserved_amount=other_offer.funding_amount + 100)
+
+        self.client.force_authenticate(user=self.borrower)
+        response = self.client.post(self.accept_url, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.lender_wallet.refresh_from_db()
+        self.assertEqual(self.lender_wallet.balance, 10000 - self.loan_offer.funding_amount)
+        self.assertEqual(self.lender_wallet.reserved_amount, 0)
+        self.assertEqual(Wallet.objects.get(user=other_lender).reserved_amount, 100)
+
+    def test_accept_loan_offer_leaves_expired_offers_alone(self):
+        """
+        Test that a competing offer which already expired keeps its status and is not released a second time.
+        """
+        other_lender = User.objects.create_user(
+            username='other_lender',
+            email='other@lender.com',
+            password='lenderpass',
+            user_type=user_config.USER_TYPE_LENDER,
+        )
+        expired_offer = LoanOffer.objects.create(loan_request=self.loan_request, lender=other_lender,
+                                                 offered_amount=4000, interest_rate=6,
+                                                 offer_status=loan_config.OFFER_STATUS_EXPIRED)
+        # The expired offer gave its reservation back, what is left belongs to another offer
+        Wallet.objects.filter(user=other_lender).update(balance=5000, reserved_amount=100)
+
+        self.client.force_authenticate(user=self.borrower)
+        response = self.client.post(self.accept_url, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        expired_offer.refresh_from_db()
+        self.assertEqual(expired_offer.offer_status, loan_config.OFFER_STATUS_EXPIRED)
+        self.assertEqual(Wallet.objects.get(user=other_lender).reserved_amount, 100)
+
+    @override_settings(REDIS_URL=LOCAL_REDIS_URL)
+    def test_accept_loan_offer_invalidates_every_bidding_lender(self):
+        """
+        Test that lenders whose offers were no longer pending get a new offer list version too, since
+        their offers embed the now closed loan request.
+        """
+        other_lender = User.objects.create_user(
+            username='other_lender',
+            email='other@lender.com',
+            password='lenderpass',
+            user_type=user_config.USER_TYPE_LENDER,
+        )
+        LoanOffer.objects.create(loan_request=self.loan_request, lender=other_lender, offered_amount=4000,
+                                 interest_rate=6, offer_status=loan_config.OFFER_STATUS_REJECTED)
+        version = get_version(loan_offers_scope(other_lender.id))
+
+        self.client.force_authenticate(user=self.borrower)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.accept_url, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertNotEqual(get_version(loan_offers_scope(other_lender.id)), version)
+
+    def test_reject_loan_offer_releases_reservation(self):
+        """
+        Test that rejecting a pending offer gives its reserved funds back to the lender, once.
+        """
+        Wallet.objects.filter(user=self.lender).update(reserved_amount=self.loan_offer.funding_amount)
+
+        self.client.force_authenticate(user=self.borrower)
+        self.client.post(self.reject_url, format='json')
+        self.client.post(self.reject_url, format='json')
+
+        self.lender_wallet.refresh_from_db()
+        self.assertEqual(self.lender_wallet.reserved_amount, 0)
+        self.assertEqual(self.lender_wallet.available_balance, 10000)
+
+    def test_accept_loan_offer_query_budget(self):
+        """
+        Test that funding runs a fixed number of queries, whatever the term and the number of competing offers.
+        """
+        for index in range(3):
+            lender = User.objects.create_user(
+                username=f'competing_lender_{index}',
+                email=f'competing{index}@lender.com',
+                password='lenderpass',
+                user_type=user_config.USER_TYPE_LENDER,
+            )
+            LoanOffer.objects.create(loan_request=self.loan_request, lender=lender, offered_amount=4000,
+                                     interest_rate=6)
+
+        self.client.force_authenticate(user=self.borrower)
+        with self.assertNumQueries(FUNDING_QUERY_BUDGET):
+            response = self.client.post(self.accept_url, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(LoanOffer.objects.filter(loan_request=self.loan_request,
+                                                  offer_status=loan_config.OFFER_STATUS_REJECTED).count(), 3)
+
     def test_accept_loan_offer_unauthorized(self):
         """
         Test that someone other than the borrower cannot accept or reject the loan offer.
@@ -127,6 +253,40 @@ class AcceptRejectLoanOfferViewTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(response.data['error'], 'Insufficient funds in lender\'s wallet.')
 
+    def test_expired_offer_cannot_be_accepted(self):
+        """
+        Test that an offer expired by the TTL task is refused with a 409 and moves no money.
+        """
+        Wallet.objects.filter(user=self.lender).reserve(self.loan_offer.funding_amount)
+        LoanOffer.objects.filter(pk=self.loan_offer.pk).update(
+            created_at=timezone.now() - timedelta(seconds=settings.LOAN_OFFER_TTL + 60))
+        expire_loan_offers()
+
+        self.client.force_authenticate(user=self.borrower)
+        response = self.client.post(self.accept_url, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['error'], 'This loan offer is no longer pending.')
+        self.assertEqual(Loan.objects.count(), 0)
+        self.lender_wallet.refresh_from_db()
+        self.assertEqual(self.lender_wallet.balance, 10000)
+        self.assertEqual(self.lender_wallet.reserved_amount, 0)
+        self.loan_offer.refresh_from_db()
+        self.assertEqual(self.loan_offer.offer_status, loan_config.OFFER_STATUS_EXPIRED)
+
+    def test_accept_loan_offer_keeps_other_reservations(self):
+        """
+        Test that the funds reserved by the lender's other pending offers cannot pay for an accepted offer.
+        """
+        Wallet.objects.filter(user=self.lender).update(balance=self.loan_offer.funding_amount + 1000,
+                                                       reserved_amount=self.loan_offer.funding_amount + 1000)
+        self.client.force_authenticate(user=self.borrower)
+        self.assertEqual(self.client.post(self.accept_url, format='json').status_code, status.HTTP_201_CREATED)
+
+        self.lender_wallet.refresh_from_db()
+        self.assertEqual(self.lender_wallet.balance, 1000)
+        self.assertEqual(self.lender_wallet.reserved_amount, 1000)
+
     def test_invalid_action(self):
         """
         Test that an invalid action returns a 400 error.
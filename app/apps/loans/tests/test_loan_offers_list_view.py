@@ -0,0 +1,147 @@
+from rest_framework import status
+from rest_framework.test import APITestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+
+from app.redis import LOCAL_REDIS_URL, local_redis
+from apps.loans import config as loan_config
+from apps.loans.models.loan_offer import LoanOffer
+from apps.loans.models.loan_request import LoanRequest
+from apps.users import config as user_config
+
+User = get_user_model()
+
+
+@override_settings(REDIS_URL=LOCAL_REDIS_URL)
+class LoanOffersListViewTests(APITestCase):
+
+    def setUp(self):
+        local_redis.flushall()
+
+        self.lender = User.objects.create_user(
+            username='lender',
+            email='user@lender.com',
+            password='lenderpass',
+            user_type=user_config.USER_TYPE_LENDER,
+        )
+        self.other_lender = User.objects.create_user(
+            username='other_lender',
+            email='other@lender.com',
+            password='lenderpass',
+            user_type=user_config.USER_TYPE_LENDER,
+        )
+        self.borrower = User.objects.create_user(
+            username='borrower',
+            email='user@borrower.com',
+            password='borrowerpass',
+            user_type=user_config.USER_TYPE_BORROWER
+        )
+
+        self.loan_request = LoanRequest.objects.create(
+            borrower=self.borrower,
+            requested_amount=5000,
+            repayment_period_months=12,
+        )
+        self.loan_offer = LoanOffer.objects.create(
+            loan_request=self.loan_request,
+            lender=self.lender,
+            offered_amount=5000,
+            interest_rate=5,
+        )
+
+        self.url = reverse('api-v1:loans:offers:list')
+
+    def get_etag(self, user):
+        self.client.force_authenticate(user=user)
+        return self.client.get(self.url)['ETag']
+
+    def test_lender_lists_offered_loan_offers(self):
+        """
+        Test that a lender gets the offers they made.
+        """
+        self.client.force_authenticate(user=self.lender)
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['offers_type'], 'offered')
+        self.assertEqual([offer['id'] for offer in response.data['offers']], [self.loan_offer.id])
+
+    def test_borrower_lists_received_loan_offers(self):
+        """
+        Test that a borrower gets the offers made on their loan requests.
+        """
+        self.client.force_authenticate(user=self.borrower)
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['offers_type'], 'received')
+        self.assertEqual([offer['id'] for offer in response.data['offers']], [self.loan_offer.id])
+
+    def test_unchanged_offers_return_not_modified(self):
+        """
+        Test that a conditional GET with the current ETag gets a 304 without touching the database.
+        """
+        etag = self.get_etag(self.lender)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_offer_write_changes_etag_of_involved_users_only(self):
+        """
+        Test that an offer write invalidates the lender and borrower ETags, but not other users'.
+        """
+        lender_etag = self.get_etag(self.lender)
+        borrower_etag = self.get_etag(self.borrower)
+        other_lender_etag = self.get_etag(self.other_lender)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.loan_offer.offer_status = loan_config.OFFER_STATUS_REJECTED
+            self.loan_offer.save()
+
+        self.assertNotEqual(self.get_etag(self.lender), lender_etag)
+        self.assertNotEqual(self.get_etag(self.borrower), borrower_etag)
+        self.assertEqual(self.get_etag(self.other_lender), other_lender_etag)
+
+    def test_loan_request_write_changes_etag_of_bidding_lenders(self):
+        """
+        Test that updating a loan request invalidates the ETag of the lenders who bid on it.
+        """
+        lender_etag = self.get_etag(self.lender)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.loan_request.is_active = False
+            self.loan_request.save()
+
+        self.assertNotEqual(self.get_etag(self.lender), lender_etag)
+
+    def test_query_count_does_not_grow_with_offers(self):
+        """
+        Test that listing offers costs a fixed number of queries however many offers there are.
+        """
+        for user in (self.lender, self.borrower):
+            self.client.force_authenticate(user=user)
+            with self.assertNumQueries(1):
+                self.client.get(self.url)
+
+        for amount in (1000, 2000, 3000):
+            other_request = LoanRequest.objects.create(
+                borrower=self.borrower,
+                requested_amount=amount,
+                repayment_period_months=6,
+            )
+            for interest_rate in (5, 7):
+                LoanOffer.objects.create(
+                    loan_request=other_request,
+                    lender=self.lender,
+                    offered_amount=amount,
+                    interest_rate=interest_rate,
+                )
+
+        for user in (self.lender, self.borrower):
+            self.client.force_authenticate(user=user)
+            with self.assertNumQueries(1):
+                response = self.client.get(self.url)
+            self.assertEqual(len(response.data['offers']), 7)
@@ -0,0 +1,123 @@
+import json
+from datetime import timedelta
+
+from rest_framework.test import APITestCase
+from django.conf import settings
+from django.core.cache import cache
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from django.utils import timezone
+
+from app.cache import get_version
+from app.redis import LOCAL_REDIS_URL, local_redis
+from apps.loans import config as loan_config
+from apps.loans.etags import loan_offers_scope
+from apps.loans.loan_request_cache import READY_KEY, get_active_loan_requests_page
+from apps.loans.models.loan_offer import LoanOffer
+from apps.loans.models.loan_request import LoanRequest
+from apps.loans.tasks import expire_loan_requests
+from apps.users import config as user_config
+from apps.wallets.models import Wallet
+
+User = get_user_model()
+
+
+@override_settings(REDIS_URL=LOCAL_REDIS_URL)
+class ExpireLoanRequestsTaskTests(APITestCase):
+
+    def setUp(self):
+        local_redis.flushall()
+        cache.delete(READY_KEY)
+
+        self.lender = User.objects.create_user(
+            username='lender',
+            email='user@lender.com',
+            password='lenderpass',
+            user_type=user_config.USER_TYPE_LENDER,
+        )
+        Wallet.objects.filter(user=self.lender).update(balance=10000)
+        self.borrower = User.objects.create_user(
+            username='borrower',
+            email='user@borrower.com',
+            password='borrowerpass',
+            user_type=user_config.USER_TYPE_BORROWER
+        )
+        self.stale_created = timezone.now() - timedelta(seconds=settings.LOAN_REQUEST_TTL + 60)
+
+    def create_loan_request(self, created=None):
+        return LoanRequest.objects.create(
+            borrower=self.borrower,
+            requested_amount=5000,
+            repayment_period_months=12,
+            created=created or timezone.now(),
+        )
+
+    def listed_ids(self):
+        return [row['id'] for row in json.loads(get_active_loan_requests_page())['results']]
+
+    def test_closes_stale_requests_and_rejects_their_offers(self):
+        """
+        Test that requests past the TTL are closed, their pending offers rejected and the reservations released.
+        """
+        stale_request = self.create_loan_request(created=self.stale_created)
+        fresh_request = self.create_loan_request()
+        offer = LoanOffer.objects.create(loan_request=stale_request, lender=self.lender,
+                                         offered_amount=1000, interest_rate=5)
+        Wallet.objects.filter(user=self.lender).reserve(offer.funding_amount)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(expire_loan_requests(), 1)
+
+        stale_request.refresh_from_db()
+        fresh_request.refresh_from_db()
+        offer.refresh_from_db()
+        self.assertFalse(stale_request.is_active)
+        self.assertTrue(fresh_request.is_active)
+        self.assertEqual(offer.offer_status, loan_config.OFFER_STATUS_REJECTED)
+        self.assertEqual(Wallet.objects.get(user=self.lender).reserved_amount, 0)
+
+    def test_leaves_offers_that_are_no_longer_pending_alone(self):
+        """
+        Test that an offer which already expired keeps its status and is not released a second time.
+        """
+        stale_request = self.create_loan_request(created=self.stale_created)
+        offer = LoanOffer.objects.create(loan_request=stale_request, lender=self.lender, offered_amount=1000,
+                                         interest_rate=5, offer_status=loan_config.OFFER_STATUS_EXPIRED)
+        # The expired offer gave its reservation back, what is left belongs to another offer
+        Wallet.objects.filter(user=self.lender).update(balance=5000, reserved_amount=100)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(expire_loan_requests(), 1)
+
+        offer.refresh_from_db()
+        self.assertEqual(offer.offer_status, loan_config.OFFER_STATUS_EXPIRED)
+        self.assertEqual(Wallet.objects.get(user=self.lender).reserved_amount, 100)
+
+    def test_invalidates_lenders_of_offers_no_longer_pending(self):
+        """
+        Test that lenders whose offers on a closed request were already rejected get a new offer list version.
+        """
+        stale_request = self.create_loan_request(created=self.stale_created)
+        LoanOffer.objects.create(loan_request=stale_request, lender=self.lender, offered_amount=1000,
+                                 interest_rate=5, offer_status=loan_config.OFFER_STATUS_REJECTED)
+        version = get_version(loan_offers_scope(self.lender.id))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            expire_loan_requests()
+
+        self.assertNotEqual(get_version(loan_offers_scope(self.lender.id)), version)
+
+    def test_evicts_closed_requests_from_the_marketplace(self):
+        """
+        Test that closed requests leave the cached marketplace list, batch by batch.
+        """
+        stale_requests = [self.create_loan_request(created=self.stale_created + timedelta(seconds=i))
+                          for i in range(5)]
+        fresh_request = self.create_loan_request()
+        self.assertEqual(len(self.listed_ids()), 6)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(expire_loan_requests(batch_size=2), 5)
+
+        self.assertEqual(self.listed_ids(), [fresh_request.id])
+        self.assertFalse(LoanRequest.objects.filter(id__in=[lr.id for lr in stale_requests], is_active=True).exists())
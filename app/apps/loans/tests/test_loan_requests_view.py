@@ -1,9 +1,20 @@
+import json
+from unittest.mock import patch
+
 from rest_framework import status
 from rest_framework.test import APITestCase
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.test import override_settings
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 
+from app.cache import cache_lock
+from app.redis import LOCAL_REDIS_URL, local_redis
+from apps.loans.config import LOAN_REQUESTS_PAGE_SIZE
+from apps.loans.loan_request_cache import GENERATION_KEY, READY_KEY, _page_key, get_active_loan_requests_page
 from apps.loans.models.loan_request import LoanRequest
+from apps.loans.pagination import MAX_SCORE, MIN_SCORE, encode_cursor
 from apps.users import config
 
 User = get_user_model()
@@ -85,3 +96,270 @@ class CreateLoanRequestViewTests(APITestCase):
         response = self.client.post(self.url, data=incomplete_payload, format='json')
 
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(REDIS_URL=LOCAL_REDIS_URL)
+class ListLoanRequestsViewTests(APITestCase):
+
+    def setUp(self):
+        local_redis.flushall()
+        cache.delete(READY_KEY)
+
+        self.borrower = User.objects.create_user(
+            email='user@borrower.com',
+            username='borrower',
+            password='borrowerpass',
+            user_type=config.USER_TYPE_BORROWER
+        )
+        self.lender = User.objects.create_user(
+            email='user@lender.com',
+            username='lender',
+            password='lenderpass',
+            user_type=config.USER_TYPE_LENDER
+        )
+
+        self.first_request = LoanRequest.objects.create(
+            borrower=self.borrower, requested_amount=5000, repayment_period_months=12)
+        self.second_request = LoanRequest.objects.create(
+            borrower=self.borrower, requested_amount=3000, repayment_period_months=6)
+
+        self.url = reverse('api-v1:loans:requests:list')
+
+    def list_ids(self, **params):
+        self.client.force_authenticate(user=self.lender)
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [row['id'] for row in response.json()['results']]
+
+    def walk_pages(self, **params):
+        self.client.force_authenticate(user=self.lender)
+        ids, cursor = [], None
+        while True:
+            page = self.client.get(self.url, {**params, **({'cursor': cursor} if cursor else {})}).json()
+            ids.append([row['id'] for row in page['results']])
+            cursor = page['next_cursor']
+            if cursor is None:
+                return ids
+
+    def test_list_active_loan_requests(self):
+        """
+        Test that lenders get every active loan request ordered by creation.
+        """
+        self.assertEqual(self.list_ids(), [self.first_request.id, self.second_request.id])
+
+    def test_list_loan_requests_forbidden_for_borrowers(self):
+        """
+        Test that borrowers cannot list loan requests.
+        """
+        self.client.force_authenticate(user=self.borrower)
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_list_served_from_cache(self):
+        """
+        Test that a warm store answers the list without querying the database.
+        """
+        self.list_ids()
+        self.client.force_authenticate(user=self.lender)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+
+        self.assertEqual(len(response.json()['results']), 2)
+
+    def test_warm_payload_skips_row_assembly(self):
+        """
+        Test that a warm page is answered from the cached JSON payload without rebuilding it.
+        """
+        self.client.force_authenticate(user=self.lender)
+        first_response = self.client.get(self.url)
+
+        with patch('apps.loans.loan_request_cache._page_from_store') as assemble:
+            response = self.client.get(self.url)
+
+        assemble.assert_not_called()
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response.content, first_response.content)
+
+    def test_writes_update_only_the_affected_row(self):
+        """
+        Test that inserts, deactivations and deletes are applied to the warm store row by row.
+        """
+        self.list_ids()
+
+        with patch('apps.loans.loan_request_cache.rebuild_active_loan_requests') as rebuild:
+            with self.captureOnCommitCallbacks(execute=True):
+                third_request = LoanRequest.objects.create(
+                    borrower=self.borrower, requested_amount=1000, repayment_period_months=3)
+                self.first_request.is_active = False
+                self.first_request.save()
+                self.second_request.requested_amount = 3500
+                self.second_request.save()
+
+            self.assertEqual(self.list_ids(), [self.second_request.id, third_request.id])
+            self.client.force_authenticate(user=self.lender)
+            self.assertEqual(self.client.get(self.url).json()['results'][0]['requested_amount'], '3500.00')
+
+            with self.captureOnCommitCallbacks(execute=True):
+                third_request.delete()
+            self.assertEqual(self.list_ids(), [self.second_request.id])
+
+        rebuild.assert_not_called()
+
+    def test_rolled_back_write_is_not_cached(self):
+        """
+        Test that a loan request saved in a transaction that rolls back never reaches the warm store.
+        """
+        self.list_ids()
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            try:
+                with transaction.atomic():
+                    LoanRequest.objects.create(borrower=self.borrower, requested_amount=1000,
+                                               repayment_period_months=3)
+                    raise IntegrityError
+            except IntegrityError:
+                pass
+
+        self.assertEqual(callbacks, [])
+        self.assertEqual(self.list_ids(), [self.first_request.id, self.second_request.id])
+
+    def test_rolled_back_delete_keeps_the_request_listed(self):
+        """
+        Test that a loan request deleted in a transaction that rolls back stays in the warm store.
+        """
+        listed = self.list_ids()
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            try:
+                with transaction.atomic():
+                    self.first_request.delete()
+                    raise IntegrityError
+            except IntegrityError:
+                pass
+
+        self.assertEqual(callbacks, [])
+        self.assertEqual(self.list_ids(), listed)
+
+    def test_page_rebuild_is_single_flight(self):
+        """
+        Test that while another worker rebuilds a page after a write, readers get its previous version
+        without querying the database.
+        """
+        get_active_loan_requests_page(min_amount=0)
+        with self.captureOnCommitCallbacks(execute=True):
+            LoanRequest.objects.create(borrower=self.borrower, requested_amount=1000, repayment_period_months=3)
+
+        with cache_lock(_page_key(None, LOAN_REQUESTS_PAGE_SIZE, {'requested_amount__gte': 0})):
+            with self.assertNumQueries(0):
+                payload = get_active_loan_requests_page(min_amount=0)
+
+        self.assertEqual([row['id'] for row in json.loads(payload)['results']],
+                         [self.first_request.id, self.second_request.id])
+        self.assertEqual(len(json.loads(get_active_loan_requests_page(min_amount=0))['results']), 3)
+
+    def test_cold_page_waits_for_the_worker_building_it(self):
+        """
+        Test that a reader with no previous version of a page waits for the worker building it.
+        """
+        page_key = _page_key(None, LOAN_REQUESTS_PAGE_SIZE, {'requested_amount__gte': 0})
+        built = b'{"next_cursor":null,"results":[]}'
+
+        def build_elsewhere(seconds):
+            local_redis.set(page_key, (local_redis.get(GENERATION_KEY) or b'0') + b':' + built)
+
+        get_active_loan_requests_page()
+        with cache_lock(page_key), patch('apps.loans.loan_request_cache.time.sleep', side_effect=build_elsewhere):
+            with self.assertNumQueries(0):
+                self.assertEqual(get_active_loan_requests_page(min_amount=0), built)
+
+    def test_cursor_pagination_walks_every_request_once(self):
+        """
+        Test that following next_cursor returns each active request exactly once, including creation ties.
+        """
+        tied = [
+            LoanRequest.objects.create(borrower=self.borrower, requested_amount=amount, repayment_period_months=6,
+                                       created=self.second_request.created)
+            for amount in (100, 200)
+        ]
+        expected = [[self.first_request.id, self.second_request.id], [tied[0].id, tied[1].id]]
+
+        self.assertEqual(self.walk_pages(page_size=2), expected)
+        # Filtered pages come from the database and must follow the same order.
+        self.assertEqual(self.walk_pages(page_size=2, min_amount=0), expected)
+
+    def test_filter_loan_requests(self):
+        """
+        Test that the amount range and repayment period filters are applied server side.
+        """
+        self.assertEqual(self.list_ids(min_amount=4000), [self.first_request.id])
+        self.assertEqual(self.list_ids(max_amount=4000), [self.second_request.id])
+        self.assertEqual(self.list_ids(repayment_period_months=6), [self.second_request.id])
+        self.assertEqual(self.list_ids(min_amount=1000, max_amount=2000), [])
+
+    def test_filtered_page_skips_inactive_requests(self):
+        """
+        Test that filtered pages only include active requests.
+        """
+        self.first_request.is_active = False
+        self.first_request.save()
+
+        self.assertEqual(self.list_ids(min_amount=0), [self.second_request.id])
+
+    def test_invalid_query_parameters(self):
+        """
+        Test that malformed cursors and inverted amount ranges return a 400 error.
+        """
+        self.client.force_authenticate(user=self.lender)
+
+        self.assertEqual(self.client.get(self.url, {'cursor': 'not-a-cursor'}).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        # Out of range positions are rejected too, on the filtered database path as well as the store
+        for position in ((10 ** 20, 1), (-10 ** 20, 1), (0, 2 ** 64)):
+            cursor = encode_cursor(*position)
+            self.assertEqual(self.client.get(self.url, {'cursor': cursor}).status_code,
+                             status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(self.client.get(self.url, {'cursor': cursor, 'min_amount': 0}).status_code,
+                             status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.url, {'min_amount': 10, 'max_amount': 5}).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+
+    def test_cursor_at_the_edges_of_time(self):
+        """
+        Test that cursors at the first and last representable creation times are served, not a 500 error.
+        """
+        self.client.force_authenticate(user=self.lender)
+
+        for score in (MIN_SCORE, MAX_SCORE):
+            cursor = encode_cursor(score, 1)
+            self.assertEqual(self.client.get(self.url, {'cursor': cursor}).status_code, status.HTTP_200_OK)
+            self.assertEqual(self.client.get(self.url, {'cursor': cursor, 'min_amount': 0}).status_code,
+                             status.HTTP_200_OK)
+
+    def test_unchanged_list_returns_not_modified(self):
+        """
+        Test that a conditional GET with the current ETag gets a 304 without touching the database.
+        """
+        self.client.force_authenticate(user=self.lender)
+        etag = self.client.get(self.url)['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_etag_changes_after_write(self):
+        """
+        Test that a loan request write invalidates the ETag of the list.
+        """
+        self.client.force_authenticate(user=self.lender)
+        etag = self.client.get(self.url)['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.second_request.is_active = False
+            self.second_request.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
@@ -0,0 +1,127 @@
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+
+from apps.loans import amortization
+from apps.loans import config as loan_config
+from apps.loans.models.loan import Loan
+from apps.loans.models.loan_offer import LoanOffer
+from apps.loans.models.loan_request import LoanRequest
+from apps.users import config as user_config
+
+User = get_user_model()
+
+
+class LoanScheduleViewTests(APITestCase):
+
+    def setUp(self):
+        amortization.memoized_schedule.cache_clear()
+
+        self.lender = User.objects.create_user(
+            username='lender',
+            email='user@lender.com',
+            password='lenderpass',
+            user_type=user_config.USER_TYPE_LENDER,
+        )
+        self.borrower = User.objects.create_user(
+            username='borrower',
+            email='user@borrower.com',
+            password='borrowerpass',
+            user_type=user_config.USER_TYPE_BORROWER
+        )
+        self.stranger = User.objects.create_user(
+            username='stranger',
+            email='stranger@borrower.com',
+            password='borrowerpass',
+            user_type=user_config.USER_TYPE_BORROWER
+        )
+
+        self.loan_request = LoanRequest.objects.create(
+            borrower=self.borrower,
+            requested_amount=5000,
+            repayment_period_months=12,
+        )
+        self.loan_offer = LoanOffer.objects.create(
+            loan_request=self.loan_request,
+            lender=self.lender,
+            offered_amount=5000,
+            interest_rate=5,
+            admin_fee=0.1,
+        )
+        self.loan = Loan.objects.create(
+            borrower=self.borrower,
+            lender=self.lender,
+            amount=5000,
+            duration_months=12,
+            annual_interest_rate=5,
+            admin_fee=Decimal('0.10'),
+            funded_at=datetime(2024, 1, 31, tzinfo=dt_timezone.utc),
+            status=loan_config.FUNDED,
+            loan_offer=self.loan_offer,
+        )
+
+        self.offer_url = reverse('api-v1:loans:offers:schedule', kwargs={'offer_id': self.loan_offer.id})
+        self.loan_url = reverse('api-v1:loans:schedule', kwargs={'loan_id': self.loan.id})
+
+    def test_borrower_gets_offer_schedule(self):
+        """
+        Test that the borrower gets one row per installment, matching the stored offer summary.
+        """
+        self.client.force_authenticate(user=self.borrower)
+        response = self.client.get(self.offer_url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['installments']), 12)
+        self.assertEqual(Decimal(response.data['monthly_payment']), self.loan_offer.monthly_payment)
+        self.assertEqual(Decimal(response.data['total_interest']), self.loan_offer.total_interest)
+        self.assertEqual(Decimal(response.data['apr']), self.loan_offer.apr)
+        self.assertEqual(sum(Decimal(row['principal']) for row in response.data['installments']), Decimal('5000'))
+        self.assertEqual(response.data['installments'][-1]['balance'], '0.00')
+
+    def test_loan_schedule_is_due_from_funding_date(self):
+        """
+        Test that the loan schedule is due monthly from the funding date, clamped to month ends.
+        """
+        self.client.force_authenticate(user=self.lender)
+        response = self.client.get(self.loan_url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        due_dates = [row['due_date'] for row in response.data['installments']]
+        self.assertEqual(due_dates[:3], ['2024-02-29', '2024-03-31', '2024-04-30'])
+
+    def test_schedule_is_memoized_per_loan_shape(self):
+        """
+        Test that an offer and a loan with the same principal, rate, term and fee share one computation.
+        """
+        self.client.force_authenticate(user=self.borrower)
+        offer_response = self.client.get(self.offer_url)
+        loan_response = self.client.get(self.loan_url)
+
+        info = amortization.memoized_schedule.cache_info()
+        self.assertEqual((info.misses, info.hits), (1, 1))
+        self.assertEqual(
+            [row['amount'] for row in offer_response.data['installments']],
+            [row['amount'] for row in loan_response.data['installments']],
+        )
+
+    def test_unrelated_user_cannot_view_schedules(self):
+        """
+        Test that a user who is neither the lender nor the borrower gets a 403.
+        """
+        self.client.force_authenticate(user=self.stranger)
+
+        self.assertEqual(self.client.get(self.offer_url).status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.client.get(self.loan_url).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_missing_offer_returns_not_found(self):
+        """
+        Test that a schedule request for an unknown offer gets a 404.
+        """
+        self.client.force_authenticate(user=self.borrower)
+        url = reverse('api-v1:loans:offers:schedule', kwargs={'offer_id': self.loan_offer.id + 100})
+
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,115 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from rest_framework.test import APITestCase
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from apps.loans import config as loan_config
+from apps.loans.etags import loan_offers_scope
+from apps.loans.models.loan_offer import LoanOffer
+from apps.loans.models.loan_request import LoanRequest
+from apps.loans.tasks import expire_loan_offers
+from apps.users import config as user_config
+from apps.wallets.models import Wallet
+from app.cache import get_version
+
+User = get_user_model()
+
+
+class ExpireLoanOffersTaskTests(APITestCase):
+
+    def setUp(self):
+        self.lender = User.objects.create_user(
+            username='lender',
+            email='user@lender.com',
+            password='lenderpass',
+            user_type=user_config.USER_TYPE_LENDER,
+        )
+        self.borrower = User.objects.create_user(
+            username='borrower',
+            email='user@borrower.com',
+            password='borrowerpass',
+            user_type=user_config.USER_TYPE_BORROWER
+        )
+        self.loan_request = LoanRequest.objects.create(
+            borrower=self.borrower,
+            requested_amount=5000,
+            repayment_period_months=12,
+        )
+        self.stale_created_at = timezone.now() - timedelta(seconds=settings.LOAN_OFFER_TTL + 60)
+
+    def create_offer(self, loan_request=None, created_at=None, **kwargs):
+        offer = LoanOffer.objects.create(
+            loan_request=loan_request or self.loan_request,
+            lender=self.lender,
+            offered_amount=1000,
+            interest_rate=5,
+            created_at=created_at or timezone.now(),
+            **kwargs
+        )
+        Wallet.objects.filter(user=self.lender).update(balance=10000)
+        if offer.offer_status == loan_config.OFFER_STATUS_PENDING:
+            Wallet.objects.filter(user=self.lender).reserve(offer.funding_amount)
+        return offer
+
+    def test_expires_stale_offers_and_releases_funds(self):
+        """
+        Test that pending offers past the TTL expire and give their reserved funds back.
+        """
+        stale_offer = self.create_offer(created_at=self.stale_created_at)
+        fresh_offer = self.create_offer()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(expire_loan_offers(), 1)
+
+        stale_offer.refresh_from_db()
+        fresh_offer.refresh_from_db()
+        self.assertEqual(stale_offer.offer_status, loan_config.OFFER_STATUS_EXPIRED)
+        self.assertEqual(fresh_offer.offer_status, loan_config.OFFER_STATUS_PENDING)
+        self.assertEqual(Wallet.objects.get(user=self.lender).reserved_amount, fresh_offer.funding_amount)
+
+    def test_expires_offers_on_inactive_requests(self):
+        """
+        Test that pending offers on a loan request that is no longer active expire whatever their age.
+        """
+        closed_request = LoanRequest.objects.create(borrower=self.borrower, requested_amount=5000,
+                                                    repayment_period_months=12)
+        offer = self.create_offer(loan_request=closed_request)
+        closed_request.is_active = False
+        closed_request.save()
+
+        expire_loan_offers()
+
+        offer.refresh_from_db()
+        self.assertEqual(offer.offer_status, loan_config.OFFER_STATUS_EXPIRED)
+        self.assertEqual(Wallet.objects.get(user=self.lender).reserved_amount, Decimal('0.00'))
+
+    def test_leaves_answered_offers_alone(self):
+        """
+        Test that accepted and rejected offers are never expired.
+        """
+        rejected_offer = self.create_offer(created_at=self.stale_created_at,
+                                           offer_status=loan_config.OFFER_STATUS_REJECTED)
+
+        self.assertEqual(expire_loan_offers(), 0)
+        rejected_offer.refresh_from_db()
+        self.assertEqual(rejected_offer.offer_status, loan_config.OFFER_STATUS_REJECTED)
+
+    def test_expires_in_batches_and_bumps_offer_list_versions(self):
+        """
+        Test that offers are expired batch by batch and that the offer lists of both parties are invalidated.
+        """
+        offers = [self.create_offer(created_at=self.stale_created_at) for _ in range(5)]
+        lender_version = get_version(loan_offers_scope(self.lender.id))
+        borrower_version = get_version(loan_offers_scope(self.borrower.id))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(expire_loan_offers(batch_size=2), 5)
+
+        self.assertEqual(LoanOffer.objects.filter(id__in=[offer.id for offer in offers],
+                                                  offer_status=loan_config.OFFER_STATUS_EXPIRED).count(), 5)
+        self.assertEqual(Wallet.objects.get(user=self.lender).reserved_amount, Decimal('0.00'))
+        self.assertNotEqual(get_version(loan_offers_scope(self.lender.id)), lender_version)
+        self.assertNotEqual(get_version(loan_offers_scope(self.borrower.id)), borrower_version)
@@ -1,8 +1,11 @@
 from django.urls import path, include
 
+from apps.loans.views.loan_schedule_views import LoanScheduleView
+
 app_name = 'loans'
 
 urlpatterns = [
     path('requests/', include('apps.loans.urls.loan_requests_urls', namespace='requests')),
     path('offers/', include('apps.loans.urls.loan_offers_urls', namespace='offers')),
+    path('<int:loan_id>/schedule/', LoanScheduleView.as_view(), name='schedule'),
 ]
@@ -1,12 +1,17 @@
 from django.urls import path
 
-from apps.loans.views.loan_offers_views import CreateLoanOfferView, LoanOffersListView, AcceptRejectLoanOfferView
+from apps.loans.views.loan_offers_views import (AcceptRejectLoanOfferView, BulkCreateLoanOfferView, CreateLoanOfferView,
+                                               FundingJobStatusView, LoanOffersListView)
+from apps.loans.views.loan_schedule_views import LoanOfferScheduleView
 
 app_name = 'offers'
 
 urlpatterns = [
     path('', LoanOffersListView.as_view(), name='list'),
     path('create/', CreateLoanOfferView.as_view(), name='create'),
+    path('bulk/', BulkCreateLoanOfferView.as_view(), name='bulk-create'),
+    path('jobs/<str:job_id>/', FundingJobStatusView.as_view(), name='job-status'),
+    path('<int:offer_id>/schedule/', LoanOfferScheduleView.as_view(), name='schedule'),
     path('<int:offer_id>/<str:action>/', AcceptRejectLoanOfferView.as_view(),
          name='respond'),
 
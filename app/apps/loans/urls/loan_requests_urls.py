@@ -1,5 +1,6 @@
 from django.urls import path
 
+from apps.loans.views.loan_offers_views import BestLoanOffersView
 from apps.loans.views.loan_request_views import CreateLoanRequestView, ListLoanRequestsView
 
 app_name = 'requests'
@@ -7,4 +8,5 @@ app_name = 'requests'
 urlpatterns = [
     path('', ListLoanRequestsView.as_view(), name='list'),
     path('create/', CreateLoanRequestView.as_view(), name='create'),
+    path('<int:loan_request_id>/best_offers/', BestLoanOffersView.as_view(), name='best-offers'),
 ]
@@ -1,6 +1,7 @@
 from django.conf import settings
 from django.db import transaction
-from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from rest_framework.permissions import IsAuthenticated
@@ -8,18 +9,22 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 
-from apps.loans.models.loan import Loan
+from apps.idempotency.decorators import IDEMPOTENCY_KEY_PARAMETER, idempotent
+from apps.loans.etags import bump_loan_offers_versions, loan_offers_etag
+from apps.loans.funding import fund_loan_offer, funding_queue, loan_offers_for_funding
+from apps.loans.funding_jobs import create_funding_job, get_funding_job
 from apps.loans.models.loan_offer import LoanOffer
 from apps.loans.models.loan_request import LoanRequest
-from apps.loans.serializers.loan_offers_serializers import LoanOfferSerializer
+from apps.loans.serializers.loan_offers_serializers import (BestLoanOffersQuerySerializer, BulkLoanOfferSerializer,
+                                                             FundingJobSerializer, LoanOfferSerializer)
+from apps.loans.tasks import accept_loan_offer
 from apps.loans.serializers.loan_serializers import LoanSerializer
-from apps.payments.models import Payment
-from apps.transfers.models import Transfer
 from apps.users import config as user_config
 from apps.loans import config as loan_config
-from apps.transfers import config as transfer_config
 from apps.users.models import Lender, Borrower
+from apps.wallets.locking import retry_on_conflict
 from apps.wallets.models import Wallet
 
 
@@ -66,6 +71,7 @@ class CreateLoanOfferView(APIView):
             )
         }
     )
+    @transaction.atomic
     def post(self, request, *args, **kwargs):
         if request.user.user_type != user_config.USER_TYPE_LENDER:
             return Response({'error': 'You are not authorized to create a loan offer.'},
@@ -77,7 +83,8 @@ class CreateLoanOfferView(APIView):
 
         loan_request = get_object_or_404(LoanRequest, id=loan_request_id, is_active=True)
 
-        if request.user.wallet.balance < (float(loan_request.requested_amount) + (
+        # Funds held by the lender's pending offers are not available for a new one
+        if request.user.wallet.available_balance < (float(loan_request.requested_amount) + (
                 float(loan_request.requested_amount) * settings.PROCESSING_FEE)):
             return Response({
                 'error': f'Insufficient funds you have to charge your balance to have {float(loan_request.requested_amount) + (float(loan_request.requested_amount) * settings.PROCESSING_FEE)} USD in your wallet'
@@ -87,16 +94,79 @@ class CreateLoanOfferView(APIView):
         if serializer.is_valid():
             serializer.validated_data['lender'] = request.user
             loan_offer = serializer.save()
+            # The check and the reservation are one statement, so concurrent offers cannot both pass it
+            if not Wallet.objects.filter(user=request.user).reserve(loan_offer.funding_amount):
+                transaction.set_rollback(True)
+                return Response({'error': 'Insufficient funds to reserve for this loan offer.'},
+                                status=status.HTTP_400_BAD_REQUEST)
             return Response(LoanOfferSerializer(loan_offer).data, status=status.HTTP_201_CREATED)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class BulkCreateLoanOfferView(APIView):
+    """
+    Create loan offers for many loan requests at once.
+    The batch is validated as a whole against the lender's available balance and created all or nothing,
+    reserving the funds of every offer at once.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        request_body=BulkLoanOfferSerializer,
+        responses={
+            201: openapi.Response(
+                description="Loan offers created successfully",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        'offers': openapi.Schema(type=openapi.TYPE_ARRAY,
+                                                 items=openapi.Schema(type=openapi.TYPE_OBJECT))
+                    }
+                )
+            ),
+            400: openapi.Response(
+                description="Validation errors, keyed by the index of each invalid offer"
+            ),
+            403: openapi.Response(
+                description="Forbidden for non-lenders",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        'error': openapi.Schema(type=openapi.TYPE_STRING, description='Error message')
+                    }
+                )
+            )
+        }
+    )
+    @transaction.atomic
+    def post(self, request, *args, **kwargs):
+        if request.user.user_type != user_config.USER_TYPE_LENDER:
+            return Response({'error': 'You are not authorized to create a loan offer.'},
+                            status=status.HTTP_403_FORBIDDEN)
+
+        wallet = Wallet.objects.get(user=request.user)
+        serializer = BulkLoanOfferSerializer(data=request.data, context={'lender': request.user, 'wallet': wallet})
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        loan_offers = serializer.save()
+        if not Wallet.objects.filter(pk=wallet.pk).reserve(sum(offer.funding_amount for offer in loan_offers)):
+            transaction.set_rollback(True)
+            return Response({'error': 'Insufficient funds to reserve for these loan offers.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        # bulk_create sends no post_save signal, invalidate the offer lists of everyone involved here
+        bump_loan_offers_versions([request.user.id, *(offer.loan_request.borrower_id for offer in loan_offers)])
+        return Response({'offers': LoanOfferSerializer(loan_offers, many=True).data}, status=status.HTTP_201_CREATED)
+
+
 class LoanOffersListView(APIView):
     """
     Retrieve loan offers based on user type.
     - If the user is a lender: lists their offered loan offers.
     - If the user is a borrower: lists the received loan offers.
+    Responses carry a per user ETag, so polling clients get a 304 while their offers are unchanged.
     """
     permission_classes = [IsAuthenticated]
 
@@ -107,6 +177,9 @@ class LoanOffersListView(APIView):
                 description="A list of loan offers.",
                 schema=LoanOfferSerializer(many=True)
             ),
+            304: openapi.Response(
+                description="Not modified since the ETag sent in If-None-Match."
+            ),
             403: openapi.Response(
                 description="Permission denied, user is not authenticated.",
                 examples={
@@ -125,6 +198,7 @@ class LoanOffersListView(APIView):
             ),
         }
     )
+    @method_decorator(condition(etag_func=loan_offers_etag))
     def get(self, request, *args, **kwargs):
         user = request.user
 
@@ -138,6 +212,9 @@ class LoanOffersListView(APIView):
             offers = LoanOffer.objects.filter(loan_request__borrower=user)
             offers_type = "received"
 
+        # The nested loan request is part of each offer, load it in the same query
+        offers = offers.select_related('loan_request')
+
         serializer = LoanOfferSerializer(offers, many=True)
         return Response({
             'offers_type': offers_type,
@@ -145,10 +222,59 @@ class LoanOffersListView(APIView):
         }, status=status.HTTP_200_OK)
 
 
+class BestLoanOffersView(APIView):
+    """
+    Retrieve the cheapest pending offers on one of the borrower's loan requests,
+    ranked by total repayable amount then interest rate.
+    """
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        query_serializer=BestLoanOffersQuerySerializer,
+        responses={
+            200: openapi.Response(
+                description="The best offers, cheapest first.",
+                schema=LoanOfferSerializer(many=True)
+            ),
+            400: openapi.Response(description="Invalid limit"),
+            403: openapi.Response(
+                description="Forbidden for anyone but the borrower of the loan request",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        'error': openapi.Schema(type=openapi.TYPE_STRING, description='Error message')
+                    }
+                )
+            ),
+            404: openapi.Response(description="Loan request not found")
+        },
+        manual_parameters=[
+            openapi.Parameter('loan_request_id', openapi.IN_PATH, description="ID of the loan request",
+                              type=openapi.TYPE_INTEGER),
+        ]
+    )
+    def get(self, request, loan_request_id, *args, **kwargs):
+        loan_request = get_object_or_404(LoanRequest, id=loan_request_id)
+        if loan_request.borrower_id != request.user.id:
+            return Response({'error': 'You are not authorized to view the offers of this loan request.'},
+                            status=status.HTTP_403_FORBIDDEN)
+
+        query_serializer = BestLoanOffersQuerySerializer(data=request.query_params)
+        if not query_serializer.is_valid():
+            return Response(query_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        offers = list(LoanOffer.best_for(loan_request.id, query_serializer.validated_data['limit']))
+        for offer in offers:
+            offer.loan_request = loan_request
+        return Response(LoanOfferSerializer(offers, many=True).data, status=status.HTTP_200_OK)
+
+
 class AcceptRejectLoanOfferView(APIView):
     """
     Allows a borrower to accept or reject a loan offer.
     - If accepted: Marks the loan request as inactive, updates the offer status to accepted, and creates a loan.
+      With ``?async=true`` the funding is queued on the lender's funding queue instead, and a job is
+      returned with 202 to be polled from ``FundingJobStatusView``.
     - If rejected: Updates the offer status to rejected.
     """
     permission_classes = [IsAuthenticated]
@@ -161,6 +287,10 @@ class AcceptRejectLoanOfferView(APIView):
                 description="Loan accepted successfully",
                 schema=LoanSerializer
             ),
+            202: openapi.Response(
+                description="Acceptance queued, poll the returned job",
+                schema=FundingJobSerializer
+            ),
             200: openapi.Response(
                 description="Loan offer rejected successfully"
             ),
@@ -170,6 +300,9 @@ class AcceptRejectLoanOfferView(APIView):
             403: openapi.Response(
                 description="Unauthorized action"
             ),
+            409: openapi.Response(
+                description="The offer is no longer pending"
+            ),
             500: openapi.Response(
                 description="Internal server error"
             )
@@ -178,16 +311,24 @@ class AcceptRejectLoanOfferView(APIView):
             openapi.Parameter('offer_id', openapi.IN_PATH, description="ID of the loan offer",
                               type=openapi.TYPE_INTEGER),
             openapi.Parameter('action', openapi.IN_PATH, description="Action to perform (accept or reject)",
-                              type=openapi.TYPE_STRING)
+                              type=openapi.TYPE_STRING),
+            openapi.Parameter('async', openapi.IN_QUERY, description="Queue the acceptance and return a job",
+                              type=openapi.TYPE_BOOLEAN),
+            IDEMPOTENCY_KEY_PARAMETER
         ]
     )
-    @transaction.atomic
+    @idempotent
+    @retry_on_conflict
     def post(self, request, offer_id, action, *args, **kwargs):
-        # Get the loan offer
-        loan_offer = get_object_or_404(LoanOffer, id=offer_id)
+        accept_async = action == 'accept' and request.query_params.get('async') in ('1', 'true')
+
+        # Get the loan offer with everything the funding needs, locked against a concurrent answer.
+        # A queued acceptance only reads it, the funding task locks it on the lender's queue.
+        queryset = LoanOffer.objects.select_related('loan_request') if accept_async else loan_offers_for_funding()
+        loan_offer = get_object_or_404(queryset, id=offer_id)
 
         # Check if the requesting user is the borrower of the loan request
-        if loan_offer.loan_request.borrower != request.user:
+        if loan_offer.loan_request.borrower_id != request.user.id:
             return Response({'error': 'You are not authorized to perform this action.'},
                             status=status.HTTP_403_FORBIDDEN)
 
@@ -195,84 +336,27 @@ class AcceptRejectLoanOfferView(APIView):
         if not loan_offer.loan_request.is_active:
             return Response(status=status.HTTP_403_FORBIDDEN, data={'error': 'This loan is not available any more'})
 
-        # Handle accept action
-        if action == 'accept':
-            lender = loan_offer.lender
-            offered_amount = loan_offer.offered_amount
-            admin_fee = loan_offer.admin_fee
-            total_amount = offered_amount + (offered_amount * admin_fee)
-
-            # Ensure the lender has sufficient balance
-            with transaction.atomic():
-                lender_wallet = Wallet.objects.select_for_update().get(user=lender)
-                if lender_wallet.balance < total_amount:
-                    return Response({'error': 'Insufficient funds in lender\'s wallet.'},
-                                    status=status.HTTP_400_BAD_REQUEST)
-                # Create the loan
-                loan = Loan.objects.create(
-                    borrower=request.user,
-                    amount=offered_amount,
-                    duration_months=loan_offer.loan_request.repayment_period_months,
-                    annual_interest_rate=loan_offer.interest_rate,
-                    admin_fee=loan_offer.admin_fee,
-                    lender=lender,
-                    funded_at=timezone.now(),
-                    status=loan_config.FUNDED,
-                    loan_offer=loan_offer
-                )
-
-                # Update lender and borrower balances
-                lender_wallet.balance -= total_amount
-                lender_wallet.save()
-
-                borrower_wallet = Wallet.objects.select_for_update().get(user=request.user)
-                borrower_wallet.balance += offered_amount
-                borrower_wallet.save()
-
-                # Create the transfer
-                Transfer.objects.create(
-                    user=lender,
-                    amount=total_amount,
-                    transfer_type=transfer_config.TRANSFER_TYPE_FUND_LOAN,
-                    transfer_status=transfer_config.TRANSFER_STATUS_COMPLETED,
-                    from_account=lender,
-                    to_account=request.user,
-                    loan_request=loan_offer.loan_request,
-                    loan=loan,
-                    borrower=request.user
-                )
+        # Expired, rejected or accepted offers cannot be answered again
+        if loan_offer.offer_status != loan_config.OFFER_STATUS_PENDING:
+            return Response({'error': 'This loan offer is no longer pending.'}, status=status.HTTP_409_CONFLICT)
 
-                # Create payment instances for each month
-                payments = []
-                monthly_payment_amount = loan_offer.calculate_monthly_payment()
-                for month in range(loan.duration_months):
-                    payment_due_date = timezone.now().date() + timezone.timedelta(days=(month + 1) * 30)
-                    payments.append(Payment(
-                        loan=loan,
-                        payment_amount=monthly_payment_amount,
-                        payment_due_date=payment_due_date
-                    ))
-                Payment.objects.bulk_create(payments)
-
-                # Update the loan offer status
-                loan_offer.offer_status = loan_config.OFFER_STATUS_ACCEPTED
-                loan_offer.save()
-
-                # update loan request to inactive
-                loan_offer.loan_request.is_active = False
-                loan_offer.loan_request.save()
-
-                # reject the remaining loan offers
-                remaining_offers = loan_offer.loan_request.offers.exclude(id=loan_offer.id)
-                remaining_offers.update(offer_status=loan_config.OFFER_STATUS_REJECTED)
-
-                # Serialize and return the created loan
-                loan_serializer = LoanSerializer(loan)
-                return Response(loan_serializer.data, status=status.HTTP_201_CREATED)
+        # Handle accept action
+        if accept_async:
+            return self.queue_acceptance(request, loan_offer)
+        elif action == 'accept':
+            try:
+                loan = fund_loan_offer(loan_offer)
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+            # Serialize and return the created loan
+            loan_serializer = LoanSerializer(loan)
+            return Response(loan_serializer.data, status=status.HTTP_201_CREATED)
 
         # Handle reject action
         elif action == 'reject':
-            # Update offer status to rejected
+            # Update offer status to rejected and give the reserved funds back to the lender
+            LoanOffer.release_reservations([loan_offer])
             loan_offer.offer_status = loan_config.OFFER_STATUS_REJECTED
             loan_offer.save()
             return Response({'message': 'Loan offer rejected successfully.'}, status=status.HTTP_200_OK)
@@ -280,3 +364,51 @@ class AcceptRejectLoanOfferView(APIView):
         # If action is neither accept nor reject
         else:
             return Response({'error': 'Invalid action. Use "accept" or "reject".'}, status=status.HTTP_400_BAD_REQUEST)
+
+    @staticmethod
+    def queue_acceptance(request, loan_offer):
+        # Cheap unlocked check, the funding task checks the balance again under its locks
+        balance = Wallet.objects.filter(user_id=loan_offer.lender_id).values_list('balance', flat=True).first()
+        if balance is None or balance < loan_offer.funding_amount:
+            return Response({'error': 'Insufficient funds in lender\'s wallet.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        job_id = create_funding_job(loan_offer)
+        transaction.on_commit(lambda: accept_loan_offer.apply_async(
+            (job_id, loan_offer.id), queue=funding_queue(loan_offer.lender_id)))
+
+        status_url = request.build_absolute_uri(reverse('api-v1:loans:offers:job-status', kwargs={'job_id': job_id}))
+        data = FundingJobSerializer({'job_id': job_id, 'status': loan_config.FUNDING_JOB_QUEUED,
+                                     'loan_offer': loan_offer.id}).data
+        return Response(data, status=status.HTTP_202_ACCEPTED, headers={'Location': status_url})
+
+
+class FundingJobStatusView(APIView):
+    """
+    Retrieve the status of an asynchronous offer acceptance, and the funded loan once it succeeded.
+    Only the borrower who accepted the offer can see it.
+    """
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_summary="Status of a queued offer acceptance",
+        responses={
+            200: openapi.Response(description="The job status", schema=FundingJobSerializer),
+            404: openapi.Response(
+                description="Unknown or expired job",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        'error': openapi.Schema(type=openapi.TYPE_STRING, description='Error message')
+                    }
+                )
+            )
+        },
+        manual_parameters=[
+            openapi.Parameter('job_id', openapi.IN_PATH, description="ID of the job", type=openapi.TYPE_STRING),
+        ]
+    )
+    def get(self, request, job_id, *args, **kwargs):
+        job = get_funding_job(job_id)
+        if job is None or job['borrower'] != str(request.user.id):
+            return Response({'error': 'Job not found.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(FundingJobSerializer({'job_id': job_id, **job}).data, status=status.HTTP_200_OK)
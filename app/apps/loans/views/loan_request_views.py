@@ -1,13 +1,15 @@
-from django.conf import settings
-from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from apps.loans.models.loan_request import LoanRequest
-from apps.loans.serializers.loan_requests_serializers import LoanRequestSerializer
+from apps.loans.etags import loan_requests_etag
+from apps.loans.loan_request_cache import get_active_loan_requests_page
+from apps.loans.serializers.loan_requests_serializers import LoanRequestSerializer, LoanRequestListQuerySerializer
 from apps.users import config
 
 
@@ -54,15 +56,27 @@ class CreateLoanRequestView(APIView):
 
 class ListLoanRequestsView(APIView):
     """
-    List all loan requests available for lenders.
+    List the loan requests available for lenders, one keyset page at a time.
+    Pages are ordered by creation and can be filtered by amount range and repayment period.
+    Responses carry an ETag, so polling clients get a 304 while the marketplace is unchanged.
     """
 
     @swagger_auto_schema(
+        query_serializer=LoanRequestListQuerySerializer,
         responses={
             200: openapi.Response(
-                description="List of loan requests",
-                schema=LoanRequestSerializer()
+                description="A page of loan requests with the cursor of the next page",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        'next_cursor': openapi.Schema(type=openapi.TYPE_STRING, x_nullable=True),
+                        'results': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(
+                            type=openapi.TYPE_OBJECT)),
+                    }
+                )
             ),
+            304: openapi.Response(description="Not modified since the ETag sent in If-None-Match"),
+            400: openapi.Response(description="Invalid cursor or filters"),
             403: openapi.Response(
                 description="Forbidden for non-lenders",
                 schema=openapi.Schema(
@@ -74,16 +88,16 @@ class ListLoanRequestsView(APIView):
             )
         }
     )
+    @method_decorator(condition(etag_func=loan_requests_etag))
     def get(self, request, *args, **kwargs):
         if request.user.user_type != config.USER_TYPE_LENDER:
             return Response({'error': 'You are not authorized to view loan requests.'},
                             status=status.HTTP_403_FORBIDDEN)
 
-        loan_requests = cache.get(settings.ACTIVE_LOAN_REQUESTS_CACHE_KEY)
-
-        if loan_requests is None:
-            loan_requests = LoanRequest.objects.filter(is_active=True)
-            cache.set(settings.ACTIVE_LOAN_REQUESTS_CACHE_KEY, loan_requests, timeout=settings.CACHE_TIMEOUT)
+        query_serializer = LoanRequestListQuerySerializer(data=request.query_params)
+        if not query_serializer.is_valid():
+            return Response(query_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        serializer = LoanRequestSerializer(loan_requests, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        # The cached page is already JSON, send it as is instead of going through a renderer
+        return HttpResponse(get_active_loan_requests_page(**query_serializer.validated_data),
+                            content_type='application/json', status=status.HTTP_200_OK)
@@ -0,0 +1,84 @@
+from django.shortcuts import get_object_or_404
+from drf_yasg import openapi
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from apps.loans import amortization
+from apps.loans.models.loan import Loan
+from apps.loans.models.loan_offer import LoanOffer
+from apps.loans.serializers.loan_schedule_serializers import AmortizationScheduleSerializer
+
+ERROR_SCHEMA = openapi.Schema(
+    type=openapi.TYPE_OBJECT,
+    properties={
+        'error': openapi.Schema(type=openapi.TYPE_STRING, description='Error message')
+    }
+)
+
+
+class LoanOfferScheduleView(APIView):
+    """
+    Retrieve the amortization schedule of a loan offer, with installments projected from today.
+    Only the lender of the offer and the borrower of its loan request can see it.
+    """
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_summary="Amortization schedule of a loan offer",
+        responses={
+            200: openapi.Response(description="The offer's amortization schedule.",
+                                  schema=AmortizationScheduleSerializer),
+            403: openapi.Response(description="Unauthorized action", schema=ERROR_SCHEMA),
+            404: openapi.Response(description="Loan offer not found"),
+        },
+        manual_parameters=[
+            openapi.Parameter('offer_id', openapi.IN_PATH, description="ID of the loan offer",
+                              type=openapi.TYPE_INTEGER),
+        ]
+    )
+    def get(self, request, offer_id, *args, **kwargs):
+        loan_offer = get_object_or_404(LoanOffer.objects.select_related('loan_request'), id=offer_id)
+
+        if request.user.id not in (loan_offer.lender_id, loan_offer.loan_request.borrower_id):
+            return Response({'error': 'You are not authorized to view this schedule.'},
+                            status=status.HTTP_403_FORBIDDEN)
+
+        schedule = amortization.dated_schedule(loan_offer.offered_amount, loan_offer.interest_rate,
+                                               loan_offer.loan_request.repayment_period_months,
+                                               loan_offer.admin_fee)
+        return Response(AmortizationScheduleSerializer(schedule).data, status=status.HTTP_200_OK)
+
+
+class LoanScheduleView(APIView):
+    """
+    Retrieve the amortization schedule of a loan, with installments due from its funding date.
+    Only the lender and the borrower of the loan can see it.
+    """
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_summary="Amortization schedule of a loan",
+        responses={
+            200: openapi.Response(description="The loan's amortization schedule.",
+                                  schema=AmortizationScheduleSerializer),
+            403: openapi.Response(description="Unauthorized action", schema=ERROR_SCHEMA),
+            404: openapi.Response(description="Loan not found"),
+        },
+        manual_parameters=[
+            openapi.Parameter('loan_id', openapi.IN_PATH, description="ID of the loan",
+                              type=openapi.TYPE_INTEGER),
+        ]
+    )
+    def get(self, request, loan_id, *args, **kwargs):
+        loan = get_object_or_404(Loan, id=loan_id)
+
+        if request.user.id not in (loan.lender_id, loan.borrower_id):
+            return Response({'error': 'You are not authorized to view this schedule.'},
+                            status=status.HTTP_403_FORBIDDEN)
+
+        schedule = amortization.dated_schedule(loan.amount, loan.annual_interest_rate, loan.duration_months,
+                                               loan.admin_fee, start=loan.funded_at.date() if loan.funded_at else None)
+        return Response(AmortizationScheduleSerializer(schedule).data, status=status.HTTP_200_OK)
@@ -7,3 +7,12 @@ PAYMENT_STATUS_CHOICES = [
     (PAYMENT_STATUS_PAID, 'Paid'),
     (PAYMENT_STATUS_OVERDUE, 'Overdue'),
 ]
+
+# Due payments settled per transaction by the hourly run
+DUE_PAYMENTS_BATCH_SIZE = 500
+
+# Seconds before a due payment the borrower could not cover is tried again
+DUE_PAYMENT_RETRY_INTERVAL = 60 * 60
+
+PAYMENTS_PAGE_SIZE = 20
+PAYMENTS_MAX_PAGE_SIZE = 100
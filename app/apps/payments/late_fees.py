@@ -0,0 +1,72 @@
+"""
+Daily assessment of late fees on unpaid installments, in one set-based UPDATE.
+
+Fees are computed by the database in exact decimal arithmetic from the policy in the settings and the
+number of days each installment is past due: ``LATE_FEE_RATE`` of the installment on the first day
+past ``LATE_FEE_GRACE_DAYS``, ``LATE_FEE_DAILY_RATE`` more on every later day, never more than
+``LATE_FEE_MAX_RATE``. The fee only depends on the due date, so running the job again on the same
+day changes nothing and a run after missed days charges what they would have.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models
+from django.db.models import ExpressionWrapper, F, Func, Q, Value
+from django.db.models.functions import Least, Round
+from django.utils import timezone
+
+from apps.payments import config
+from apps.payments.models import Payment
+
+MONEY = models.DecimalField(max_digits=10, decimal_places=2)
+RATE = models.DecimalField()
+
+
+class DaysPastDue(Func):
+    """
+    Whole days from the due date of a payment to ``today``. Subtracting dates gives days on
+    PostgreSQL, SQLite goes through julian days.
+    """
+    arg_joiner = ' - '
+    template = '(%(expressions)s)'
+    output_field = models.IntegerField()
+
+    def __init__(self, today):
+        super().__init__(Value(today, output_field=models.DateField()), F('payment_due_date'))
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template='CAST(julianday(%(expressions)s) AS INTEGER)',
+                           arg_joiner=') - julianday(', **extra_context)
+
+
+def late_fee(today):
+    """
+    Late fee of a payment on ``today`` as a database expression, for the payments past their grace period.
+    """
+    days_charged = DaysPastDue(today) - Value(settings.LATE_FEE_GRACE_DAYS + 1)
+    rate = Least(
+        ExpressionWrapper(Value(settings.LATE_FEE_RATE, output_field=RATE)
+                          + Value(settings.LATE_FEE_DAILY_RATE, output_field=RATE) * days_charged,
+                          output_field=RATE),
+        Value(settings.LATE_FEE_MAX_RATE, output_field=RATE),
+        output_field=RATE,
+    )
+    # A fraction of the installment, rounded to the cent
+    return Round(ExpressionWrapper(F('payment_amount') * rate, output_field=RATE), 2, output_field=MONEY)
+
+
+def charge_late_fees(today=None):
+    """
+    Bring the late fees of every unpaid installment past its grace period up to date as of ``today``
+    (the current date by default). Returns the number of payments whose fee changed.
+    """
+    today = today or timezone.localdate()
+    return Payment.objects.alias(late_fee=late_fee(today)).filter(
+        Q(late_payment_fees_amount__isnull=True) | ~Q(late_payment_fees_amount=F('late_fee')),
+        ~Q(payment_status=config.PAYMENT_STATUS_PAID),
+        payment_due_date__lt=today - timedelta(days=settings.LATE_FEE_GRACE_DAYS),
+    ).update(
+        late_payment_fees_amount=F('late_fee'),
+        is_late_payment=True,
+        modified=timezone.now(),
+    )
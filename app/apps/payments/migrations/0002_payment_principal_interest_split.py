@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='interest_amount',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Part of the installment that pays interest.', max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='principal_amount',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Part of the installment that repays principal.', max_digits=10, null=True),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:58
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('payments', '0002_payment_principal_interest_split'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='borrower',
+            field=models.ForeignKey(blank=True, help_text="Borrower of the loan, copied from it so a borrower's payments are indexed.", null=True, on_delete=django.db.models.deletion.CASCADE, related_name='payments', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(condition=models.Q(('payment_status', 'paid'), _negated=True), fields=['borrower', 'payment_due_date', 'id'], name='payment_unpaid_due_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:58
+
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+def copy_loan_borrower(apps, schema_editor):
+    Loan = apps.get_model('loans', 'Loan')
+    Payment = apps.get_model('payments', 'Payment')
+
+    Payment.objects.filter(borrower__isnull=True).update(
+        borrower_id=Subquery(Loan.objects.filter(pk=OuterRef('loan_id')).values('borrower_id')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0003_payment_borrower'),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_loan_borrower, migrations.RunPython.noop),
+    ]
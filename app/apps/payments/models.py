@@ -1,4 +1,6 @@
+from django.conf import settings
 from django.db import models
+from django.db.models import Q
 from django.contrib.auth.models import User
 from django.utils import timezone
 
@@ -8,9 +10,16 @@ from apps.payments import config
 
 class Payment(models.Model):
     loan = models.ForeignKey(Loan, on_delete=models.CASCADE, related_name='payments')
+    borrower = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.CASCADE,
+                                 related_name='payments',
+                                 help_text="Borrower of the loan, copied from it so a borrower's payments are indexed.")
     payment_amount = models.DecimalField(max_digits=10, decimal_places=2,
                                          help_text="The amount paid for this installment.")
     payment_due_date = models.DateField(help_text="The due date for the payment.")
+    principal_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True,
+                                           help_text="Part of the installment that repays principal.")
+    interest_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True,
+                                          help_text="Part of the installment that pays interest.")
     payment_status = models.CharField(
         max_length=20,
         choices=config.PAYMENT_STATUS_CHOICES,
@@ -25,17 +34,23 @@ class Payment(models.Model):
     modified = models.DateTimeField(auto_now=True, help_text="Timestamp when the payment record was last modified.")
     is_late_payment = models.BooleanField(default=False, help_text="Indicates whether the payment was made late.")
 
+    class Meta:
+        indexes = [
+            # Keyset pages of a borrower's payments left to pay, ordered by due date
+            models.Index(fields=['borrower', 'payment_due_date', 'id'],
+                         condition=~Q(payment_status=config.PAYMENT_STATUS_PAID), name='payment_unpaid_due_idx'),
+        ]
+
     def __str__(self):
         return f"Payment {self.id} for Loan {self.loan.id} - Status: {self.payment_status}"
 
     def save(self, *args, **kwargs):
-        # Automatically update `is_late_payment` and `payment_status` fields based on due date and payment status
+        if self.borrower_id is None:
+            self.borrower_id = self.loan.borrower_id
+
+        # Automatically update `is_late_payment` based on due date and payment status, late fees are
+        # assessed by the daily late fee job
         if self.payment_status == 'paid' and self.payment_status_changed:
             self.is_late_payment = self.payment_due_date < self.payment_status_changed.date()
-            if self.is_late_payment and self.late_payment_fees_amount is None:
-                self.late_payment_fees_amount = self.calculate_late_fee()
 
         super().save(*args, **kwargs)
-
-    def calculate_late_fee(self):
-        return round(self.payment_amount * 0.05, 2)  # 5% of the payment amount as a late fee
@@ -0,0 +1,23 @@
+"""
+Keyset cursors over ``(payment_due_date, id)``, the order of the payments list.
+
+The cursors share the encoding of the loan request ones, with the ordinal of the due date as the score.
+"""
+from datetime import date
+
+from apps.loans import pagination
+
+MIN_ORDINAL = date.min.toordinal()
+MAX_ORDINAL = date.max.toordinal()
+
+
+def encode_cursor(due_date, payment_id):
+    return pagination.encode_cursor(due_date.toordinal(), payment_id)
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor into its ``(due_date, id)`` position, raising ``ValueError`` when malformed or out of range.
+    """
+    ordinal, payment_id = pagination.decode_cursor(cursor, min_score=MIN_ORDINAL, max_score=MAX_ORDINAL)
+    return date.fromordinal(ordinal), payment_id
@@ -0,0 +1,59 @@
+"""
+Timer wheel of the payments waiting to be collected, kept in a Redis sorted set scored by due time.
+
+Payments are added when their loan is funded. A dispatcher that runs every minute pops only the
+members whose time has come and hands them to the settlement workers in batches, so nothing is
+scanned while nothing is due. A payment the borrower could not cover goes back on the wheel for
+``DUE_PAYMENT_RETRY_INTERVAL`` seconds later. The daily sweep of the ``Payment`` table catches anything
+the wheel lost (a Redis flush, a worker dying after a pop).
+"""
+from datetime import datetime, time
+
+from django.utils import timezone
+
+from app.redis import get_redis_client
+
+WHEEL_KEY = 'due_payments'
+
+
+def due_timestamp(due_date):
+    """
+    Time from which a payment due on ``due_date`` is collected: the start of that day.
+    """
+    return datetime.combine(due_date, time.min, tzinfo=timezone.get_current_timezone()).timestamp()
+
+
+def schedule_payments(payments):
+    """
+    Put ``payments`` on the wheel at their due time.
+    """
+    if payments:
+        get_redis_client().zadd(WHEEL_KEY, {payment.id: due_timestamp(payment.payment_due_date) for payment in payments})
+
+
+def reschedule_payments(payment_ids, delay):
+    """
+    Put the given payments back on the wheel ``delay`` seconds from now.
+    """
+    if payment_ids:
+        at = timezone.now().timestamp() + delay
+        get_redis_client().zadd(WHEEL_KEY, {payment_id: at for payment_id in payment_ids})
+
+
+def pop_due_payments(limit, now=None):
+    """
+    Remove and return the ids of at most ``limit`` payments whose time has come, earliest first.
+    A member is only returned to the dispatcher whose ``ZREM`` removed it, so concurrent dispatchers
+    never hand out the same payment twice.
+    """
+    client = get_redis_client()
+    at = (now or timezone.now()).timestamp()
+    members = client.zrangebyscore(WHEEL_KEY, '-inf', at, start=0, num=limit)
+    if not members:
+        return []
+
+    pipe = client.pipeline()
+    for member in members:
+        pipe.zrem(WHEEL_KEY, member)
+    removed = pipe.execute()
+    return [int(member) for member, popped in zip(members, removed) if popped]
@@ -1,4 +1,7 @@
 from rest_framework import serializers
+
+from . import config
+from .pagination import decode_cursor
 from .models import Payment
 
 
@@ -10,6 +13,8 @@ class PaymentSerializer(serializers.ModelSerializer):
             'loan',
             'payment_amount',
             'payment_due_date',
+            'principal_amount',
+            'interest_amount',
             'payment_status',
             'payment_status_changed',
             'late_payment_fees_amount',
@@ -18,3 +23,23 @@ class PaymentSerializer(serializers.ModelSerializer):
             'is_late_payment'
         ]
 
+
+class PaymentListQuerySerializer(serializers.Serializer):
+    cursor = serializers.CharField(required=False, help_text="Cursor returned as `next_cursor` by the previous page.")
+    page_size = serializers.IntegerField(min_value=1, max_value=config.PAYMENTS_MAX_PAGE_SIZE,
+                                         default=config.PAYMENTS_PAGE_SIZE)
+    due_before = serializers.DateField(required=False, help_text="Only payments due on or before this date.")
+    status = serializers.ChoiceField(choices=config.PAYMENT_STATUS_CHOICES, required=False,
+                                     help_text="Only payments with this status, pending and overdue ones by default.")
+
+    def validate_cursor(self, value):
+        try:
+            decode_cursor(value)
+        except ValueError as exc:
+            raise serializers.ValidationError(str(exc))
+        return value
+
+
+class PayDuePaymentsSerializer(serializers.Serializer):
+    loans = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False,
+                                  help_text="Only pay the installments of these loans, every loan by default.")
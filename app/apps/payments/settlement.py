@@ -0,0 +1,144 @@
+"""
+Settlement of due installments in batches.
+
+Due payments are walked in id order, one batch per transaction. A batch is read with its loans and
+lenders in one query, every wallet it touches is locked with one ``SELECT ... FOR UPDATE``, and it
+is written back with a single UPDATE per table: wallet balances, paid payments, overdue payments
+and the loan counters (completing the repaid loans), plus one ``bulk_create`` of the transfers. The
+number of queries per batch is the same whatever its size.
+"""
+from collections import defaultdict, namedtuple
+from decimal import Decimal
+
+from django.db.models import Q
+from django.db.models.functions import Mod
+from django.utils import timezone
+
+from apps.loans.models.loan import Loan
+from apps.payments import config
+from apps.payments.models import Payment
+from apps.transfers import config as transfer_config
+from apps.transfers.models import Transfer
+from apps.wallets.locking import lock_wallets, retry_on_conflict
+from apps.wallets.models import Wallet
+
+Settlement = namedtuple('Settlement', ['paid', 'overdue'])
+
+
+def due_payments(today=None):
+    """
+    Unpaid payments of funded loans due on or before ``today``.
+    """
+    return Payment.objects.filter(
+        ~Q(payment_status=config.PAYMENT_STATUS_PAID),
+        payment_due_date__lte=today or timezone.localdate(),
+        loan__lender__isnull=False,
+    )
+
+
+def borrower_shard(payments, shard, shards):
+    """
+    The part of ``payments`` whose borrower falls in ``shard`` out of ``shards``. A borrower always maps
+    to a single shard, so shards settled in parallel never compete for the same borrower wallet.
+    """
+    return payments.annotate(borrower_shard=Mod('loan__borrower_id', shards)).filter(borrower_shard=shard)
+
+
+def _record_paid(payments):
+    # The wallets were already credited and debited, mark the payments paid in one UPDATE, write their
+    # transfers at once and count them off their loans, completing the loans they repaid
+    Payment.objects.filter(id__in=[payment.id for payment in payments]).update(
+        payment_status=config.PAYMENT_STATUS_PAID, modified=timezone.now())
+    Transfer.objects.bulk_create([
+        Transfer(
+            user_id=payment.loan.borrower_id,
+            amount=payment.payment_amount,
+            transfer_type=transfer_config.TRANSFER_TYPE_MONTHLY_PAYMENT,
+            transfer_status=transfer_config.TRANSFER_STATUS_COMPLETED,
+            loan=payment.loan,
+            to_account=payment.loan.lender,
+        )
+        for payment in payments
+    ])
+    Loan.objects.record_paid_installments(payments)
+    for payment in payments:
+        payment.payment_status = config.PAYMENT_STATUS_PAID
+
+
+@retry_on_conflict
+def _settle_batch(payments, batch_size):
+    # Payments or loans locked by a concurrent manual payment are left to the next run
+    batch = list(payments.select_related('loan__lender').select_for_update(skip_locked=True, of=('self', 'loan'))
+                 [:batch_size])
+    if not batch:
+        return batch, Settlement(0, 0)
+
+    wallets = lock_wallets([user_id for payment in batch for user_id in (payment.loan.borrower_id,
+                                                                         payment.loan.lender_id)])
+    balances = {user_id: wallet.balance for user_id, wallet in wallets.items()}
+
+    # A borrower with several installments due pays them in order while the balance lasts
+    paid, overdue = [], []
+    for payment in batch:
+        borrower_id, lender_id = payment.loan.borrower_id, payment.loan.lender_id
+        if balances[borrower_id] >= payment.payment_amount:
+            balances[borrower_id] -= payment.payment_amount
+            balances[lender_id] += payment.payment_amount
+            paid.append(payment)
+        elif payment.payment_status != config.PAYMENT_STATUS_OVERDUE:
+            overdue.append(payment)
+
+    Wallet.objects.adjust_by_user({
+        user_id: balance - wallets[user_id].balance
+        for user_id, balance in balances.items() if balance != wallets[user_id].balance
+    })
+    _record_paid(paid)
+    Payment.objects.filter(id__in=[payment.id for payment in overdue]).update(
+        payment_status=config.PAYMENT_STATUS_OVERDUE, modified=timezone.now())
+
+    return batch, Settlement(len(paid), len(overdue))
+
+
+def settle_due_payments(payments=None, batch_size=config.DUE_PAYMENTS_BATCH_SIZE):
+    """
+    Settle ``payments`` (every due payment by default) in batches of ``batch_size``, each in its own
+    transaction. Installments the borrower's balance covers are paid to the lender, the others are
+    marked overdue. Returns the totals as a ``Settlement``.
+    """
+    payments = (due_payments() if payments is None else payments).order_by('id')
+    paid = overdue = last_id = 0
+    while True:
+        batch, settlement = _settle_batch(payments.filter(id__gt=last_id), batch_size)
+        paid += settlement.paid
+        overdue += settlement.overdue
+        if len(batch) < batch_size:
+            break
+        last_id = batch[-1].id
+    return Settlement(paid, overdue)
+
+
+def pay_due_installments(borrower_id, loan_ids=None):
+    """
+    Pay every due installment of a borrower's loans (only of ``loan_ids`` when given) at once from
+    their wallet, in the caller's transaction. All of them are paid or none: raises ``ValueError``
+    when the balance does not cover their total. Returns the paid payments, earliest due first.
+    """
+    payments = due_payments().filter(borrower_id=borrower_id)
+    if loan_ids is not None:
+        payments = payments.filter(loan_id__in=loan_ids)
+    payments = list(payments.select_related('loan__lender').select_for_update(of=('self', 'loan'))
+                    .order_by('payment_due_date', 'id'))
+    if not payments:
+        return payments
+
+    wallets = lock_wallets([borrower_id, *(payment.loan.lender_id for payment in payments)])
+    amounts = defaultdict(Decimal)
+    for payment in payments:
+        amounts[borrower_id] -= payment.payment_amount
+        amounts[payment.loan.lender_id] += payment.payment_amount
+    if wallets[borrower_id].balance < -amounts[borrower_id]:
+        raise ValueError('Insufficient funds')
+
+    Wallet.objects.adjust_by_user(amounts)
+    _record_paid(payments)
+    return payments
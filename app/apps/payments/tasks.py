@@ -1,71 +1,92 @@
-from celery import shared_task
+from datetime import date
+
+from celery import chord, shared_task
 from celery.utils.log import get_task_logger
-from django.db import transaction
-from django.db.models import Q
+from django.conf import settings
 from django.utils import timezone
-from datetime import timedelta
 
 from apps.payments import config
-from apps.loans import config as loan_config
-from apps.transfers import config as transfer_config
-from apps.payments.models import Payment
-from apps.transfers.models import Transfer
+from apps.payments.late_fees import charge_late_fees
+from apps.payments.scheduler import pop_due_payments, reschedule_payments
+from apps.payments.settlement import borrower_shard, due_payments, settle_due_payments
 
 logger = get_task_logger(__name__)
 
 
 @shared_task
-def update_due_payments():
-    now = timezone.now()
+def dispatch_due_payments(batch_size=config.DUE_PAYMENTS_BATCH_SIZE):
+    """
+    Pop the payments that came due from the timer wheel and queue them for settlement in batches of
+    ``batch_size``. Returns the number of dispatched payments.
+    """
+    dispatched = 0
+    while True:
+        payment_ids = pop_due_payments(batch_size)
+        if payment_ids:
+            settle_scheduled_payments.delay(payment_ids)
+            dispatched += len(payment_ids)
+        if len(payment_ids) < batch_size:
+            break
+    return dispatched
 
-    # Fetch payments that are due
-    payments_due = Payment.objects.filter(
-        ~Q(payment_status=config.PAYMENT_STATUS_PAID),
-        payment_due_date__lte=now,
-    )
-    # Process each payment
-    for payment in payments_due:
-        # Lock the payment and related loan record to prevent concurrent updates
-        with transaction.atomic():
-            payment = Payment.objects.select_for_update().get(id=payment.id)
 
-            # Check if payment is already paid to avoid redundant processing
-            if payment.payment_status == config.PAYMENT_STATUS_PAID:
-                continue
+@shared_task
+def settle_scheduled_payments(payment_ids):
+    """
+    Settle a batch popped from the timer wheel, putting the payments still unpaid (the borrower's
+    balance fell short, or a concurrent payment held their lock) back on it for a later retry.
+    """
+    payments = due_payments().filter(id__in=payment_ids)
+    settlement = settle_due_payments(payments, batch_size=len(payment_ids))
+    reschedule_payments(list(payments.values_list('id', flat=True)), config.DUE_PAYMENT_RETRY_INTERVAL)
+    return settlement._asdict()
 
-            borrower_wallet = payment.loan.borrower.wallet
-            lender_wallet = payment.loan.lender.wallet
 
-            # Validate payment amount and update balances
-            if borrower_wallet.balance >= payment.payment_amount:
-                borrower_wallet.balance -= payment.payment_amount
-                lender_wallet.balance += payment.payment_amount
+@shared_task
+def update_due_payments(batch_size=config.DUE_PAYMENTS_BATCH_SIZE):
+    """
+    Daily sweep of the whole table behind the timer wheel, settling whatever it missed. The sweep is
+    fanned out to ``DUE_PAYMENTS_SHARDS`` tasks, each settling the due payments of its share of the
+    borrowers, and summarized once they all finished. Returns the id of the chord.
+    """
+    today = timezone.localdate().isoformat()
+    shards = settings.DUE_PAYMENTS_SHARDS
+    result = chord(
+        settle_due_payments_shard.s(shard, shards, today, batch_size) for shard in range(shards)
+    )(summarize_due_payments.s())
+    return result.id
 
-                # Save wallets after adjustments
-                borrower_wallet.save()
-                lender_wallet.save()
 
-                # Mark the payment as paid
-                payment.payment_status = config.PAYMENT_STATUS_PAID
-                payment.save()
+@shared_task
+def settle_due_payments_shard(shard, shards, today, batch_size=config.DUE_PAYMENTS_BATCH_SIZE):
+    """
+    Collect the payments due by ``today`` of the borrowers of ``shard`` from their wallets, or mark
+    them overdue when the balance falls short. Returns the number of paid and overdue payments.
+    """
+    payments = borrower_shard(due_payments(date.fromisoformat(today)), shard, shards)
+    return settle_due_payments(payments, batch_size=batch_size)._asdict()
+
 
-                # Create transfer records for both users
-                Transfer.objects.create(
-                    user=payment.loan.borrower,
-                    amount=payment.payment_amount,
-                    transfer_status=transfer_config.TRANSFER_TYPE_MONTHLY_PAYMENT,
-                    loan=payment.loan,
-                    to_account=payment.loan.lender,
-                )
-                # Check if all payments are completed for the loan
-                remaining_payments = Payment.objects.filter(
-                    ~Q(payment_status=config.PAYMENT_STATUS_PAID),
-                    loan=payment.loan
-                )
-                if not remaining_payments.exists():
-                    payment.loan.status = loan_config.COMPLETED
-                    payment.loan.save()
-            else:
-                # Update payment status to overdue if insufficient funds
-                payment.payment_status = config.PAYMENT_STATUS_OVERDUE
-                payment.save()
+@shared_task
+def summarize_due_payments(results):
+    """
+    Add up the results of the shards of a settlement run.
+    """
+    summary = {
+        'shards': len(results),
+        'paid': sum(result['paid'] for result in results),
+        'overdue': sum(result['overdue'] for result in results),
+    }
+    logger.info('Settled due payments in %(shards)s shards: %(paid)s paid, %(overdue)s overdue', summary)
+    return summary
+
+
+@shared_task
+def assess_late_fees():
+    """
+    Bring the late fees of the unpaid installments past due up to date. Returns the number of payments
+    whose fee changed.
+    """
+    assessed = charge_late_fees()
+    logger.info('Updated late fees on %s payments', assessed)
+    return assessed
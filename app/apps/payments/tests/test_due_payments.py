@@ -0,0 +1,192 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from apps.loans import config as loan_config
+from apps.loans.models.loan import Loan
+from apps.payments import config
+from apps.payments.models import Payment
+from apps.payments.settlement import Settlement, borrower_shard, due_payments, settle_due_payments
+from apps.payments.tasks import settle_due_payments_shard, summarize_due_payments, update_due_payments
+from apps.transfers import config as transfer_config
+from apps.transfers.models import Transfer
+from apps.users import config as user_config
+from apps.wallets.models import Wallet
+
+User = get_user_model()
+
+
+class DuePaymentsTestCase(TestCase):
+
+    def setUp(self):
+        self.lender = User.objects.create_user(username='lender', email='user@lender.com', password='pass',
+                                               user_type=user_config.USER_TYPE_LENDER)
+        self.borrowers = []
+        self.yesterday = date.today() - timedelta(days=1)
+
+    def create_loan(self, balance, installments, due_date=None):
+        index = len(self.borrowers)
+        borrower = User.objects.create_user(username=f'borrower{index}', email=f'user{index}@borrower.com',
+                                            password='pass', user_type=user_config.USER_TYPE_BORROWER)
+        Wallet.objects.filter(user=borrower).update(balance=balance)
+        self.borrowers.append(borrower)
+        loan = Loan.objects.create(borrower_id=borrower.id, lender_id=self.lender.id, amount=1000,
+                                   duration_months=len(installments), status=loan_config.FUNDED,
+                                   remaining_installments=len(installments),
+                                   outstanding_principal=sum(Decimal(amount) for amount in installments))
+        Payment.objects.bulk_create([
+            Payment(loan=loan, payment_amount=amount, principal_amount=amount,
+                    payment_due_date=due_date or self.yesterday)
+            for amount in installments
+        ])
+        return loan
+
+    def balance(self, user):
+        return Wallet.objects.get(user=user).balance
+
+
+class SettleDuePaymentsTests(DuePaymentsTestCase):
+
+    def test_collects_covered_payments_and_marks_the_others_overdue(self):
+        """
+        Test that a due payment is collected when the borrower can cover it and marked overdue otherwise.
+        """
+        solvent = self.create_loan(500, ['100.00', '100.00', '100.00'])
+        short = self.create_loan(50, ['100.00'])
+
+        self.assertEqual(settle_due_payments(), Settlement(paid=3, overdue=1))
+        self.assertEqual(self.balance(self.borrowers[0]), Decimal('200.00'))
+        self.assertEqual(self.balance(self.borrowers[1]), Decimal('50.00'))
+        self.assertEqual(self.balance(self.lender), Decimal('300.00'))
+        transfers = Transfer.objects.filter(loan=solvent, user=self.borrowers[0])
+        self.assertEqual(transfers.count(), 3)
+        self.assertEqual(set(transfers.values_list('transfer_type', 'transfer_status')),
+                         {(transfer_config.TRANSFER_TYPE_MONTHLY_PAYMENT, transfer_config.TRANSFER_STATUS_COMPLETED)})
+        self.assertEqual(Payment.objects.get(loan=short).payment_status, config.PAYMENT_STATUS_OVERDUE)
+
+    def test_pays_installments_in_order_while_the_balance_lasts(self):
+        """
+        Test that a borrower with several due installments pays them in order until the balance runs out.
+        """
+        loan = self.create_loan(250, ['100.00', '100.00', '100.00'])
+
+        settle_due_payments()
+
+        statuses = list(loan.payments.order_by('id').values_list('payment_status', flat=True))
+        self.assertEqual(statuses, [config.PAYMENT_STATUS_PAID, config.PAYMENT_STATUS_PAID,
+                                    config.PAYMENT_STATUS_OVERDUE])
+        self.assertEqual(self.balance(self.borrowers[0]), Decimal('50.00'))
+
+    def test_completes_fully_paid_loans_only(self):
+        """
+        Test that a loan is completed once its last installment is paid, and not while some are still unpaid.
+        """
+        repaid = self.create_loan(500, ['100.00'])
+        ongoing = self.create_loan(500, ['100.00'])
+        Payment.objects.create(loan=ongoing, payment_amount='100.00', principal_amount='100.00',
+                               payment_due_date=date.today() + timedelta(days=30))
+        Loan.objects.filter(pk=ongoing.pk).update(remaining_installments=2, outstanding_principal='200.00')
+
+        settle_due_payments()
+
+        repaid.refresh_from_db()
+        ongoing.refresh_from_db()
+        self.assertEqual(repaid.status, loan_config.COMPLETED)
+        self.assertEqual(ongoing.status, loan_config.FUNDED)
+        self.assertEqual((repaid.remaining_installments, repaid.outstanding_principal), (0, Decimal('0.00')))
+        self.assertEqual((ongoing.remaining_installments, ongoing.outstanding_principal), (1, Decimal('100.00')))
+
+    def test_ignores_payments_not_yet_due(self):
+        """
+        Test that payments due in the future are left untouched.
+        """
+        loan = self.create_loan(500, ['100.00'], due_date=date.today() + timedelta(days=1))
+
+        self.assertEqual(settle_due_payments(), Settlement(paid=0, overdue=0))
+        self.assertEqual(loan.payments.get().payment_status, config.PAYMENT_STATUS_PENDING)
+
+    def test_batches_cover_every_payment(self):
+        """
+        Test that small batches still settle every due payment.
+        """
+        for _ in range(3):
+            self.create_loan(500, ['100.00', '100.00'])
+
+        self.assertEqual(settle_due_payments(batch_size=4), Settlement(paid=6, overdue=0))
+        self.assertFalse(Payment.objects.exclude(payment_status=config.PAYMENT_STATUS_PAID).exists())
+
+    def test_query_count_does_not_grow_with_the_batch(self):
+        """
+        Test that settling a batch takes the same number of queries whatever the number of payments.
+        """
+        self.create_loan(500, ['100.00'])
+        self.create_loan(0, ['100.00'])
+        with CaptureQueriesContext(connection) as single:
+            settle_due_payments()
+
+        for _ in range(5):
+            self.create_loan(500, ['100.00', '100.00'])
+        self.create_loan(0, ['100.00'])
+        with CaptureQueriesContext(connection) as many:
+            settle_due_payments()
+
+        self.assertEqual(len(many), len(single))
+
+
+class DuePaymentsFanOutTests(DuePaymentsTestCase):
+
+    def test_shards_split_borrowers(self):
+        """
+        Test that every due payment falls in exactly one shard, together with the other payments of its borrower.
+        """
+        for _ in range(5):
+            self.create_loan(500, ['100.00', '100.00'])
+
+        shards = [set(borrower_shard(due_payments(), shard, 3).values_list('loan__borrower_id', flat=True))
+                  for shard in range(3)]
+
+        self.assertEqual(sum(len(borrowers) for borrowers in shards), 5)
+        self.assertEqual(set().union(*shards), {borrower.id for borrower in self.borrowers})
+        for shard in range(3):
+            self.assertEqual(borrower_shard(due_payments(), shard, 3).count(), 2 * len(shards[shard]))
+
+    def test_shard_settles_only_its_borrowers(self):
+        """
+        Test that a shard task leaves the payments of the other shards untouched.
+        """
+        for _ in range(4):
+            self.create_loan(500, ['100.00'])
+        shard = self.borrowers[0].id % 2
+
+        result = settle_due_payments_shard(shard, 2, date.today().isoformat())
+
+        settled = {borrower.id for borrower in self.borrowers if borrower.id % 2 == shard}
+        self.assertEqual(result, {'paid': len(settled), 'overdue': 0})
+        self.assertEqual(set(Payment.objects.filter(payment_status=config.PAYMENT_STATUS_PAID)
+                             .values_list('loan__borrower_id', flat=True)), settled)
+
+    @override_settings(DUE_PAYMENTS_SHARDS=3)
+    def test_hourly_run_settles_every_shard(self):
+        """
+        Test that the hourly run dispatches every shard and settles all due payments.
+        """
+        for _ in range(4):
+            self.create_loan(500, ['100.00'])
+        self.create_loan(0, ['100.00'])
+
+        update_due_payments()
+
+        self.assertEqual(Payment.objects.filter(payment_status=config.PAYMENT_STATUS_PAID).count(), 4)
+        self.assertEqual(Payment.objects.filter(payment_status=config.PAYMENT_STATUS_OVERDUE).count(), 1)
+
+    def test_summary_adds_up_shards(self):
+        """
+        Test that the results of the shards are added up into the run summary.
+        """
+        summary = summarize_due_payments([{'paid': 2, 'overdue': 1}, {'paid': 3, 'overdue': 0}])
+
+        self.assertEqual(summary, {'shards': 2, 'paid': 5, 'overdue': 1})
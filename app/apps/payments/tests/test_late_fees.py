@@ -0,0 +1,101 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from apps.loans import config as loan_config
+from apps.loans.models.loan import Loan
+from apps.payments import config
+from apps.payments.late_fees import charge_late_fees
+from apps.payments.models import Payment
+from apps.payments.tasks import assess_late_fees
+from apps.users import config as user_config
+
+User = get_user_model()
+
+
+@override_settings(LATE_FEE_RATE=Decimal('0.05'), LATE_FEE_DAILY_RATE=Decimal('0.01'),
+                   LATE_FEE_MAX_RATE=Decimal('0.07'), LATE_FEE_GRACE_DAYS=2)
+class LateFeesTests(TestCase):
+
+    def setUp(self):
+        lender = User.objects.create_user(username='lender', email='user@lender.com', password='pass',
+                                          user_type=user_config.USER_TYPE_LENDER)
+        borrower = User.objects.create_user(username='borrower', email='user@borrower.com', password='pass',
+                                            user_type=user_config.USER_TYPE_BORROWER)
+        self.loan = Loan.objects.create(borrower_id=borrower.id, lender_id=lender.id, amount=1000,
+                                        duration_months=3, status=loan_config.FUNDED)
+        self.today = date(2024, 3, 10)
+
+    def create_payment(self, days_late, payment_status=config.PAYMENT_STATUS_OVERDUE, amount='123.45'):
+        return Payment.objects.create(loan=self.loan, payment_amount=amount, payment_status=payment_status,
+                                      payment_due_date=self.today - timedelta(days=days_late))
+
+    def fee(self, payment):
+        payment.refresh_from_db()
+        return payment.late_payment_fees_amount
+
+    def test_charges_payments_past_the_grace_period(self):
+        """
+        Test that only unpaid payments past the grace period are charged, at the rate rounded to the cent.
+        """
+        late = self.create_payment(3)
+        pending = self.create_payment(5, payment_status=config.PAYMENT_STATUS_PENDING)
+        in_grace = self.create_payment(2)
+        paid = self.create_payment(10, payment_status=config.PAYMENT_STATUS_PAID)
+
+        self.assertEqual(charge_late_fees(self.today), 2)
+
+        self.assertEqual(self.fee(late), Decimal('6.17'))
+        # Five days past due, two more than the first day past the grace period
+        self.assertEqual(self.fee(pending), Decimal('8.64'))
+        self.assertIsNone(self.fee(in_grace))
+        self.assertIsNone(self.fee(paid))
+        late.refresh_from_db()
+        self.assertTrue(late.is_late_payment)
+
+    def test_is_idempotent_per_day(self):
+        """
+        Test that running the job twice on the same day charges the fee once.
+        """
+        payment = self.create_payment(3)
+
+        charge_late_fees(self.today)
+        self.assertEqual(charge_late_fees(self.today), 0)
+
+        self.assertEqual(self.fee(payment), Decimal('6.17'))
+
+    def test_catches_up_after_missed_days(self):
+        """
+        Test that a payment assessed for the first time days after its grace period gets the fee of its days past due.
+        """
+        payment = self.create_payment(4, amount='200.00')
+
+        self.assertEqual(charge_late_fees(self.today), 1)
+
+        self.assertEqual(self.fee(payment), Decimal('12.00'))
+
+    def test_accrues_daily_up_to_the_cap(self):
+        """
+        Test that every later day adds the daily rate, until the fee reaches the maximum rate.
+        """
+        payment = self.create_payment(3, amount='200.00')
+
+        fees = []
+        for day in range(4):
+            charge_late_fees(self.today + timedelta(days=day))
+            fees.append(self.fee(payment))
+
+        self.assertEqual(fees, [Decimal('10.00'), Decimal('12.00'), Decimal('14.00'), Decimal('14.00')])
+        # Capped fees are not written again
+        self.assertEqual(charge_late_fees(self.today + timedelta(days=4)), 0)
+
+    def test_task_returns_assessed_count(self):
+        """
+        Test that the scheduled task assesses the payments past due as of today.
+        """
+        Payment.objects.create(loan=self.loan, payment_amount='100.00', payment_status=config.PAYMENT_STATUS_OVERDUE,
+                               payment_due_date=date.today() - timedelta(days=30))
+
+        self.assertEqual(assess_late_fees(), 1)
@@ -0,0 +1,100 @@
+from base64 import urlsafe_b64encode
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from apps.loans import config as loan_config
+from apps.loans.models.loan import Loan
+from apps.payments import config
+from apps.payments.models import Payment
+from apps.users import config as user_config
+
+User = get_user_model()
+
+
+class ListPaymentsViewTests(APITestCase):
+
+    def setUp(self):
+        self.lender = User.objects.create_user(username='lender', email='user@lender.com', password='pass',
+                                               user_type=user_config.USER_TYPE_LENDER)
+        self.borrower = User.objects.create_user(username='borrower', email='user@borrower.com', password='pass',
+                                                 user_type=user_config.USER_TYPE_BORROWER)
+        self.today = date.today()
+        self.url = reverse('api-v1:payments:list')
+        self.client.force_authenticate(user=self.borrower)
+
+    def create_payments(self, borrower, statuses):
+        loan = Loan.objects.create(borrower_id=borrower.id, lender_id=self.lender.id, amount=1000,
+                                   duration_months=len(statuses), status=loan_config.FUNDED)
+        return [
+            Payment.objects.create(loan=loan, payment_amount='100.00', payment_status=payment_status,
+                                   payment_due_date=self.today + timedelta(days=30 * month))
+            for month, payment_status in enumerate(statuses)
+        ]
+
+    def ids(self, response):
+        return [payment['id'] for payment in response.data['results']]
+
+    def test_lists_unpaid_payments_by_due_date(self):
+        """
+        Test that the borrower's unpaid payments of every loan are listed by due date, without the paid ones.
+        """
+        first = self.create_payments(self.borrower, [config.PAYMENT_STATUS_PAID, config.PAYMENT_STATUS_OVERDUE,
+                                                     config.PAYMENT_STATUS_PENDING])
+        second = self.create_payments(self.borrower, [config.PAYMENT_STATUS_PENDING])
+        other = User.objects.create_user(username='other', email='other@borrower.com', password='pass',
+                                         user_type=user_config.USER_TYPE_BORROWER)
+        self.create_payments(other, [config.PAYMENT_STATUS_PENDING])
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.ids(response), [second[0].id, first[1].id, first[2].id])
+        self.assertIsNone(response.data['next_cursor'])
+
+    def test_pages_follow_the_cursor(self):
+        """
+        Test that following next_cursor walks every payment once, including payments due on the same day.
+        """
+        payments = self.create_payments(self.borrower, [config.PAYMENT_STATUS_PENDING] * 3)
+        payments += self.create_payments(self.borrower, [config.PAYMENT_STATUS_PENDING] * 2)
+
+        seen, cursor = [], None
+        while True:
+            response = self.client.get(self.url, {'page_size': 2, **({'cursor': cursor} if cursor else {})})
+            seen += self.ids(response)
+            cursor = response.data['next_cursor']
+            if cursor is None:
+                break
+
+        expected = sorted(payments, key=lambda payment: (payment.payment_due_date, payment.id))
+        self.assertEqual(seen, [payment.id for payment in expected])
+
+    def test_filters_by_status_and_due_date(self):
+        """
+        Test that status and due_before narrow the list.
+        """
+        payments = self.create_payments(self.borrower, [config.PAYMENT_STATUS_PAID, config.PAYMENT_STATUS_OVERDUE,
+                                                        config.PAYMENT_STATUS_PENDING, config.PAYMENT_STATUS_PENDING])
+
+        overdue = self.client.get(self.url, {'status': config.PAYMENT_STATUS_OVERDUE})
+        paid = self.client.get(self.url, {'status': config.PAYMENT_STATUS_PAID})
+        due_soon = self.client.get(self.url, {'due_before': (self.today + timedelta(days=60)).isoformat()})
+
+        self.assertEqual(self.ids(overdue), [payments[1].id])
+        self.assertEqual(self.ids(paid), [payments[0].id])
+        self.assertEqual(self.ids(due_soon), [payments[1].id, payments[2].id])
+
+    def test_invalid_query(self):
+        """
+        Test that a malformed cursor or an unknown status is rejected.
+        """
+        self.assertEqual(self.client.get(self.url, {'cursor': 'nope'}).status_code, status.HTTP_400_BAD_REQUEST)
+        # Due date ordinals outside the calendar
+        for ordinal in (0, 10 ** 12):
+            cursor = urlsafe_b64encode(f'{ordinal}:1'.encode()).decode()
+            self.assertEqual(self.client.get(self.url, {'cursor': cursor}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.url, {'status': 'late'}).status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,114 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from apps.loans import config as loan_config
+from apps.loans.models.loan import Loan
+from apps.payments import config
+from apps.payments.models import Payment
+from apps.transfers.models import Transfer
+from apps.users import config as user_config
+from apps.wallets.models import Wallet
+
+User = get_user_model()
+
+
+class PayDuePaymentsViewTests(APITestCase):
+
+    def setUp(self):
+        self.lenders = [
+            User.objects.create_user(username=f'lender{index}', email=f'user{index}@lender.com', password='pass',
+                                     user_type=user_config.USER_TYPE_LENDER)
+            for index in range(2)
+        ]
+        self.borrower = User.objects.create_user(username='borrower', email='user@borrower.com', password='pass',
+                                                 user_type=user_config.USER_TYPE_BORROWER)
+        Wallet.objects.filter(user=self.borrower).update(balance=1000)
+        self.url = reverse('api-v1:payments:pay-due')
+        self.client.force_authenticate(user=self.borrower)
+
+    def create_loan(self, lender, due_dates):
+        loan = Loan.objects.create(borrower_id=self.borrower.id, lender_id=lender.id, amount=300,
+                                   duration_months=len(due_dates), status=loan_config.FUNDED,
+                                   remaining_installments=len(due_dates), outstanding_principal=100 * len(due_dates))
+        payments = [
+            Payment.objects.create(loan=loan, payment_amount='110.00', principal_amount='100.00',
+                                   interest_amount='10.00', payment_due_date=due_date,
+                                   payment_status=config.PAYMENT_STATUS_OVERDUE if due_date < date.today()
+                                   else config.PAYMENT_STATUS_PENDING)
+            for due_date in due_dates
+        ]
+        return loan, payments
+
+    def balance(self, user):
+        return Wallet.objects.get(user=user).balance
+
+    def test_pays_every_due_installment_at_once(self):
+        """
+        Test that all due and overdue installments of every loan are paid together, and the upcoming ones are not.
+        """
+        past, today, upcoming = date.today() - timedelta(days=30), date.today(), date.today() + timedelta(days=30)
+        first, first_payments = self.create_loan(self.lenders[0], [past, today, upcoming])
+        second, second_payments = self.create_loan(self.lenders[1], [past])
+
+        response = self.client.post(self.url, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_amount'], '330.00')
+        self.assertEqual([payment['id'] for payment in response.data['payments']],
+                         [first_payments[0].id, second_payments[0].id, first_payments[1].id])
+        self.assertEqual(self.balance(self.borrower), Decimal('670.00'))
+        self.assertEqual(self.balance(self.lenders[0]), Decimal('220.00'))
+        self.assertEqual(self.balance(self.lenders[1]), Decimal('110.00'))
+        self.assertEqual(Transfer.objects.filter(user=self.borrower).count(), 3)
+        self.assertEqual(Payment.objects.get(pk=first_payments[2].pk).payment_status,
+                         config.PAYMENT_STATUS_PENDING)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.remaining_installments, first.status), (1, loan_config.FUNDED))
+        self.assertEqual((second.remaining_installments, second.status), (0, loan_config.COMPLETED))
+
+    def test_pays_only_the_given_loans(self):
+        """
+        Test that the installments of the loans not listed are left unpaid.
+        """
+        past = date.today() - timedelta(days=1)
+        first, _ = self.create_loan(self.lenders[0], [past])
+        second, _ = self.create_loan(self.lenders[1], [past])
+
+        response = self.client.post(self.url, {'loans': [second.id]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Payment.objects.filter(payment_status=config.PAYMENT_STATUS_PAID).get().loan_id, second.id)
+        self.assertEqual(self.balance(self.borrower), Decimal('890.00'))
+
+    def test_insufficient_funds_pays_nothing(self):
+        """
+        Test that nothing is paid when the balance does not cover the total of the due installments.
+        """
+        Wallet.objects.filter(user=self.borrower).update(balance=200)
+        self.create_loan(self.lenders[0], [date.today() - timedelta(days=1), date.today()])
+
+        response = self.client.post(self.url, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error'], 'Insufficient funds')
+        self.assertFalse(Payment.objects.filter(payment_status=config.PAYMENT_STATUS_PAID).exists())
+        self.assertEqual(self.balance(self.borrower), Decimal('200.00'))
+        self.assertFalse(Transfer.objects.exists())
+
+    def test_nothing_due(self):
+        """
+        Test that nothing is debited when no installment is due.
+        """
+        self.create_loan(self.lenders[0], [date.today() + timedelta(days=1)])
+
+        response = self.client.post(self.url, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'total_amount': '0.00', 'payments': []})
+        self.assertEqual(self.balance(self.borrower), Decimal('1000.00'))
@@ -0,0 +1,64 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from apps.loans import config as loan_config
+from apps.loans.models.loan import Loan
+from apps.payments import config
+from apps.payments.models import Payment
+from apps.users import config as user_config
+from apps.wallets.models import Wallet
+
+User = get_user_model()
+
+
+class PayMonthlyPaymentViewTests(APITestCase):
+
+    def setUp(self):
+        self.lender = User.objects.create_user(username='lender', email='user@lender.com', password='pass',
+                                               user_type=user_config.USER_TYPE_LENDER)
+        self.borrower = User.objects.create_user(username='borrower', email='user@borrower.com', password='pass',
+                                                 user_type=user_config.USER_TYPE_BORROWER)
+        Wallet.objects.filter(user=self.borrower).update(balance=1000)
+        self.loan = Loan.objects.create(borrower_id=self.borrower.id, lender_id=self.lender.id, amount=200,
+                                        duration_months=2, status=loan_config.FUNDED, remaining_installments=2,
+                                        outstanding_principal=200)
+        self.payments = Payment.objects.bulk_create([
+            Payment(loan=self.loan, payment_amount='105.00', principal_amount='100.00', interest_amount='5.00',
+                    payment_due_date=date.today() + timedelta(days=30 * month))
+            for month in (1, 2)
+        ])
+        self.client.force_authenticate(user=self.borrower)
+
+    def pay(self, payment):
+        return self.client.post(reverse('api-v1:payments:pay-monthly-payment', kwargs={'pk': payment.id}))
+
+    def test_payment_counts_installment_off_the_loan(self):
+        """
+        Test that paying an installment decrements the loan counters and leaves the loan funded.
+        """
+        response = self.pay(self.payments[0])
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['payment_status'], config.PAYMENT_STATUS_PAID)
+        self.loan.refresh_from_db()
+        self.assertEqual(self.loan.remaining_installments, 1)
+        self.assertEqual(self.loan.outstanding_principal, Decimal('100.00'))
+        self.assertEqual(self.loan.status, loan_config.FUNDED)
+
+    def test_last_payment_completes_the_loan(self):
+        """
+        Test that paying the last installment completes the loan.
+        """
+        self.pay(self.payments[0])
+        self.pay(self.payments[1])
+
+        self.loan.refresh_from_db()
+        self.assertEqual(self.loan.remaining_installments, 0)
+        self.assertEqual(self.loan.outstanding_principal, Decimal('0.00'))
+        self.assertEqual(self.loan.status, loan_config.COMPLETED)
+        self.assertEqual(Wallet.objects.get(user=self.borrower).balance, Decimal('790.00'))
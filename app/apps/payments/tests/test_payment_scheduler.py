@@ -0,0 +1,102 @@
+from datetime import date, timedelta
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from app.redis import LOCAL_REDIS_URL, local_redis
+from apps.loans import config as loan_config
+from apps.loans.models.loan import Loan
+from apps.loans.models.loan_offer import LoanOffer
+from apps.loans.models.loan_request import LoanRequest
+from apps.payments import config
+from apps.payments.models import Payment
+from apps.payments.scheduler import WHEEL_KEY, due_timestamp, pop_due_payments, schedule_payments
+from apps.payments.tasks import dispatch_due_payments, settle_scheduled_payments
+from apps.users import config as user_config
+from apps.wallets.models import Wallet
+
+User = get_user_model()
+
+
+@override_settings(REDIS_URL=LOCAL_REDIS_URL)
+class PaymentSchedulerTests(APITestCase):
+
+    def setUp(self):
+        local_redis.flushall()
+
+        self.lender = User.objects.create_user(username='lender', email='user@lender.com', password='pass',
+                                               user_type=user_config.USER_TYPE_LENDER)
+        Wallet.objects.filter(user=self.lender).update(balance=10000)
+        self.borrower = User.objects.create_user(username='borrower', email='user@borrower.com', password='pass',
+                                                 user_type=user_config.USER_TYPE_BORROWER)
+        self.loan = Loan.objects.create(borrower_id=self.borrower.id, lender_id=self.lender.id, amount=1000,
+                                        duration_months=2, status=loan_config.FUNDED)
+
+    def create_payment(self, due_date, amount='100.00'):
+        return Payment.objects.create(loan=self.loan, payment_amount=amount, payment_due_date=due_date)
+
+    def test_accepting_offer_schedules_installments(self):
+        """
+        Test that the installments of a funded loan are put on the wheel at their due dates once it commits.
+        """
+        loan_request = LoanRequest.objects.create(borrower=self.borrower, requested_amount=5000,
+                                                  repayment_period_months=12)
+        loan_offer = LoanOffer.objects.create(loan_request=loan_request, lender=self.lender, offered_amount=5000,
+                                              interest_rate=5)
+        url = reverse('api-v1:loans:offers:respond', kwargs={'offer_id': loan_offer.id, 'action': 'accept'})
+
+        self.client.force_authenticate(user=self.borrower)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        payments = Payment.objects.filter(loan_id=response.data['id'])
+        self.assertEqual(local_redis.zcard(WHEEL_KEY), 12)
+        for payment in payments:
+            self.assertEqual(local_redis.zscore(WHEEL_KEY, payment.id), due_timestamp(payment.payment_due_date))
+
+    def test_pops_only_due_payments(self):
+        """
+        Test that only the payments whose time has come are popped, and only once.
+        """
+        due = self.create_payment(date.today())
+        upcoming = self.create_payment(date.today() + timedelta(days=1))
+        schedule_payments([due, upcoming])
+
+        self.assertEqual(pop_due_payments(10), [due.id])
+        self.assertEqual(pop_due_payments(10), [])
+        self.assertEqual(local_redis.zrange(WHEEL_KEY, 0, -1), [str(upcoming.id).encode()])
+
+    def test_dispatches_due_payments_in_batches(self):
+        """
+        Test that the dispatcher hands the due payments to the workers in batches and settles them.
+        """
+        payments = [self.create_payment(date.today() - timedelta(days=1)) for _ in range(5)]
+        Wallet.objects.filter(user=self.borrower).update(balance=1000)
+        schedule_payments(payments)
+
+        with patch.object(settle_scheduled_payments, 'delay', wraps=settle_scheduled_payments.delay) as delay:
+            self.assertEqual(dispatch_due_payments(batch_size=2), 5)
+
+        self.assertEqual([len(call.args[0]) for call in delay.call_args_list], [2, 2, 1])
+        self.assertFalse(Payment.objects.exclude(payment_status=config.PAYMENT_STATUS_PAID).exists())
+        self.assertEqual(local_redis.zcard(WHEEL_KEY), 0)
+
+    def test_uncovered_payment_is_retried_later(self):
+        """
+        Test that a payment the borrower cannot cover is marked overdue and put back on the wheel for a retry.
+        """
+        payment = self.create_payment(date.today())
+        schedule_payments([payment])
+
+        dispatch_due_payments()
+
+        payment.refresh_from_db()
+        self.assertEqual(payment.payment_status, config.PAYMENT_STATUS_OVERDUE)
+        retry_at = local_redis.zscore(WHEEL_KEY, payment.id)
+        self.assertAlmostEqual(retry_at, timezone.now().timestamp() + config.DUE_PAYMENT_RETRY_INTERVAL, delta=60)
@@ -1,9 +1,10 @@
 from django.urls import path
-from .views import PayMonthlyPaymentView, ListPaymentsView
+from .views import PayDuePaymentsView, PayMonthlyPaymentView, ListPaymentsView
 
 app_name = 'payments'
 
 urlpatterns = [
     path('', ListPaymentsView.as_view(), name='list'),
     path('<int:pk>/', PayMonthlyPaymentView.as_view(), name='pay-monthly-payment'),
+    path('pay_due/', PayDuePaymentsView.as_view(), name='pay-due'),
 ]
@@ -1,37 +1,82 @@
-from django.db import transaction
-from django.db.models import Q
+from decimal import Decimal
+
+from django.db.models import F, Q
 from django.utils import timezone
-from rest_framework import status, generics
+from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
-from apps.loans import config as loan_config
+from apps.idempotency.decorators import IDEMPOTENCY_KEY_PARAMETER, idempotent
+from apps.loans.models.loan import Loan
+from apps.wallets.locking import lock_wallets, retry_on_conflict
+from apps.wallets.models import Wallet
 from rest_framework.permissions import IsAuthenticated
 from django.shortcuts import get_object_or_404
 
 from . import config
 from apps.transfers import config as transfers_config
 from .models import Payment
-from .serializers import PaymentSerializer
+from .pagination import decode_cursor, encode_cursor
+from .serializers import PayDuePaymentsSerializer, PaymentListQuerySerializer, PaymentSerializer
+from .settlement import pay_due_installments
 from ..transfers.models import Transfer
 
 
-class ListPaymentsView(generics.ListAPIView):
-    serializer_class = PaymentSerializer
+class ListPaymentsView(APIView):
+    """
+    List the payments of the authenticated borrower, one keyset page at a time ordered by due date.
+    By default only the payments left to pay are listed, read from a partial index on unpaid payments.
+    """
     permission_classes = [IsAuthenticated]
 
     @swagger_auto_schema(
-        operation_description="List all payments made by the borrower",
+        operation_description="List the payments of the borrower",
+        query_serializer=PaymentListQuerySerializer,
         responses={
-            200: openapi.Response(description="A list of payments", schema=PaymentSerializer(many=True)),
+            200: openapi.Response(
+                description="A page of payments with the cursor of the next page",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        'next_cursor': openapi.Schema(type=openapi.TYPE_STRING, x_nullable=True),
+                        'results': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(
+                            type=openapi.TYPE_OBJECT)),
+                    }
+                )
+            ),
+            400: openapi.Response(description="Invalid cursor or filters"),
             401: openapi.Response(description="Unauthorized access")
         }
     )
-    def get_queryset(self):
-        # Filter payments by the authenticated borrower
-        return Payment.objects.filter(~Q(payment_status=config.PAYMENT_STATUS_PAID), loan__borrower=self.request.user)
+    def get(self, request, *args, **kwargs):
+        query_serializer = PaymentListQuerySerializer(data=request.query_params)
+        if not query_serializer.is_valid():
+            return Response(query_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        query = query_serializer.validated_data
+        page_size = query['page_size']
+
+        payments = Payment.objects.filter(borrower=request.user).order_by('payment_due_date', 'id')
+        if query.get('status') != config.PAYMENT_STATUS_PAID:
+            # Keeps the predicate of the partial index, so it also serves the pending and overdue filters
+            payments = payments.filter(~Q(payment_status=config.PAYMENT_STATUS_PAID))
+        if 'status' in query:
+            payments = payments.filter(payment_status=query['status'])
+        if 'due_before' in query:
+            payments = payments.filter(payment_due_date__lte=query['due_before'])
+        if 'cursor' in query:
+            due_date, payment_id = decode_cursor(query['cursor'])
+            payments = payments.filter(Q(payment_due_date__gt=due_date) | Q(payment_due_date=due_date,
+                                                                            id__gt=payment_id))
+
+        payments = list(payments[:page_size + 1])
+        page = payments[:page_size]
+        next_cursor = None
+        if len(payments) > page_size:
+            next_cursor = encode_cursor(page[-1].payment_due_date, page[-1].id)
+        return Response({'next_cursor': next_cursor, 'results': PaymentSerializer(page, many=True).data},
+                        status=status.HTTP_200_OK)
 
 
 class PayMonthlyPaymentView(APIView):
@@ -43,46 +88,91 @@ class PayMonthlyPaymentView(APIView):
             200: openapi.Response(description="Payment successful", schema=PaymentSerializer),
             400: openapi.Response(description="Invalid data or payment amount"),
             404: openapi.Response(description="Loan or payment not found")
-        }
+        },
+        manual_parameters=[IDEMPOTENCY_KEY_PARAMETER]
     )
+    @idempotent
+    @retry_on_conflict
     def post(self, request, pk, *args, **kwargs):
-        with transaction.atomic():
-            # Lock the payment object and related loan object
-            payment = get_object_or_404(Payment.objects.select_for_update(), id=pk)
-            loan = payment.loan
-
-            # Validate payment amount
-            if request.user.wallet.balance < payment.payment_amount:
-                return Response({'error': 'Insufficient funds'}, status=status.HTTP_400_BAD_REQUEST)
-            elif payment.payment_status == config.PAYMENT_STATUS_PAID:
-                return Response({'error': 'This payment is already paid'}, status=status.HTTP_400_BAD_REQUEST)
-
-            # Update borrower and lender accounts
-            request.user.wallet.balance -= payment.payment_amount
-            request.user.wallet.save()
-
-            payment.loan.lender.wallet.balance += payment.payment_amount
-            payment.loan.lender.wallet.save()
-
-            # Update payment status
-            payment.payment_status = config.PAYMENT_STATUS_PAID
-            payment.save()
-
-            # Create transfer records
-            Transfer.objects.create(
-                user=request.user,
-                amount=payment.payment_amount,
-                transfer_status=transfers_config.TRANSFER_TYPE_MONTHLY_PAYMENT,
-                loan=payment.loan,
-                to_account=payment.loan.lender,
-            )
-
-            # Update the loan status
-            remaining_payments = Payment.objects.filter(~Q(payment_status=config.PAYMENT_STATUS_PAID), loan=loan)
-            if not remaining_payments.exists():
-                loan.status = loan_config.COMPLETED
-                loan.save()
-
-            # Serialize and return the payment
-            payment_serializer = PaymentSerializer(payment)
-            return Response(payment_serializer.data, status=status.HTTP_200_OK)
+        # Lock the payment object and related loan object
+        payment = get_object_or_404(
+            Payment.objects.select_related('loan__lender').select_for_update(of=('self', 'loan')), id=pk)
+        loan = payment.loan
+
+        # Lock both wallets in id order, like every other transfer between wallets
+        wallets = lock_wallets([request.user.id, loan.lender_id])
+        borrower_wallet, lender_wallet = wallets[request.user.id], wallets[loan.lender_id]
+
+        # Validate payment amount
+        if borrower_wallet.balance < payment.payment_amount:
+            return Response({'error': 'Insufficient funds'}, status=status.HTTP_400_BAD_REQUEST)
+        elif payment.payment_status == config.PAYMENT_STATUS_PAID:
+            return Response({'error': 'This payment is already paid'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Update borrower and lender accounts
+        Wallet.objects.filter(pk=borrower_wallet.pk).update(balance=F('balance') - payment.payment_amount)
+        Wallet.objects.filter(pk=lender_wallet.pk).update(balance=F('balance') + payment.payment_amount)
+
+        # Update payment status
+        payment.payment_status = config.PAYMENT_STATUS_PAID
+        payment.save()
+
+        # Create transfer records
+        Transfer.objects.create(
+            user=request.user,
+            amount=payment.payment_amount,
+            transfer_type=transfers_config.TRANSFER_TYPE_MONTHLY_PAYMENT,
+            transfer_status=transfers_config.TRANSFER_STATUS_COMPLETED,
+            loan=payment.loan,
+            to_account=payment.loan.lender,
+        )
+
+        # Count the installment off the loan, completing it if it was the last one
+        Loan.objects.filter(pk=loan.pk).record_paid_installments([payment])
+
+        # Serialize and return the payment
+        payment_serializer = PaymentSerializer(payment)
+        return Response(payment_serializer.data, status=status.HTTP_200_OK)
+
+
+class PayDuePaymentsView(APIView):
+    """
+    Pay every due or overdue installment of the borrower at once, on all their loans or the given ones.
+    The installments are paid together in one transaction, or none of them when the balance falls short.
+    """
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_description="Allow borrower to pay all their due installments at once",
+        request_body=PayDuePaymentsSerializer,
+        responses={
+            200: openapi.Response(
+                description="Installments paid",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        'total_amount': openapi.Schema(type=openapi.TYPE_STRING),
+                        'payments': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(
+                            type=openapi.TYPE_OBJECT)),
+                    }
+                )
+            ),
+            400: openapi.Response(description="Invalid data or insufficient funds")
+        },
+        manual_parameters=[IDEMPOTENCY_KEY_PARAMETER]
+    )
+    @idempotent
+    @retry_on_conflict
+    def post(self, request, *args, **kwargs):
+        serializer = PayDuePaymentsSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            payments = pay_due_installments(request.user.id, serializer.validated_data.get('loans'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        total_amount = sum((payment.payment_amount for payment in payments), Decimal('0.00'))
+        return Response({'total_amount': str(total_amount), 'payments': PaymentSerializer(payments, many=True).data},
+                        status=status.HTTP_200_OK)
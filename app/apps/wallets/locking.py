@@ -0,0 +1,56 @@
+"""
+Locking of wallets for the operations that move money between them.
+
+Every path that changes more than one wallet locks them all at once through ``lock_wallets``,
+which always takes the row locks in ascending id order, so two transfers touching the same wallets
+queue behind each other instead of deadlocking. ``retry_on_conflict`` runs such an operation in its
+own transaction and replays it when the database still aborts it as a deadlock or a serialization failure.
+"""
+import random
+import time
+from functools import wraps
+
+from django.db import OperationalError, connection, transaction
+
+from apps.wallets.models import Wallet
+
+RETRY_ATTEMPTS = 3
+RETRY_BACKOFF = 0.05
+
+# SQLSTATE of serialization failures and detected deadlocks
+CONFLICT_CODES = {'40001', '40P01'}
+
+
+def lock_wallets(user_ids):
+    """
+    Lock the wallets of the given users with a single ``SELECT ... FOR UPDATE`` in ascending id order,
+    returning them keyed by user id. Must be called inside a transaction.
+    """
+    wallets = Wallet.objects.select_for_update().filter(user_id__in=set(user_ids)).order_by('pk')
+    return {wallet.user_id: wallet for wallet in wallets}
+
+
+def _is_conflict(exc):
+    cause = exc.__cause__
+    return (getattr(cause, 'pgcode', None) or getattr(cause, 'sqlstate', None)) in CONFLICT_CODES
+
+
+def retry_on_conflict(func):
+    """
+    Run ``func`` in a transaction, retrying it a few times with a jittered backoff when it is
+    aborted by a deadlock or a serialization failure. Inside an outer transaction nothing can be
+    replayed, so the error is raised as is.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        for attempt in range(1, RETRY_ATTEMPTS + 1):
+            retryable = not connection.in_atomic_block
+            try:
+                with transaction.atomic():
+                    return func(*args, **kwargs)
+            except OperationalError as exc:
+                if not retryable or attempt == RETRY_ATTEMPTS or not _is_conflict(exc):
+                    raise
+            time.sleep(RETRY_BACKOFF * attempt * (1 + random.random()))
+
+    return wrapper
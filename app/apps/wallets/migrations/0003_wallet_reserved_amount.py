@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:31
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import migrations, models
+
+
+def reserve_pending_offers(apps, schema_editor):
+    LoanOffer = apps.get_model('loans', 'LoanOffer')
+    Wallet = apps.get_model('wallets', 'Wallet')
+
+    totals = defaultdict(Decimal)
+    for lender_id, offered_amount, admin_fee in LoanOffer.objects.filter(offer_status='pending').values_list(
+            'lender_id', 'offered_amount', 'admin_fee').iterator():
+        amount = offered_amount + offered_amount * admin_fee
+        totals[lender_id] += amount.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+    for lender_id, total in totals.items():
+        Wallet.objects.filter(user_id=lender_id).update(reserved_amount=total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallets', '0002_alter_wallet_user'),
+        ('loans', '0012_loanoffer_amortization_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wallet',
+            name='reserved_amount',
+            field=models.DecimalField(decimal_places=2, default=0.0, help_text="Part of the balance held by the owner's pending loan offers.", max_digits=10),
+        ),
+        migrations.RunPython(reserve_pending_offers, migrations.RunPython.noop),
+    ]
@@ -1,27 +1,76 @@
+from decimal import Decimal
 from unicodedata import decimal
 
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Greatest
 from django.utils import timezone
 
 User = get_user_model()
 
 
+class WalletQuerySet(models.QuerySet):
+
+    def reserve(self, amount):
+        """
+        Reserve ``amount`` of the available balance of the wallets in a single conditional UPDATE.
+        Returns the number of wallets that could cover it, the others are left untouched.
+        """
+        return self.filter(balance__gte=F('reserved_amount') + amount).update(
+            reserved_amount=F('reserved_amount') + amount)
+
+    def release(self, amount):
+        """
+        Give ``amount`` of reserved funds back to the available balance of the wallets.
+        """
+        return self.update(reserved_amount=Greatest(F('reserved_amount') - amount, Value(Decimal('0.00')),
+                                                    output_field=models.DecimalField()))
+
+    def release_by_user(self, amounts):
+        """
+        Release a different amount for each user, ``amounts`` mapping user ids to amounts, in a single UPDATE.
+        """
+        if not amounts:
+            return 0
+        amount = Case(*[When(user_id=user_id, then=Value(value)) for user_id, value in amounts.items()],
+                      output_field=models.DecimalField())
+        return self.filter(user_id__in=amounts).release(amount)
+
+    def adjust_by_user(self, amounts):
+        """
+        Add a different amount, negative for debits, to the balance of each user in a single UPDATE.
+        """
+        if not amounts:
+            return 0
+        amount = Case(*[When(user_id=user_id, then=Value(value)) for user_id, value in amounts.items()],
+                      output_field=models.DecimalField())
+        return self.filter(user_id__in=amounts).update(balance=F('balance') + amount)
+
+
 class Wallet(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='wallet')
     balance = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    reserved_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0.00,
+                                          help_text="Part of the balance held by the owner's pending loan offers.")
     currency = models.CharField(max_length=3, default='USD')
     created_at = models.DateTimeField(default=timezone.now)
 
+    objects = WalletQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.user.username}'s Wallet - Balance: {self.balance} {self.currency}"
 
+    @property
+    def available_balance(self):
+        return self.balance - self.reserved_amount
+
     def deposit(self, amount):
         self.balance += amount
         self.save()
 
     def withdraw(self, amount):
-        if amount > self.balance:
+        if amount > self.available_balance:
             raise ValueError('Insufficient funds')
         self.balance -= amount
         self.save()
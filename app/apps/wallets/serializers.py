@@ -7,7 +7,7 @@ from apps.wallets.models import Wallet
 class WalletSerializer(serializers.ModelSerializer):
     class Meta:
         model = Wallet
-        fields = ['balance', 'currency']
+        fields = ['balance', 'reserved_amount', 'currency']
 
 
 class TransactionSerializer(serializers.Serializer):
@@ -0,0 +1,102 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import OperationalError, connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from apps.users import config
+from apps.wallets import locking
+from apps.wallets.locking import lock_wallets, retry_on_conflict
+
+User = get_user_model()
+
+
+class DeadlockDetected(Exception):
+    pgcode = '40P01'
+
+
+def conflict():
+    exc = OperationalError('deadlock detected')
+    exc.__cause__ = DeadlockDetected()
+    return exc
+
+
+class LockWalletsTests(TestCase):
+
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(username=f'user{index}', email=f'user{index}@lenme.com', password='pass',
+                                     user_type=config.USER_TYPE_LENDER)
+            for index in range(3)
+        ]
+
+    def test_locks_all_wallets_in_one_ordered_query(self):
+        """
+        Test that the wallets are read in a single query ordered by id, whatever the order of the users.
+        """
+        user_ids = [user.id for user in reversed(self.users)]
+        with CaptureQueriesContext(connection) as queries:
+            wallets = lock_wallets(user_ids)
+
+        self.assertEqual(len(queries), 1)
+        self.assertIn('ORDER BY "wallets_wallet"."id" ASC', queries[0]['sql'])
+        self.assertEqual(sorted(wallets), sorted(user_ids))
+        self.assertEqual([wallet.user_id for wallet in wallets.values()], sorted(user_ids))
+
+
+@patch.object(locking, 'RETRY_BACKOFF', 0)
+class RetryOnConflictTests(TransactionTestCase):
+
+    def test_retries_deadlocks(self):
+        """
+        Test that an operation aborted by a deadlock is replayed in a new transaction.
+        """
+        calls = []
+
+        @retry_on_conflict
+        def operation():
+            calls.append(transaction.get_connection().in_atomic_block)
+            if len(calls) == 1:
+                raise conflict()
+            return 'done'
+
+        self.assertEqual(operation(), 'done')
+        self.assertEqual(calls, [True, True])
+
+    def test_gives_up_after_the_last_attempt(self):
+        """
+        Test that a conflict that keeps happening is raised after the last attempt.
+        """
+        calls = []
+
+        @retry_on_conflict
+        def operation():
+            calls.append(1)
+            raise conflict()
+
+        with self.assertRaises(OperationalError):
+            operation()
+        self.assertEqual(len(calls), locking.RETRY_ATTEMPTS)
+
+    def test_other_errors_and_nested_transactions_are_not_retried(self):
+        """
+        Test that other database errors, and conflicts inside an outer transaction, are raised right away.
+        """
+        calls = []
+
+        @retry_on_conflict
+        def failing():
+            calls.append(1)
+            raise OperationalError('disk full')
+
+        @retry_on_conflict
+        def conflicting():
+            calls.append(1)
+            raise conflict()
+
+        with self.assertRaises(OperationalError):
+            failing()
+        with self.assertRaises(OperationalError), transaction.atomic():
+            conflicting()
+        self.assertEqual(len(calls), 2)
@@ -9,6 +9,9 @@ from rest_framework.permissions import IsAuthenticated
 from django.db import transaction
 from rest_framework.views import APIView
 
+from apps.idempotency.decorators import IDEMPOTENCY_KEY_PARAMETER, idempotent
+
+from .locking import lock_wallets, retry_on_conflict
 from .models import Wallet
 from .serializers import WalletSerializer, TransactionSerializer
 from ..transfers import config
@@ -62,13 +65,15 @@ class DepositView(APIView):
                 )
             )
         },
+        manual_parameters=[IDEMPOTENCY_KEY_PARAMETER],
     )
-    @transaction.atomic
+    @idempotent
+    @retry_on_conflict
     def post(self, request, *args, **kwargs):
         amount = request.data.get('amount')
         if amount and Decimal(amount) > 0:
             with transaction.atomic():
-                wallet = Wallet.objects.select_for_update().get(user=request.user)
+                wallet = lock_wallets([request.user.id])[request.user.id]
                 wallet.deposit(Decimal(amount))
 
                 # Create a Transfer record for the deposit
@@ -109,15 +114,17 @@ class WithdrawView(APIView):
                 )
             )
         },
+        manual_parameters=[IDEMPOTENCY_KEY_PARAMETER],
     )
-    @transaction.atomic
+    @idempotent
+    @retry_on_conflict
     def post(self, request, *args, **kwargs):
         amount = request.data.get('amount')
         if not amount or float(amount) <= 0:
             return Response({'error': 'Invalid amount'}, status=status.HTTP_400_BAD_REQUEST)
 
         with transaction.atomic():
-            wallet = Wallet.objects.select_for_update().get(user=request.user)
+            wallet = lock_wallets([request.user.id])[request.user.id]
             try:
                 wallet.withdraw(Decimal(amount))
                 wallet.save()